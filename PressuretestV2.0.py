@@ -1,306 +1,133 @@
 # PressuretestV3.10.py
 import os
-from io import BytesIO
+import tempfile
+import uuid
 from datetime import datetime, date, time
+from contextlib import nullcontext
+from functools import partial, wraps
+from io import BytesIO
 import urllib.parse
 
 import streamlit as st
-from PIL import Image as PILImage, ExifTags
-from streamlit_drawable_canvas import st_canvas
 
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import A4
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Table, TableStyle, Spacer, Image as RLImage
+# Zware afhankelijkheden (reportlab, Pillow, canvas/numpy) pas laden bij eerste gebruik:
+# pressuretest.pdf bij "Genereer PDF", Pillow via pressuretest.photos bij de eerste foto.
+from pressuretest import instrument
+from pressuretest.archive import ReportArchive, safe_filename
+from pressuretest.cache import LRUCache
+from pressuretest.drafts import DraftStore
+from pressuretest.jobs import DONE, FAILED, JOB_WORKERS, QUEUED, JobQueue, JobRejected
+from pressuretest.logger import analyze_hold, fmt_summary, load_logger_csv, logger_times, suggest_result
+from pressuretest.mail import SENT, MailDispatcher
+from pressuretest.photos import (
+    PhotoIngestCache, bulk_fits_budget, canvas_to_pil, chronological_slots, ingest_many, ingest_or_none,
+    photo_fits_budget, photo_key, photo_preview, session_photo
+)
+from pressuretest.translations import T
+from pressuretest.units import bar_to_psi, psi_to_bar
 
 # ======================
 # PATHS (logo t.o.v. dit script)
 # ======================
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 LOGO_PATH = os.path.join(BASE_DIR, "logo.png")
+DATA_DIR = os.environ.get("PRESSURETEST_DATA_DIR", os.path.join(BASE_DIR, "data"))
 
 # ======================
-# TRANSLATIONS
+# LIMIETEN
 # ======================
-T = {
-    "nl": {
-        "title":"Druktest rapport","language":"Taal","project_info":"Projectgegevens",
-        "project_name":"Projectnaam","manufacturer":"Fabrikant",
-        "work_order":"WO of PO + volgnummer / serienummer",
-        "drawing":"Tekening","revision":"Revisie","part_line":"Onderdeelnaam / Lijnsectie",
-        "requirements":"Test requirements","pt":"Testdruk (Pt)","pt_unit":"Eenheid","notes":"Opmerkingen",
-
-        # Nieuwe velden onder Test requirements
-        "test_instrument":"Testinstrument",
-        "calibration_date":"Kalibratiedatum",
-
-        # Per compartiment timing
-        "comp_duration":"Testduur compartiment",
-
-        "equip":"Registratie testapparatuur","compartments":"Compartiment / sectie","num_comp":"Aantal compartimenten",
-        "date":"Datum","start_time":"Start tijd","start_pressure":"Start druk","end_time":"Eindtijd","end_pressure":"Eind druk",
-        "result":"Resultaat","remarks":"Opmerking","pass":"PASS","fail":"FAIL",
-
-        "photos":"Foto's per compartiment","start_photo":"Foto begin","end_photo":"Foto eind","timestamp":"Tijd",
-        "exif_missing":"EXIF ontbreekt – timestamp = uploadmoment",
-        "use_camera":"Gebruik camera voor","slot_start":"Start","slot_end":"Eind",
-        "selected_target":"Camera doel","selected_none":"(geen)",
-
-        "signature":"Handtekening","draw_signature":"Teken handtekening","sign_name":"Naam","sign_company":"Bedrijf","sign_date":"Datum ondertekening",
-
-        "actions":"Acties","gen_pdf":"Genereer PDF","dl_pdf":"Download PDF","reset":"Formulier leegmaken",
-        "success_pdf":"PDF is gegenereerd.","need_all":"Vul alle verplichte velden in.",
-
-        "unit_bar_g":"bar(g)","unit_psi_g":"PSI(g)",
-
-        # Email UI
-        "email_section":"E-mail voorbereiden",
-        "email_to_doc_label":"Stuur naar documentation@tanis.com",
-        "email_extra_to":"Extra ontvanger (optioneel)",
-        "email_subject":"Onderwerp",
-        "email_body":"Bericht",
-        "email_open_btn":"📧 Open e-mail in Outlook / mail-app",
-        "email_no_recipient":"Geen ontvanger geselecteerd. Vink documentation@tanis.com aan of vul een extra ontvanger in."
-    },
-    "en": {
-        "title":"Pressure test report","language":"Language","project_info":"Project information",
-        "project_name":"Project name","manufacturer":"Manufacturer",
-        "work_order":"WO or PO + serial / serial number",
-        "drawing":"Drawing","revision":"Revision","part_line":"Part name / Line section",
-        "requirements":"Test requirements","pt":"Test pressure (Pt)","pt_unit":"Unit","notes":"Remarks",
-
-        # New fields under Test requirements
-        "test_instrument":"Test instrument",
-        "calibration_date":"Calibration date",
-
-        "comp_duration":"Compartment test duration",
-
-        "equip":"Registration test equipment","compartments":"Compartment / section","num_comp":"Number of compartments",
-        "date":"Date","start_time":"Start time","start_pressure":"Start pressure","end_time":"End time","end_pressure":"End pressure",
-        "result":"Result","remarks":"Remarks","pass":"PASS","fail":"FAIL",
-
-        "photos":"Photos per compartment","start_photo":"Start photo","end_photo":"End photo","timestamp":"Time",
-        "exif_missing":"EXIF missing – timestamp = upload moment",
-        "use_camera":"Use camera for","slot_start":"Start","slot_end":"End",
-        "selected_target":"Camera target","selected_none":"(none)",
-
-        "signature":"Signature","draw_signature":"Draw signature","sign_name":"Name","sign_company":"Company","sign_date":"Signature date",
-
-        "actions":"Actions","gen_pdf":"Generate PDF","dl_pdf":"Download PDF","reset":"Clear form",
-        "success_pdf":"PDF generated.","need_all":"Please complete all required fields.",
-
-        "unit_bar_g":"bar(g)","unit_psi_g":"PSI(g)",
-
-        # Email UI
-        "email_section":"Prepare e-mail",
-        "email_to_doc_label":"Send to documentation@tanis.com",
-        "email_extra_to":"Additional recipient (optional)",
-        "email_subject":"Subject",
-        "email_body":"Message",
-        "email_open_btn":"📧 Open e-mail in Outlook / mail app",
-        "email_no_recipient":"No recipient selected. Check documentation@tanis.com or fill an additional recipient."
-    }
-}
+MAX_COMPARTMENTS = 100
+ARCHIVE_ZIP_SPOOL_BYTES = 32 * 1024 * 1024   # grotere zip-exports via een tijdelijk bestand
+PDF_POLL_S = 0.5                             # voortgang van een PDF-job verversen
+MAIL_POLL_S = 1.0                            # status van een verzonden e-mail verversen
+UI_LOGO_WIDTH = 120
+COMPARTMENTS_EXPANDED = 4   # meer compartimenten: expanders standaard ingeklapt
 
 # ======================
-# HELPERS
+# CACHES
 # ======================
-PSI_PER_BAR = 14.5037738
-def bar_to_psi(v): return None if v is None else v * PSI_PER_BAR
-def psi_to_bar(v): return None if v is None else v / PSI_PER_BAR
-
-def fmt_duration(td, lang):
-    total_min = int(round(td.total_seconds() / 60.0))
-    h, m = divmod(total_min, 60)
-    return f"{h} uur {m} min" if lang=="nl" else f"{h} h {m} min"
-
-def exif_datetime(img: PILImage.Image):
-    try:
-        exif = img.getexif()
-        if not exif:
-            return None
-        tags = {ExifTags.TAGS.get(k, k): v for k, v in exif.items()}
-        s = tags.get("DateTimeOriginal") or tags.get("DateTime")
-        if not s:
-            return None
-        s = s.replace(":", "-", 2)
-        return datetime.strptime(s, "%Y-%m-%d %H:%M:%S")
-    except Exception:
+@st.cache_resource
+def photo_cache():
+    # Eén cache per proces, gedeeld over reruns en sessies
+    return PhotoIngestCache()
+
+@st.cache_resource
+def draft_store():
+    # Concepten (SQLite + foto-blobs) op schijf, gedeeld door alle sessies
+    return DraftStore(os.path.join(DATA_DIR, "drafts"))
+
+@st.cache_resource
+def report_archive():
+    return ReportArchive(os.path.join(DATA_DIR, "archive"))
+
+@st.cache_resource
+def ui_logo():
+    # Eén keer per proces ingelezen en verkleind (2x voor hi-dpi), niet bij elke rerun van schijf
+    if not os.path.exists(LOGO_PATH):
         return None
-
-def bytes_to_pil(b):
-    return None if not b else PILImage.open(BytesIO(b)).convert("RGB")
-
-def canvas_to_pil(canvas_image_data):
-    if canvas_image_data is None:
-        return None
-    import numpy as np
-    return PILImage.fromarray(canvas_image_data.astype("uint8")).convert("RGB")
-
-def _pil_to_rlimage(pil_img, max_w_px=400, aspect_ratio=(16, 9)):
-    """
-    Schaal afbeelding zodat deze netjes in de breedte past en in een vaste ratio wordt weergegeven.
-    Default: 16:9 en max 400 breed -> past mooi op A4 met ruimte voor tekst.
-    """
-    target_w = max_w_px
-    target_h = int(max_w_px * aspect_ratio[1] / aspect_ratio[0])  # bij 16:9 = 225px hoog bij 400px breed
-
-    w, h = pil_img.size
-    scale = target_w / float(w)
-    new_w = target_w
-    new_h = int(h * scale)
-
-    pil_img_resized = pil_img.resize((new_w, new_h), PILImage.LANCZOS)
-
-    if new_h > target_h:
-        # Te hoog: centraal croppen naar target_h
-        offset = (new_h - target_h) // 2
-        pil_img_cropped = pil_img_resized.crop((0, offset, new_w, offset + target_h))
-    else:
-        # Te laag: witte balken boven/onder (letterbox)
-        pad = PILImage.new("RGB", (new_w, target_h), "white")
-        top = (target_h - new_h) // 2
-        pad.paste(pil_img_resized, (0, top))
-        pil_img_cropped = pad
-
-    bio = BytesIO()
-    pil_img_cropped.save(bio, format="PNG")
-    bio.seek(0)
-    return RLImage(bio, width=new_w, height=target_h)
-
-# ======================
-# PDF BUILDER (altijd Engels)
-# ======================
-def build_pdf_bytes(data, logo_path=None):
-    L = "en"
-    buf = BytesIO()
-    doc = SimpleDocTemplate(
-        buf, pagesize=A4,
-        leftMargin=30, rightMargin=30, topMargin=30, bottomMargin=30
-    )
-    styles = getSampleStyleSheet()
-    story = []
-
-    # Titel
-    story += [Paragraph(f"<b>{T[L]['title']}</b>", styles["Title"]), Spacer(1, 10)]
-
-    # Meta
-    meta = data["meta"]
-    meta_rows = [
-        [T[L]["project_name"], meta["project_name"]],
-        [T[L]["manufacturer"], meta["manufacturer"]],
-        [T[L]["work_order"], meta["work_order"]],
-        [T[L]["drawing"], meta["drawing"]],
-        [T[L]["revision"], meta["revision"]],
-        [T[L]["part_line"], meta["part_line"]],
-    ]
-    meta_tbl = Table(meta_rows, colWidths=[160, 360])
-    meta_tbl.setStyle(TableStyle([
-        ("BOX",(0,0),(-1,-1),0.6,colors.black),
-        ("INNERGRID",(0,0),(-1,-1),0.3,colors.black),
-        ("VALIGN",(0,0),(-1,-1),"MIDDLE"),
-        ("BACKGROUND",(0,0),(-1,0),colors.whitesmoke),
-    ]))
-    story += [meta_tbl, Spacer(1, 10)]
-
-    # Requirements
-    req = data["requirements"]
-    pt_bar = req["pt_value"] if req["pt_unit"]=="bar" else psi_to_bar(req["pt_value"])
-    pt_psi = req["pt_value"] if req["pt_unit"]=="psi" else bar_to_psi(req["pt_value"])
-
-    test_instrument = req.get("test_instrument", "")
-    calibration_date_str = req.get("calibration_date_str", "")
-
-    req_rows = [
-        [T[L]["pt"], f"{pt_bar:.2f} {T[L]['unit_bar_g']} / {pt_psi:.2f} {T[L]['unit_psi_g']}"],
-        [T[L]["test_instrument"], test_instrument],
-        [T[L]["calibration_date"], calibration_date_str],
-        [T[L]["notes"], req["notes"]],
-    ]
-    req_tbl = Table(req_rows, colWidths=[200, 320])
-    req_tbl.setStyle(TableStyle([
-        ("BOX",(0,0),(-1,-1),0.6,colors.black),
-        ("INNERGRID",(0,0),(-1,-1),0.3,colors.black),
-        ("VALIGN",(0,0),(-1,-1),"MIDDLE"),
-        ("BACKGROUND",(0,0),(-1,0),colors.whitesmoke),
-    ]))
-    story += [Paragraph("<b>Test requirements</b>", styles["Heading3"]), req_tbl, Spacer(1, 10)]
-
-    # Registration table
-    comps = data["compartments"]
-    n = len(comps)
-    header = [""] + [str(i+1) for i in range(n)]
-    table = [header]
-    labels = ["Date","Start time","Start pressure (bar/PSI)","End time","End pressure (bar/PSI)","Result","Remarks"]
-    def v(key): return [c.get(key,"") for c in comps]
-    fp = lambda x: "" if x is None else f"{x:.2f}"
-    table += [
-        [labels[0]] + v("date_str"),
-        [labels[1]] + v("start_time_str"),
-        [labels[2]] + [f"{fp(c.get('start_bar'))}/{fp(c.get('start_psi'))}" for c in comps],
-        [labels[3]] + v("end_time_str"),
-        [labels[4]] + [f"{fp(c.get('end_bar'))}/{fp(c.get('end_psi'))}" for c in comps],
-        [labels[5]] + v("result"),
-        [labels[6]] + v("remarks"),
-    ]
-    colW = [200] + [(320/n) for _ in range(n)]
-    tbl = Table(table, colWidths=colW, repeatRows=1)
-    tbl.setStyle(TableStyle([
-        ("BOX",(0,0),(-1,-1),0.6,colors.black),
-        ("INNERGRID",(0,0),(-1,-1),0.3,colors.black),
-        ("BACKGROUND",(0,0),(-1,0),colors.lightgrey),
-        ("VALIGN",(0,0),(-1,-1),"MIDDLE"),
-    ]))
-    story += [Paragraph("<b>Test registration</b>", styles["Heading3"]), tbl, Spacer(1, 10)]
-
-    # Photos per compartment
-    story += [Paragraph("<b>Photos per compartment</b>", styles["Heading3"]), Spacer(1, 6)]
-    for i, c in enumerate(comps):
-        story += [Paragraph(f"<b>Compartment {i+1}</b>", styles["Heading4"])]
-        for tp in ["start","end"]:
-            photo = c["photos"].get(tp)
-            if not photo:
-                continue
-            story += [
-                _pil_to_rlimage(photo["img"], max_w_px=400, aspect_ratio=(16,9)),
-                Paragraph(
-                    f"{tp.capitalize()} time: {photo['ts'].strftime('%Y-%m-%d %H:%M')}"
-                    + (f" – {T[L]['exif_missing']}" if photo.get("no_exif") else ""),
-                    styles["Normal"]
-                ),
-                Spacer(1, 6)
-            ]
-            if tp == "end":
-                start_ph = c["photos"].get("start")
-                if start_ph:
-                    dur = photo["ts"] - start_ph["ts"]
-                    dur_txt = fmt_duration(dur, "en")
-                    story += [Paragraph(f"<b>{T[L]['comp_duration']}: {dur_txt}</b>", styles["Normal"]), Spacer(1, 10)]
-
-    # Signature
-    sig = data["signature"]
-    story += [Paragraph("<b>Signature</b>", styles["Heading3"])]
-    if sig.get("image_pil"):
-        # Handtekening iets breder, platter (4:1)
-        story += [_pil_to_rlimage(sig["image_pil"], max_w_px=320, aspect_ratio=(4,1)), Spacer(1, 6)]
-    sig_rows = [["Name", sig["name"]], ["Company", sig["company"]], ["Date", sig["date_str"]]]
-    sig_tbl = Table(sig_rows, colWidths=[160, 360])
-    sig_tbl.setStyle(TableStyle([
-        ("BOX",(0,0),(-1,-1),0.6,colors.black),
-        ("INNERGRID",(0,0),(-1,-1),0.3,colors.black),
-    ]))
-    story += [sig_tbl]
-
-    doc.build(story)
-    pdf = buf.getvalue()
-    buf.close()
-    return pdf
+    from PIL import Image
+    with Image.open(LOGO_PATH) as im:
+        im.thumbnail((UI_LOGO_WIDTH * 2, UI_LOGO_WIDTH * 2), Image.LANCZOS)
+        bio = BytesIO()
+        im.save(bio, format="PNG")
+    return bio.getvalue()
+
+@st.cache_resource
+def pdf_jobs():
+    # Eén begrensde pool voor PDF-generatie per proces: bij drukte wachten sessies in de rij
+    return JobQueue()
+
+@st.cache_resource
+def mail_dispatcher():
+    # Eén SMTP-pool per proces; zonder PRESSURETEST_SMTP_HOST blijft alleen de mailto-link over
+    return MailDispatcher.from_env()
 
 # ======================
 # STREAMLIT APP
 # ======================
 st.set_page_config(page_title="Druktest rapport", page_icon="🧪", layout="centered")
 
+# Opt-in instrumentatie (PRESSURETEST_INSTRUMENT=1 of ?debug=1): tijd/geheugen per fase
+st.session_state.instrument_on = instrument.enabled(st.query_params.get("debug"))
+if st.session_state.instrument_on:
+    st.session_state.setdefault("instrument_session", uuid.uuid4().hex[:12])
+    st.session_state.setdefault("instrument_runs", [])
+rerun_rec = instrument.start("rerun") if st.session_state.instrument_on else None
+
+def keep_run(record):
+    runs = st.session_state.instrument_runs
+    runs.append(record)
+    del runs[:-instrument.INSTRUMENT_MAX_RUNS]
+
+def keep_pdf(f):
+    """
+    Eén gegenereerde PDF (PdfSpool) per sessie, voor de download; de vorige wordt gesloten en
+    het tijdelijke bestand daarmee verwijderd. Bij het einde van de sessie ruimt de garbage
+    collector het laatste bestand op (anoniem tijdelijk bestand).
+    """
+    old = st.session_state.get("pdf_file")
+    if old is not None:
+        old.close()
+    st.session_state.pdf_file = f
+
+def read_pdf(f):
+    # Pas bij het klikken op download: de PDF staat niet per rerun in het geheugen
+    f.seek(0)
+    return f.read()
+
+def instrumented(label):
+    """Fragment-reruns als eigen run meten; binnen een volledige rerun is het een span."""
+    def deco(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not st.session_state.get("instrument_on"):
+                return fn(*args, **kwargs)
+            with instrument.recording(label, instrument.log_path(), sink=keep_run,
+                                      session=st.session_state.instrument_session):
+                return fn(*args, **kwargs)
+        return wrapper
+    return deco
+
 st.markdown("""
 <style>
   .stApp { background-color: #F18500; }
@@ -315,66 +142,224 @@ if "comp_data" not in st.session_state:
     st.session_state.comp_data = [{"photos":{"start":None,"end":None}} for _ in range(st.session_state.comp_count)]
 if "camera_target" not in st.session_state:
     st.session_state.camera_target = None  # {"idx": int, "slot": "start"|"end"} of None
+if "draft_id" not in st.session_state:
+    st.session_state.draft_id = DraftStore.new_id()
+if "form_gen" not in st.session_state:
+    st.session_state.form_gen = 0  # ophogen = alle uploaders leeg (na herstel van een concept)
+if "session_id" not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex[:12]  # eigenaar van PDF-jobs
+if "draft_owner" not in st.session_state:
+    # Concepten horen bij de browser: een token in de URL, dat herladen, reset en een bladwijzer
+    # overleeft; andere bezoekers van dezelfde server zien deze concepten niet
+    owner = st.query_params.get("owner", "")
+    if not (owner.isalnum() and 16 <= len(owner) <= 64):
+        owner = uuid.uuid4().hex
+        st.query_params["owner"] = owner
+    st.session_state.draft_owner = owner
+# Een hele run slaat het concept één keer op (na alle fragmenten); alleen een fragment dat los
+# opnieuw draait, slaat zelf op (fragment_autosave)
+st.session_state.autosave_pending = True
+
+# ======================
+# CONCEPTEN (autosave)
+# ======================
+DRAFT_KEYS = ["project_name", "manufacturer", "work_order", "drawing", "revision", "part_line",
+              "pt_value", "pt_unit", "test_instrument", "calibration_date", "notes", "num_comp",
+              "sign_name", "sign_company", "sign_date"]
+DRAFT_COMP_KEYS = ["date", "st", "et", "sp", "ep", "res", "rem"]
+
+def draft_fields():
+    ss = st.session_state
+    keys = DRAFT_KEYS + [f"c{i}_{k}" for i in range(ss.comp_count) for k in DRAFT_COMP_KEYS]
+    return {k: ss[k] for k in keys if k in ss}
+
+def autosave():
+    """Formulier en foto's wegschrijven; de store schrijft alleen wat sinds de vorige keer wijzigde."""
+    ss = st.session_state
+    fields = draft_fields()
+    has_photos = any(p for c in ss.comp_data for p in c["photos"].values())
+    # pt_unit heeft altijd een waarde; telt niet als invoer
+    has_text = any(isinstance(v, str) and v.strip() for k, v in fields.items() if k != "pt_unit")
+    if not (has_photos or has_text or ss.get("draft_restored")):
+        return  # leeg formulier: (nog) geen concept aanmaken
+    store = draft_store()
+    with instrument.span("draft.autosave"):
+        store.save_fields(ss.draft_id, fields, title=fields.get("project_name", ""), owner=ss.draft_owner)
+        store.save_photos(ss.draft_id, ss.comp_data, owner=ss.draft_owner)
+
+def fragment_autosave():
+    if not st.session_state.get("autosave_pending"):
+        autosave()
+
+def restore_draft(draft_id):
+    """Concept terugzetten vóór de widgets bestaan; foto's worden pas bij het tonen gedecodeerd."""
+    ss = st.session_state
+    fields, photos = draft_store().load(draft_id, owner=ss.draft_owner)
+    for k in [k for k in ss if k in DRAFT_KEYS or (k[:1] == "c" and k.split("_", 1)[-1] in DRAFT_COMP_KEYS)]:
+        del ss[k]
+    n = max([int(fields.get("num_comp", 1))] + [i + 1 for i, _slot in photos])
+    ss.comp_count = n
+    ss.comp_data = [{"photos": {"start": photos.get((i, "start")), "end": photos.get((i, "end"))}}
+                    for i in range(n)]
+    for k, v in fields.items():
+        ss[k] = v
+    ss.num_comp = n
+    ss.camera_target = None
+    ss.sig_hash, ss.sig_img = None, None
+    ss.draft_id = draft_id
+    ss.draft_restored = ss.draft_restored_msg = True
+    ss.form_gen += 1
+
+def apply_bulk_photos(plan):
+    """Bevestigde bulk-toewijzing [(comp, slot, foto)] zetten vóór de widgets bestaan."""
+    ss = st.session_state
+    n = max([ss.comp_count] + [i + 1 for i, _slot, _p in plan])
+    ss.comp_data += [{"photos": {"start": None, "end": None}} for _ in range(n - len(ss.comp_data))]
+    for i, slot, photo in plan:
+        ss.comp_data[i]["photos"][slot] = photo
+    ss.comp_count = n
+    ss.pop("num_comp", None)   # het aantal-veld neemt comp_count opnieuw als startwaarde
+    ss.camera_target = None
+    ss.bulk_assigned_msg = len(plan)
+
+if "bulk_apply" in st.session_state:
+    apply_bulk_photos(st.session_state.pop("bulk_apply"))
 
 # Language
 lang = st.sidebar.selectbox("Language / Taal", ["nl","en"], index=0)
 _ = T[lang]
 
+with st.sidebar.expander(_["drafts"]):
+    ss = st.session_state
+    drafts = [d for d in draft_store().list_drafts(ss.draft_owner) if d["id"] != ss.draft_id]
+    if not drafts:
+        st.caption(_["drafts_none"])
+    for d in drafts:
+        dc1, dc2, dc3 = st.columns([4, 2, 1])
+        dc1.caption(f"**{d['title'] or _['draft_untitled']}**  \n{d['updated']:%d-%m %H:%M} · {d['photos']} 📷")
+        if dc2.button(_["draft_restore"], key=f"draft_restore_{d['id']}"):
+            restore_draft(d["id"])
+            st.rerun()
+        if ss.get("draft_delete_pending") == d["id"]:
+            # Verwijderen pas na bevestiging
+            cc1, cc2 = st.columns(2)
+            if cc1.button(_["draft_delete_confirm"], key=f"draft_delete_ok_{d['id']}", type="primary"):
+                draft_store().delete(d["id"], owner=ss.draft_owner)
+                ss.draft_delete_pending = None
+                st.rerun()
+            if cc2.button(_["draft_keep"], key=f"draft_keep_{d['id']}"):
+                ss.draft_delete_pending = None
+                st.rerun()
+        elif dc3.button("🗑", key=f"draft_delete_{d['id']}", help=_["draft_delete"]):
+            ss.draft_delete_pending = d["id"]
+            st.rerun()
+    if st.session_state.pop("draft_restored_msg", False):
+        st.success(_["draft_restored"])
+
 # ===== LOGO + TITEL BOVENAAN =====
 top_logo_col, top_title_col = st.columns([1, 4])
 with top_logo_col:
-    if os.path.exists(LOGO_PATH):
-        st.image(LOGO_PATH, width=120)
+    logo = ui_logo()
+    if logo is not None:
+        st.image(logo, width=UI_LOGO_WIDTH)
 with top_title_col:
     st.title(_["title"])
 
 # META
 st.subheader(_["project_info"])
 m1, m2 = st.columns(2)
-project_name = m1.text_input(_["project_name"], "")
-manufacturer = m2.text_input(_["manufacturer"], "")
-work_order = st.text_input(_["work_order"], "")
-drawing = st.text_input(_["drawing"], "")
-revision = st.text_input(_["revision"], "")
-part_line = st.text_input(_["part_line"], "")
+project_name = m1.text_input(_["project_name"], "", key="project_name")
+manufacturer = m2.text_input(_["manufacturer"], "", key="manufacturer")
+work_order = st.text_input(_["work_order"], "", key="work_order")
+drawing = st.text_input(_["drawing"], "", key="drawing")
+revision = st.text_input(_["revision"], "", key="revision")
+part_line = st.text_input(_["part_line"], "", key="part_line")
 
 # REQUIREMENTS
 st.markdown(f"### {_['requirements']}")
 r1, r2 = st.columns(2)
-pt_value = r1.number_input(_["pt"], min_value=0.0, step=0.1, format="%.2f")
+pt_value = r1.number_input(_["pt"], min_value=0.0, step=0.1, format="%.2f", key="pt_value")
 pt_unit_choice = r2.selectbox(
     _["pt_unit"], ["bar","psi"], index=0,
-    format_func=lambda x: _["unit_bar_g"] if x=="bar" else _["unit_psi_g"]
+    format_func=lambda x: _["unit_bar_g"] if x=="bar" else _["unit_psi_g"], key="pt_unit"
 )
 
 r3, r4 = st.columns(2)
-test_instrument = r3.text_input(_["test_instrument"], "")
-calibration_date = r4.date_input(_["calibration_date"], value=date.today())
+test_instrument = r3.text_input(_["test_instrument"], "", key="test_instrument")
+calibration_date = r4.date_input(_["calibration_date"], value=date.today(), key="calibration_date")
 
-notes = st.text_area(_["notes"], "")
+notes = st.text_area(_["notes"], "", key="notes")
 
 # COMPARTMENTS (counts)
 st.markdown(f"### {_['equip']}")
-comp_count = st.selectbox(_["num_comp"], [1,2,3,4], index=st.session_state.comp_count-1)
+comp_count = int(st.number_input(_["num_comp"], min_value=1, max_value=MAX_COMPARTMENTS,
+                                 value=st.session_state.comp_count, step=1, key="num_comp"))
 if comp_count != st.session_state.comp_count:
+    # Aantal aanpassen zonder ingevulde compartimenten (en hun foto's) te verliezen
+    cd = st.session_state.comp_data[:comp_count]
+    cd += [{"photos":{"start":None,"end":None}} for _ in range(comp_count - len(cd))]
+    st.session_state.comp_data = cd
     st.session_state.comp_count = comp_count
-    st.session_state.comp_data = [{"photos":{"start":None,"end":None}} for _ in range(comp_count)]
+    tgt = st.session_state.camera_target
+    if tgt and tgt["idx"] >= comp_count:
+        st.session_state.camera_target = None
+
+# Elk compartiment, de camera en de handtekening zijn een eigen fragment: een wijziging daarbinnen
+# draait alleen dat blok opnieuw. Waarden worden daarom via session_state (widget-keys) gelezen.
+def logger_import(i, up, pt_bar, _):
+    """
+    Loggerbestand van compartiment i analyseren (alleen als het bestand nieuw is) en de
+    velden vooraf invullen; moet vóór de compartiment-widgets draaien.
+    """
+    cd = st.session_state.comp_data[i]
+    if up is None:
+        cd.pop("logger", None)
+        return
+    b = up.getvalue()
+    if cd.get("logger") and cd["logger"]["key"] == photo_key(b):
+        return
+    try:
+        with instrument.span("logger.import"):
+            analysis = analyze_hold(load_logger_csv(b))
+    except ValueError as e:
+        st.error(f"{_['logger_invalid']}: {e}")
+        return
+    cd["logger"] = analysis
+    ss = st.session_state
+    ss[f"c{i}_sp"], ss[f"c{i}_ep"] = round(analysis["start_bar"], 2), round(analysis["end_bar"], 2)
+    verdict, _reason = suggest_result(analysis, pt_bar)
+    ss[f"c{i}_res"] = _["pass"] if verdict == "PASS" else _["fail"]
+    times = logger_times(analysis)
+    if times:
+        ss[f"c{i}_date"], ss[f"c{i}_st"], ss[f"c{i}_et"] = times[0].date(), times[0].time(), times[1].time()
+
+@st.fragment
+@instrumented("fragment.compartment")
+def compartment_block(i, lang, pt_bar):
+    _ = T[lang]
+    labels = [_["date"],_["start_time"],_["start_pressure"],_["end_time"],_["end_pressure"],_["result"],_["remarks"]]
+    # Bij veel compartimenten standaard ingeklapt, anders wordt de pagina onwerkbaar lang
+    with st.expander(f"{_['compartments']} {i+1}", expanded=st.session_state.comp_count <= COMPARTMENTS_EXPANDED):
+        log_up = st.file_uploader(_["logger_csv"], type=["csv","txt"], key=f"c{i}_log_up_{st.session_state.form_gen}")
+        logger_import(i, log_up, pt_bar, _)
+        analysis = st.session_state.comp_data[i].get("logger")
+        if analysis:
+            verdict, reason = suggest_result(analysis, pt_bar)
+            st.caption(fmt_summary(analysis))
+            st.caption(f"{_['logger_suggest']}: **{verdict}** ({reason})")
+            st.line_chart({"h": analysis["chart_t"], "bar(g)": analysis["chart_p"]}, x="h", y="bar(g)", height=180)
 
-labels = [_["date"],_["start_time"],_["start_pressure"],_["end_time"],_["end_pressure"],_["result"],_["remarks"]]
-comps = []
-for i in range(st.session_state.comp_count):
-    with st.expander(f"{_['compartments']} {i+1}", expanded=True):
         cA, cB = st.columns(2)
-        cd = cA.date_input(labels[0], value=date.today(), key=f"c{i}_date")
-        cst = cA.time_input(labels[1], value=time(9,0), key=f"c{i}_st")
-        cet = cA.time_input(labels[3], value=time(10,0), key=f"c{i}_et")
-        csp = cB.number_input(labels[2] + f" ({_['unit_bar_g']})",
-                              min_value=0.0, step=0.1, format="%.2f", key=f"c{i}_sp")
-        cep = cB.number_input(labels[4] + f" ({_['unit_bar_g']})",
-                              min_value=0.0, step=0.1, format="%.2f", key=f"c{i}_ep")
-        res = st.radio(labels[5], options=["", _["pass"], _["fail"]],
-                       index=0, horizontal=True, key=f"c{i}_res")
-        rem = st.text_input(labels[6], "", key=f"c{i}_rem")
+        cA.date_input(labels[0], value=date.today(), key=f"c{i}_date")
+        cA.time_input(labels[1], value=time(9,0), key=f"c{i}_st")
+        cA.time_input(labels[3], value=time(10,0), key=f"c{i}_et")
+        cB.number_input(labels[2] + f" ({_['unit_bar_g']})",
+                        min_value=0.0, step=0.1, format="%.2f", key=f"c{i}_sp")
+        cB.number_input(labels[4] + f" ({_['unit_bar_g']})",
+                        min_value=0.0, step=0.1, format="%.2f", key=f"c{i}_ep")
+        st.radio(labels[5], options=["", _["pass"], _["fail"]],
+                 index=0, horizontal=True, key=f"c{i}_res")
+        st.text_input(labels[6], "", key=f"c{i}_rem")
 
         for slot in ["start","end"]:
             st.markdown(f"**{_['compartments']} {i+1} – {_[slot+'_photo']}**")
@@ -383,93 +368,227 @@ for i in range(st.session_state.comp_count):
                 if st.button(f"{_['use_camera']} ({_['slot_start'] if slot=='start' else _['slot_end']})",
                              key=f"c{i}_{slot}_usecam"):
                     st.session_state.camera_target = {"idx": i, "slot": slot}
+                    st.rerun()  # camerablok buiten dit fragment moet het nieuwe doel tonen
             with bcol2:
-                up = st.file_uploader("", type=["png","jpg","jpeg"], key=f"c{i}_{slot}_up")
-                if up is not None:
-                    img = bytes_to_pil(up.getvalue())
-                    dt = exif_datetime(img)
-                    if dt:
-                        ts = dt
-                        no_exif = False
+                up = st.file_uploader("", type=["png","jpg","jpeg"], key=f"c{i}_{slot}_up_{st.session_state.form_gen}")
+                # Alleen een nieuwe upload toewijzen: een foto uit de bulk-upload of de camera
+                # wordt anders bij elke rerun weer door het bestand in deze uploader vervangen
+                seen_key = f"c{i}_{slot}_up_seen"
+                if up is not None and st.session_state.get(seen_key) != up.file_id:
+                    st.session_state[seen_key] = up.file_id
+                    with instrument.span("photo.ingest"):
+                        entry = ingest_or_none(photo_cache(), up.getvalue())
+                    if entry is None:
+                        # Zelfde melding als bij de bulk-upload; de huidige foto blijft staan
+                        st.warning(_["bulk_unreadable"].format(n=1, names=up.name))
                     else:
-                        ts = datetime.now().replace(second=0, microsecond=0)
-                        no_exif = True
-                        st.warning(_["exif_missing"])
-                    st.session_state.comp_data[i]["photos"][slot] = {
-                        "img": img, "ts": ts, "no_exif": no_exif
-                    }
+                        dt = entry["exif_dt"]
+                        if dt:
+                            ts = dt
+                            no_exif = False
+                        else:
+                            ts = datetime.now().replace(second=0, microsecond=0)
+                            no_exif = True
+                            st.warning(_["exif_missing"])
+                        if photo_fits_budget(st.session_state.comp_data, entry, i, slot):
+                            st.session_state.comp_data[i]["photos"][slot] = session_photo(entry, ts, no_exif)
+                        else:
+                            st.error(_["photo_budget"])
 
             photo = st.session_state.comp_data[i]["photos"][slot]
             if photo:
                 st.image(
-                    photo["img"],
+                    photo_preview(photo),
                     caption=f"{_['timestamp']}: {photo['ts'].strftime('%Y-%m-%d %H:%M')}"
                             + ("  ⚠" if photo.get("no_exif") else ""),
                     use_container_width=True
                 )
+    fragment_autosave()
+
+def comp_record(i):
+    """Compartimentgegevens uit session_state, ook als het fragment deze run niet draaide."""
+    ss = st.session_state
+    cd, cst, cet = ss[f"c{i}_date"], ss[f"c{i}_st"], ss[f"c{i}_et"]
+    csp, cep = ss[f"c{i}_sp"], ss[f"c{i}_ep"]
+    return {
+        "date": cd, "date_str": cd.strftime("%Y-%m-%d"),
+        "start_time": cst, "start_time_str": cst.strftime("%H:%M"),
+        "end_time": cet, "end_time_str": cet.strftime("%H:%M"),
+        "start_bar": float(csp) if csp is not None else None,
+        "start_psi": bar_to_psi(float(csp) if csp is not None else None),
+        "end_bar": float(cep) if cep is not None else None,
+        "end_psi": bar_to_psi(float(cep) if cep is not None else None),
+        "result": ss[f"c{i}_res"], "remarks": ss[f"c{i}_rem"],
+        "photos": ss.comp_data[i]["photos"],
+        "logger": ss.comp_data[i].get("logger"),
+    }
 
-        comps.append({
-            "date": cd, "date_str": cd.strftime("%Y-%m-%d"),
-            "start_time": cst, "start_time_str": cst.strftime("%H:%M"),
-            "end_time": cet, "end_time_str": cet.strftime("%H:%M"),
-            "start_bar": float(csp) if csp is not None else None,
-            "start_psi": bar_to_psi(float(csp) if csp is not None else None),
-            "end_bar": float(cep) if cep is not None else None,
-            "end_psi": bar_to_psi(float(cep) if cep is not None else None),
-            "result": res, "remarks": rem,
-            "photos": st.session_state.comp_data[i]["photos"]
-        })
+@st.fragment
+@instrumented("fragment.bulk_photos")
+def bulk_photo_block(lang):
+    """Alle foto's in één upload; op EXIF-tijd verdeeld over de compartimenten, na controle."""
+    _ = T[lang]
+    ss = st.session_state
+    if ss.get("bulk_assigned_msg"):
+        st.success(_["bulk_assigned"].format(n=ss.pop("bulk_assigned_msg")))
+    with st.expander(_["bulk_photos"]):
+        st.caption(_["bulk_help"])
+        ups = st.file_uploader(_["bulk_upload"], type=["png","jpg","jpeg"], accept_multiple_files=True,
+                               key=f"bulk_up_{ss.form_gen}_{ss.get('bulk_gen', 0)}")
+        if not ups:
+            return
+        # Ingest één keer per uploadset: de procescache is te klein voor tientallen foto's tegelijk
+        ids = tuple(u.file_id for u in ups)
+        if ss.get("bulk_ingest", (None,))[0] != ids:
+            with instrument.span("photo.bulk_ingest"):
+                ss.bulk_ingest = (ids, ingest_many(photo_cache(), [u.getvalue() for u in ups]))
+        entries = ss.bulk_ingest[1]
+
+        first_free = next((i for i, c in enumerate(ss.comp_data) if not any(c["photos"].values())),
+                          len(ss.comp_data))
+        first = int(st.number_input(_["bulk_first"], min_value=1, max_value=MAX_COMPARTMENTS,
+                                    value=min(first_free + 1, MAX_COMPARTMENTS), step=1)) - 1
+        plan = chronological_slots(entries, first)
+        assignments = {(i, slot): entries[n] for i, slot, n in plan}
+        replaced = sum(1 for i, slot in assignments if i < len(ss.comp_data) and ss.comp_data[i]["photos"][slot])
+
+        # Controle: per compartiment begin- en eindfoto naast elkaar, met bestandsnaam en tijd
+        for i in sorted({i for i, _slot, _n in plan}):
+            cols = st.columns(2)
+            for col, slot in zip(cols, ["start", "end"]):
+                n = next((n for j, s, n in plan if (j, s) == (i, slot)), None)
+                if n is None:
+                    continue
+                dt = entries[n]["exif_dt"]
+                col.image(entries[n]["preview"], use_container_width=True,
+                          caption=f"{_['compartments']} {i+1} – {_['slot_' + slot]}: {ups[n].name}, "
+                                  + (dt.strftime("%Y-%m-%d %H:%M") if dt else "⚠ " + _["bulk_no_exif"]))
+        unreadable = [u.name for u, e in zip(ups, entries) if e is None]
+        if unreadable:
+            st.warning(_["bulk_unreadable"].format(n=len(unreadable), names=", ".join(unreadable)))
+        skipped = len(ups) - len(unreadable) - len(plan)
+        if skipped:
+            st.caption(_["bulk_duplicates"].format(n=skipped))
+        if not plan:
+            return
+        if replaced:
+            st.warning(_["bulk_replaces"].format(n=replaced))
+
+        too_many = plan[-1][0] >= MAX_COMPARTMENTS
+        fits = bulk_fits_budget(ss.comp_data, assignments)
+        if too_many:
+            st.error(_["bulk_too_many"].format(max=MAX_COMPARTMENTS))
+        elif not fits:
+            st.error(_["photo_budget"])
+        if st.button(_["bulk_confirm"].format(n=len(plan)), type="primary", disabled=too_many or not fits):
+            now = datetime.now().replace(second=0, microsecond=0)
+            ss.bulk_apply = [(i, slot, session_photo(entries[n], entries[n]["exif_dt"] or now,
+                                                     entries[n]["exif_dt"] is None))
+                             for i, slot, n in plan]
+            ss.bulk_gen = ss.get("bulk_gen", 0) + 1   # uploader leeg
+            ss.pop("bulk_ingest", None)
+            st.rerun()  # toewijzen vóór de widgets (aantal compartimenten kan groeien)
+
+bulk_photo_block(lang)
+
+pt_bar = pt_value if pt_unit_choice == "bar" else psi_to_bar(pt_value)
+for i in range(st.session_state.comp_count):
+    compartment_block(i, lang, pt_bar)
+comps = [comp_record(i) for i in range(st.session_state.comp_count)]
 
 # SINGLE CAMERA
-st.divider()
-cam_hdr = st.columns([1,2,2])
-cam_hdr[0].write(f"🎥 {_['use_camera']}")
-target = st.session_state.camera_target
-cam_hdr[1].write(
-    f"{_['selected_target']}: " + (
-        f"{_['compartments']} {target['idx']+1} – "
-        f"{_['slot_start' if target and target.get('slot')=='start' else 'slot_end']}"
-        if target else _['selected_none']
+@st.fragment
+@instrumented("fragment.camera")
+def camera_block(lang):
+    _ = T[lang]
+    cam_hdr = st.columns([1,2,2])
+    cam_hdr[0].write(f"🎥 {_['use_camera']}")
+    target = st.session_state.camera_target
+    cam_hdr[1].write(
+        f"{_['selected_target']}: " + (
+            f"{_['compartments']} {target['idx']+1} – "
+            f"{_['slot_start' if target and target.get('slot')=='start' else 'slot_end']}"
+            if target else _['selected_none']
+        )
     )
-)
-
-if target:
-    cam = st.camera_input("")
-    if cam is not None:
-        img = bytes_to_pil(cam.getvalue())
-        ts = datetime.now().replace(second=0, microsecond=0)
-        st.session_state.comp_data[target["idx"]]["photos"][target["slot"]] = {
-            "img": img, "ts": ts, "no_exif": False
-        }
-        st.session_state.camera_target = None
+    if st.session_state.pop("camera_assigned", False):
         st.success("Photo captured and assigned.")
 
+    if target:
+        cam = st.camera_input("")
+        if cam is not None:
+            with instrument.span("camera.ingest"):
+                entry = photo_cache().ingest(cam.getvalue())
+            ts = datetime.now().replace(second=0, microsecond=0)
+            if photo_fits_budget(st.session_state.comp_data, entry, target["idx"], target["slot"]):
+                st.session_state.comp_data[target["idx"]]["photos"][target["slot"]] = session_photo(entry, ts, False)
+                st.session_state.camera_target = None
+                st.session_state.camera_assigned = True
+                st.rerun()  # compartiment-fragment moet de nieuwe foto tonen
+            else:
+                st.error(_["photo_budget"])
+
+st.divider()
+camera_block(lang)
+
 # SIGNATURE
+@st.fragment
+@instrumented("fragment.signature")
+def signature_block(lang):
+    _ = T[lang]
+    sg1, sg2 = st.columns([2,1])
+    with sg1:
+        st.write(_["draw_signature"])
+        from streamlit_drawable_canvas import st_canvas  # trekt numpy mee; pas hier nodig
+        # Geen rerun per pennenstreek: de handtekening komt pas binnen als de gebruiker bevestigt
+        canv = st_canvas(
+            fill_color="rgba(0,0,0,0)", stroke_width=2, stroke_color="#000000",
+            background_color="#FFFFFF", update_streamlit=False, height=170,
+            drawing_mode="freedraw", key="sig_canvas"
+        )
+        st.caption(_["sig_confirm"])
+        data = canv.image_data if canv is not None else None
+        if data is None:
+            st.session_state.sig_hash, st.session_state.sig_img = None, None
+        else:
+            # Alleen opnieuw converteren + bijsnijden als de canvasinhoud echt veranderd is
+            h = photo_key(data.tobytes())
+            if h != st.session_state.get("sig_hash"):
+                st.session_state.sig_hash = h
+                with instrument.span("signature.canvas_to_pil"):
+                    st.session_state.sig_img = canvas_to_pil(data)
+    with sg2:
+        st.text_input(_["sign_name"], "", key="sign_name")
+        st.text_input(_["sign_company"], "", key="sign_company")
+        st.date_input(_["sign_date"], value=date.today(), key="sign_date")
+    fragment_autosave()
+
 st.markdown(f"### {_['signature']}")
-sg1, sg2 = st.columns([2,1])
-with sg1:
-    st.write(_["draw_signature"])
-    canv = st_canvas(
-        fill_color="rgba(0,0,0,0)", stroke_width=2, stroke_color="#000000",
-        background_color="#FFFFFF", update_streamlit=True, height=170,
-        drawing_mode="freedraw", key="sig_canvas"
-    )
-    sig_img = canvas_to_pil(canv.image_data) if canv is not None else None
-with sg2:
-    sign_name = st.text_input(_["sign_name"], "")
-    sign_company = st.text_input(_["sign_company"], "")
-    sign_date = st.date_input(_["sign_date"], value=date.today())
+signature_block(lang)
+sig_img = st.session_state.sig_img
+sign_name = st.session_state.sign_name
+sign_company = st.session_state.sign_company
+sign_date = st.session_state.sign_date
 
 # ACTIONS
 st.markdown(f"### {_['actions']}")
 b1, b2 = st.columns(2)
-gen = b1.button(_["gen_pdf"], type="primary")
+pdf_job = pdf_jobs().get(st.session_state.get("pdf_job"))
+gen = b1.button(_["gen_pdf"], type="primary", disabled=pdf_job is not None and pdf_job.active)
 reset = b2.button(_["reset"])
 if reset:
+    # Het concept blijft in de lijst staan; de nieuwe sessie krijgt een nieuw concept-id
+    if pdf_job is not None:
+        pdf_jobs().discard(pdf_job.id)
+    keep_pdf(None)
     st.session_state.clear()
-    st.experimental_rerun()
+    st.rerun()
+
+autosave()
+st.session_state.autosave_pending = False
 
 # VALIDATION & PDF
+@instrument.timed("validate.meta")
 def _meta_ok():
     return all([
         project_name.strip(),
@@ -480,6 +599,7 @@ def _meta_ok():
         part_line.strip()
     ])
 
+@instrument.timed("validate.req")
 def _req_ok():
     return (
         pt_value is not None and pt_value > 0.0 and pt_unit_choice in ("bar","psi")
@@ -487,6 +607,7 @@ def _req_ok():
         and calibration_date is not None
     )
 
+@instrument.timed("validate.comps")
 def _comps_ok():
     for c in comps:
         if (c["start_bar"] is None) or (c["end_bar"] is None) or (c["result"] not in (_["pass"], _["fail"])):
@@ -495,10 +616,81 @@ def _comps_ok():
             return False
     return True
 
+@instrument.timed("validate.sig")
 def _sig_ok():
     return bool(sign_name.strip()) and bool(sign_company.strip()) and bool(sign_date) and (sig_img is not None)
 
-pdf_bytes = None
+def generate_pdf(job, pdf_data, cache, archive, fname, instrument_session=None):
+    """
+    Draait in een worker-thread van pdf_jobs(): geen st.*-aanroepen hier. Met `instrument_session`
+    is de job een eigen meting ("pdf.job", met de pdf.*-spans): de rerun die hem indiende is dan
+    al afgerond. Het record gaat naar de log en naar job.info["instrument"] voor het debugpaneel.
+    """
+    from pressuretest.pdf import PDF_IMAGE_WORKERS, build_pdf_file
+
+    measure = (instrument.recording("pdf.job", instrument.log_path(), session=instrument_session,
+                                    sink=partial(job.info.__setitem__, "instrument"))
+               if instrument_session else nullcontext())
+    with measure:
+        # De beeldthreads delen over de gelijktijdige jobs, zodat het totaal begrensd blijft
+        pdf_file = build_pdf_file(pdf_data, logo_path=LOGO_PATH, cache=cache, progress=job.report,
+                                  workers=max(1, PDF_IMAGE_WORKERS // JOB_WORKERS))
+        try:
+            job.info["report_id"] = archive.add(pdf_data, pdf_file, fname)
+        except BaseException:
+            pdf_file.close()
+            raise
+    pdf_file.seek(0)
+    job.info["fname"] = fname
+    return pdf_file
+
+@instrumented("fragment.pdf_job")
+def pdf_job_status(lang):
+    _ = T[lang]
+    jobs = pdf_jobs()
+    job = jobs.get(st.session_state.get("pdf_job"))
+    if job is None:
+        st.session_state.pdf_job = None
+        return
+    if job.active:
+        if job.state == QUEUED:
+            st.info(_["pdf_queued"].format(pos=jobs.position(job)))
+        else:
+            sec, sec_n = job.progress.get("sections", (0, 0))
+            img, img_n = job.progress.get("images", (0, 0))
+            st.progress(job.fraction(), text=_["pdf_progress"].format(sec=sec, sec_n=sec_n, img=img, img_n=img_n))
+        if st.button(_["pdf_cancel"], key="pdf_cancel"):
+            job.cancel()
+        return
+    # Klaar: de sessie neemt het resultaat over en de hele pagina toont de download
+    jobs.take(job.id)
+    st.session_state.pdf_job = None
+    if job.info.get("instrument") and st.session_state.get("instrument_on"):
+        keep_run(job.info["instrument"])
+    if job.state == DONE:
+        keep_pdf(job.result)
+        st.session_state.pdf_info = job.info
+    elif job.state == FAILED:
+        st.session_state.pdf_error = job.error
+    st.rerun()
+
+@instrumented("fragment.mail")
+def mail_status(lang):
+    _ = T[lang]
+    mailer = mail_dispatcher()
+    mail = mailer.get(st.session_state.get("mail_id"))
+    if mail is not None and mail.active:
+        if mail.error:
+            st.warning(_["email_retry"].format(n=mail.attempts + 1, max=mailer.max_attempts, err=mail.error))
+        else:
+            st.info(_["email_queued"])
+        return
+    # Klaar (of verdwenen): uitslag vastleggen en het polling-fragment weghalen
+    st.session_state.mail_id = None
+    if mail is not None:
+        st.session_state.mail_result = (mail.state, ", ".join(mail.to), mail.error)
+    st.rerun()
+
 if gen:
     missing = []
     if not _meta_ok(): missing.append(_["project_info"])
@@ -534,15 +726,51 @@ if gen:
             "image_pil": sig_img
         }
 
-        pdf_data = {"meta": meta, "requirements": req, "compartments": comps, "signature": signature}
-        pdf_bytes = build_pdf_bytes(pdf_data, logo_path=None)
-        st.success(_["success_pdf"])
-
-if pdf_bytes:
-    fname = f"{datetime.now().strftime('%Y-%m-%d')}_{(project_name or 'Project').replace(' ','_')}_Report.pdf"
-    st.download_button(_["dl_pdf"], data=pdf_bytes, file_name=fname, mime="application/pdf")
-
-    # ===== E-MAIL VOORBEREIDEN (mailto) =====
+        # Momentopname voor de job: comp_data[i]["photos"] wordt in de UI in-place aangepast, en de
+        # PDF en het archiefrecord moeten dezelfde foto's tonen, ook als er tijdens het bouwen
+        # een foto vervangen wordt
+        snapshot = [dict(c, photos=dict(c["photos"]), logger=dict(c["logger"]) if c["logger"] else None)
+                    for c in comps]
+        pdf_data = {"meta": meta, "requirements": req, "compartments": snapshot, "signature": signature}
+        from pressuretest.pdf import pdf_cache_entries
+
+        # Groeit mee met het aantal compartimenten, anders verdringen de foto's van één rapport
+        # elkaar en wordt bij opnieuw genereren alles opnieuw gecodeerd
+        cache_entries = pdf_cache_entries(len(comps))
+        if "pdf_cache" not in st.session_state:
+            st.session_state.pdf_cache = LRUCache(cache_entries)
+        st.session_state.pdf_cache.max_entries = max(st.session_state.pdf_cache.max_entries, cache_entries)
+        fname = f"{datetime.now().strftime('%Y-%m-%d')}_{safe_filename(project_name)}_Report.pdf"
+        keep_pdf(None)
+        st.session_state.pdf_error = None
+        st.session_state.mail_result = None
+        # Bouwen en archiveren in de achtergrond; deze rerun is direct klaar
+        try:
+            with instrument.span("pdf.submit"):
+                job = pdf_jobs().submit(st.session_state.session_id, generate_pdf, pdf_data=pdf_data,
+                                        cache=st.session_state.pdf_cache, archive=report_archive(), fname=fname,
+                                        instrument_session=st.session_state.get("instrument_session")
+                                        if st.session_state.instrument_on else None)
+            st.session_state.pdf_job = job.id
+        except JobRejected as e:
+            if e.reason == "full":
+                st.warning(_["pdf_busy"])
+            # "owner": deze sessie heeft al een job lopen (dubbelklik); de voortgang staat hieronder
+
+if st.session_state.get("pdf_job"):
+    st.fragment(run_every=PDF_POLL_S)(pdf_job_status)(lang)
+if st.session_state.get("pdf_error"):
+    st.error(_["pdf_failed"].format(err=st.session_state.pdf_error))
+
+pdf_file = st.session_state.get("pdf_file")
+if pdf_file is not None:
+    pdf_info = st.session_state.pdf_info
+    st.success(_["success_pdf"])
+    st.caption(_["archive_saved"].format(id=pdf_info["report_id"]))
+    st.download_button(_["dl_pdf"], data=partial(read_pdf, pdf_file), file_name=pdf_info["fname"],
+                       mime="application/pdf", on_click="ignore")
+
+    # ===== E-MAIL (SMTP-dispatcher, anders mailto) =====
     st.markdown(f"### {_['email_section']}")
 
     send_to_doc = st.checkbox(_["email_to_doc_label"], value=True)
@@ -564,7 +792,27 @@ if pdf_bytes:
     if extra_recipient.strip():
         recipients.append(extra_recipient.strip())
 
-    if recipients:
+    mailer = mail_dispatcher()
+    if recipients and mailer is not None:
+        # Server-side versturen, met de PDF uit het archief als bijlage; de UI wacht er niet op
+        mail = mailer.get(st.session_state.get("mail_id"))
+        if st.button(_["email_send_btn"], type="primary", disabled=mail is not None and mail.active):
+            try:
+                mail = mailer.submit(recipients, subject, body, attachments=[
+                    (pdf_info["fname"], partial(report_archive().pdf, pdf_info["report_id"]))])
+                st.session_state.mail_id, st.session_state.mail_result = mail.id, None
+            except ValueError as e:
+                st.error(_["email_invalid"].format(addr=e))
+        if st.session_state.get("mail_id"):
+            st.fragment(run_every=MAIL_POLL_S)(mail_status)(lang)
+        mail_result = st.session_state.get("mail_result")
+        if mail_result:
+            state, to, err = mail_result
+            if state == SENT:
+                st.success(_["email_sent"].format(to=to))
+            else:
+                st.error(_["email_failed"].format(err=err))
+    elif recipients:
         to_str = ",".join(recipients)
         subject_enc = urllib.parse.quote(subject)
         body_enc = urllib.parse.quote(body)
@@ -574,3 +822,68 @@ if pdf_bytes:
         st.caption("Na openen nog even de PDF handmatig als bijlage toevoegen.")
     else:
         st.info(_["email_no_recipient"])
+
+# ===== ARCHIEF =====
+def archive_zip(filters):
+    # Eén PDF tegelijk van schijf de zip in; boven de drempel via een tijdelijk bestand. De
+    # download-callable moet bytes (of BytesIO/BufferedReader) geven, geen SpooledTemporaryFile
+    archive = report_archive()
+    with tempfile.SpooledTemporaryFile(max_size=ARCHIVE_ZIP_SPOOL_BYTES) as buf:
+        archive.export_zip(archive.iter_search(**filters), buf)
+        buf.seek(0)
+        return buf.read()
+
+@st.fragment
+@instrumented("fragment.archive")
+def archive_block(lang):
+    _ = T[lang]
+    with st.expander(_["archive"]):
+        a1, a2 = st.columns(2)
+        filters = {
+            "project_name": a1.text_input(_["project_name"], key="arch_project_name"),
+            "work_order": a2.text_input(_["work_order"], key="arch_work_order"),
+            "drawing": a1.text_input(_["drawing"], key="arch_drawing"),
+            "revision": a2.text_input(_["revision"], key="arch_revision"),
+            "date_from": a1.date_input(_["archive_from"], value=None, key="arch_from"),
+            "date_to": a2.date_input(_["archive_to"], value=None, key="arch_to"),
+        }
+        archive = report_archive()
+        with instrument.span("archive.search"):
+            rows = archive.search(**filters)
+            total = archive.count(**filters)
+        st.caption(_["archive_found"].format(n=total, shown=len(rows)))
+        if not rows:
+            return
+        st.dataframe([{k: r[k] for k in ("id", "test_date", "project_name", "work_order", "drawing",
+                                         "revision", "result", "filename")} for r in rows],
+                     hide_index=True, use_container_width=True)
+        by_id = {r["id"]: r for r in rows}
+        d1, d2 = st.columns(2)
+        pick = d1.selectbox(_["archive_pick"], list(by_id), key="arch_pick",
+                            format_func=lambda i: f"#{i} {by_id[i]['filename']}")
+        # Uitgestelde downloads: PDF en zip worden pas bij het klikken gelezen/gebouwd
+        d1.download_button(_["dl_pdf"], data=partial(archive.pdf, pick), file_name=by_id[pick]["filename"],
+                           mime="application/pdf", key="arch_dl", on_click="ignore")
+        d2.download_button(_["archive_export"].format(n=total), data=partial(archive_zip, filters),
+                           mime="application/zip", file_name=f"{date.today():%Y-%m-%d}_archive.zip",
+                           key="arch_dl_zip", on_click="ignore")
+
+st.divider()
+archive_block(lang)
+
+# ===== DEBUG-PANEEL (alleen met instrumentatie aan) =====
+if rerun_rec is not None:
+    keep_run(instrument.stop(rerun_rec, instrument.log_path(), session=st.session_state.instrument_session))
+    with st.sidebar.expander("⏱ Debug: timing", expanded=True):
+        runs = st.session_state.instrument_runs
+        last = runs[-1]
+        rss = f", RSS Δ {last['rss_delta_kb']/1024:.1f} MB" if last["rss_delta_kb"] is not None else ""
+        st.caption(f"{last['label']} {last['ts'][11:]}: {last['total_ms']:.0f} ms{rss} (spans kunnen genest zijn)")
+        rows = ["| fase | n | totaal ms | max ms | RSS Δ KB |", "|---|---:|---:|---:|---:|"]
+        rows += [f"| {a['name']} | {a['count']} | {a['total_ms']:.1f} | {a['max_ms']:.1f} | {a['rss_kb']} |"
+                 for a in instrument.summarize(last["spans"])]
+        st.markdown("\n".join(rows))
+        if len(runs) > 1:
+            st.caption("Recente runs: " + ", ".join(f"{r['label']} {r['total_ms']:.0f} ms" for r in reversed(runs[:-1])))
+        if instrument.log_path():
+            st.caption(f"Log: {instrument.log_path()}")
@@ -0,0 +1,10 @@
+"""
+Kern van de druktest-rapportage, los van de Streamlit-UI.
+
+- `pressuretest.photos`: foto-ingest en metadata
+- `pressuretest.pdf`: `build_pdf` (naar een bestandsobject), `build_pdf_bytes`, `build_pdf_file`
+- `pressuretest.batch`: headless batch-generatie (`python -m pressuretest`)
+- `pressuretest.archive`: rapportarchief met zoeken en zip-export (`python -m pressuretest.archive`)
+- `pressuretest.jobs`: begrensde achtergrondqueue voor PDF-generatie met voortgang
+- `pressuretest.mail`: SMTP-dispatcher met verbindingspool en retries (PDF als bijlage)
+"""
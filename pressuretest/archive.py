@@ -0,0 +1,309 @@
+"""
+Rapportarchief: elke gegenereerde PDF met de gestructureerde rapportdata in een geïndexeerde
+SQLite-database; de PDF's zelf als content-addressed blobs (zie blobs.py).
+
+    archive = ReportArchive("data/archive")
+    archive.add(pdf_data, pdf_bytes, "2024-05-01_Tank_7_Report.pdf")
+    rows = archive.search(work_order="WO-12", date_from=date(2024, 1, 1))
+    with open("audit.zip", "wb") as f:
+        archive.export_zip(archive.iter_search(drawing="DR-7"), f)
+
+Zoeken op project_name, work_order, drawing en revision is hoofdletterongevoelig op prefix
+("WO-12" vindt "wo-1234") en gebruikt de indexen. De datumfilter werkt op de testdatum
+(eerste t/m laatste compartiment).
+
+CLI (voor audits, zonder de app):
+
+    python -m pressuretest.archive search --work-order WO-12 --from 2024-01-01
+    python -m pressuretest.archive export --drawing DR-7 -o audit.zip
+"""
+import io
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, datetime, time as dtime
+
+from .blobs import BlobStore
+from .cache import content_key
+
+SEARCH_KEYS = ["project_name", "work_order", "drawing", "revision"]
+ARCHIVE_SEARCH_LIMIT = 200
+ARCHIVE_PAGE = 500   # rijen per query bij iter_search (export van duizenden rapporten)
+INDEX_COLUMNS = ["id", "created", "test_date", "test_date_end", "project_name", "manufacturer",
+                 "work_order", "drawing", "revision", "part_line", "result", "compartments", "filename",
+                 "pdf_size"]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS reports (
+    id INTEGER PRIMARY KEY,
+    data_key TEXT NOT NULL UNIQUE,
+    created REAL NOT NULL,
+    test_date TEXT,
+    test_date_end TEXT,
+    project_name TEXT NOT NULL DEFAULT '' COLLATE NOCASE,
+    manufacturer TEXT NOT NULL DEFAULT '',
+    work_order TEXT NOT NULL DEFAULT '' COLLATE NOCASE,
+    drawing TEXT NOT NULL DEFAULT '' COLLATE NOCASE,
+    revision TEXT NOT NULL DEFAULT '' COLLATE NOCASE,
+    part_line TEXT NOT NULL DEFAULT '',
+    result TEXT NOT NULL DEFAULT '',
+    compartments INTEGER NOT NULL DEFAULT 0,
+    filename TEXT NOT NULL,
+    pdf_blob TEXT NOT NULL,
+    pdf_size INTEGER NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS reports_project ON reports(project_name);
+CREATE INDEX IF NOT EXISTS reports_work_order ON reports(work_order);
+CREATE INDEX IF NOT EXISTS reports_drawing ON reports(drawing, revision);
+CREATE INDEX IF NOT EXISTS reports_revision ON reports(revision);
+CREATE INDEX IF NOT EXISTS reports_test_date ON reports(test_date);
+"""
+
+# ======================
+# RAPPORTDATA -> JSON
+# ======================
+def _json_default(o):
+    if isinstance(o, (date, datetime, dtime)):
+        return o.isoformat()
+    if hasattr(o, "item"):
+        return o.item()  # numpy-scalars uit de loggeranalyse
+    return str(o)
+
+def report_record(pdf_data):
+    """
+    De gestructureerde inhoud van een rapport zonder binaire delen: foto's als sleutel +
+    tijdstip, loggeranalyse zonder grafiekreeksen, handtekening zonder beeld.
+    """
+    comps = []
+    for c in pdf_data["compartments"]:
+        rec = {k: v for k, v in c.items() if k not in ("photos", "logger")}
+        rec["photos"] = {slot: {"key": p["key"], "ts": p["ts"], "no_exif": bool(p.get("no_exif"))} if p else None
+                         for slot, p in c.get("photos", {}).items()}
+        log = c.get("logger")
+        rec["logger"] = {k: v for k, v in log.items() if not k.startswith("chart_")} if log else None
+        comps.append(rec)
+    sig = pdf_data.get("signature") or {}
+    return {
+        "meta": dict(pdf_data["meta"]),
+        "requirements": dict(pdf_data["requirements"]),
+        "compartments": comps,
+        "signature": {k: v for k, v in sig.items() if k != "image_pil"},
+    }
+
+def _overall_result(comps):
+    results = {c.get("result") for c in comps}
+    if "FAIL" in results:
+        return "FAIL"
+    return "PASS" if results == {"PASS"} else ""
+
+def _like_prefix(s):
+    return s.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+def _iso(d):
+    return d.isoformat() if isinstance(d, date) else d
+
+def safe_filename(name, default="Project"):
+    """Bestandsnaam uit gebruikersinvoer: alleen letters, cijfers, '.', '-' en '_', geen pad of '..'."""
+    return re.sub(r"[^\w.-]+", "_", name or "").strip("._") or default
+
+# ======================
+# ARCHIEF
+# ======================
+class ReportArchive:
+    """Thread-safe (één verbinding, WAL, een lock per query); gedeeld door alle sessies."""
+    def __init__(self, root):
+        os.makedirs(root, exist_ok=True)
+        self.blobs = BlobStore(os.path.join(root, "blobs"))
+        self._db = sqlite3.connect(os.path.join(root, "archive.sqlite3"), check_same_thread=False,
+                                   isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def _tx(self):
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._db
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+
+    def add(self, pdf_data, pdf, filename):
+        return self.add_record(report_record(pdf_data), pdf, filename)
+
+    def add_record(self, record, pdf, filename):
+        """
+        Archiveer een rapport; geeft het id terug. `pdf` is bytes of een bestandsobject (wordt
+        vanaf het begin in blokken gekopieerd). Hetzelfde rapport (identieke data) opnieuw
+        genereren vervangt de PDF van het bestaande record in plaats van een dubbel te maken.
+        """
+        data = json.dumps(record, sort_keys=True, default=_json_default, ensure_ascii=False)
+        data_key = content_key(data.encode("utf-8"))
+        if isinstance(pdf, bytes):
+            blob, size = self.blobs.put(pdf), len(pdf)
+        else:
+            pdf.seek(0)
+            blob = self.blobs.put_file(pdf)
+            size = pdf.tell()
+        meta, comps = record["meta"], record["compartments"]
+        dates = sorted(d for d in (_iso(c.get("date")) for c in comps) if d)
+        row = {
+            "data_key": data_key, "created": time.time(),
+            "test_date": dates[0] if dates else None, "test_date_end": dates[-1] if dates else None,
+            **{k: meta.get(k) or "" for k in ("project_name", "manufacturer", "work_order", "drawing",
+                                              "revision", "part_line")},
+            "result": _overall_result(comps), "compartments": len(comps),
+            "filename": filename, "pdf_blob": blob, "pdf_size": size, "data": data,
+        }
+        cols = ", ".join(row)
+        with self._tx() as db:
+            db.execute(f"""INSERT INTO reports ({cols}) VALUES ({", ".join("?" * len(row))})
+                ON CONFLICT(data_key) DO UPDATE SET created = excluded.created,
+                    filename = excluded.filename, pdf_blob = excluded.pdf_blob, pdf_size = excluded.pdf_size""",
+                       list(row.values()))
+            return db.execute("SELECT id FROM reports WHERE data_key = ?", (data_key,)).fetchone()[0]
+
+    def _where(self, project_name=None, work_order=None, drawing=None, revision=None,
+               date_from=None, date_to=None):
+        clauses, params = [], []
+        for key, value in zip(SEARCH_KEYS, (project_name, work_order, drawing, revision)):
+            if value and value.strip():
+                clauses.append(f"{key} LIKE ? ESCAPE '\\'")
+                params.append(_like_prefix(value.strip()))
+        if date_from:
+            clauses.append("test_date_end >= ?")
+            params.append(_iso(date_from))
+        if date_to:
+            clauses.append("test_date <= ?")
+            params.append(_iso(date_to))
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def search(self, limit=ARCHIVE_SEARCH_LIMIT, offset=0, **filters):
+        """Rapporten (zonder data) die aan alle filters voldoen, nieuwste testdatum eerst."""
+        where, params = self._where(**filters)
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT {', '.join(INDEX_COLUMNS)} FROM reports{where} "
+                "ORDER BY test_date DESC, id DESC LIMIT ? OFFSET ?", params + [limit, offset]).fetchall()
+        return [dict(r) for r in rows]
+
+    def count(self, **filters):
+        where, params = self._where(**filters)
+        with self._lock:
+            return self._db.execute(f"SELECT COUNT(*) FROM reports{where}", params).fetchone()[0]
+
+    def iter_search(self, page=ARCHIVE_PAGE, **filters):
+        """Alle treffers in id-volgorde, per pagina opgehaald (keyset): geschikt voor duizenden rapporten."""
+        where, params = self._where(**filters)
+        where = where + (" AND" if where else " WHERE") + " id > ?"
+        last = 0
+        while True:
+            with self._lock:
+                rows = self._db.execute(f"SELECT {', '.join(INDEX_COLUMNS)}, pdf_blob FROM reports{where} "
+                                        "ORDER BY id LIMIT ?", params + [last, page]).fetchall()
+            for r in rows:
+                yield dict(r)
+            if len(rows) < page:
+                return
+            last = rows[-1]["id"]
+
+    def get(self, report_id):
+        """Volledig record (incl. de gestructureerde data) of None."""
+        with self._lock:
+            r = self._db.execute("SELECT * FROM reports WHERE id = ?", (report_id,)).fetchone()
+        if r is None:
+            return None
+        out = dict(r)
+        out["data"] = json.loads(out["data"])
+        return out
+
+    def pdf(self, report_id):
+        with self._lock:
+            r = self._db.execute("SELECT pdf_blob FROM reports WHERE id = ?", (report_id,)).fetchone()
+        return self.blobs.get(r[0]) if r else None
+
+    def export_zip(self, rows, out):
+        """
+        Schrijf de PDF's van `rows` (bijv. iter_search(...)) als zip naar het bestandsobject
+        `out`, één bestand tegelijk vanaf schijf; `out` hoeft niet seekable te zijn. PDF's zijn
+        al gecomprimeerd en worden ongecomprimeerd opgeslagen. index.csv bevat de metadata.
+        Geeft het aantal geëxporteerde rapporten terug.
+        """
+        import csv
+        import zipfile
+        index = io.StringIO()
+        writer = csv.DictWriter(index, fieldnames=INDEX_COLUMNS + ["file"], extrasaction="ignore")
+        writer.writeheader()
+        n = 0
+        with zipfile.ZipFile(out, "w", compression=zipfile.ZIP_STORED) as zf:
+            for r in rows:
+                path = self.blobs.path(r["pdf_blob"])
+                if not os.path.exists(path):
+                    continue
+                # Oudere records (en batch-manifesten) kunnen een naam met '/' of '..' bevatten
+                name = f"{r['id']:06d}_{safe_filename(r['filename'], 'report.pdf')}"
+                zf.write(path, name)
+                writer.writerow({**r, "created": datetime.fromtimestamp(r["created"]).isoformat(timespec="seconds"),
+                                 "file": name})
+                n += 1
+            zf.writestr("index.csv", index.getvalue(), compress_type=zipfile.ZIP_DEFLATED)
+        return n
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+# ======================
+# CLI
+# ======================
+def default_root():
+    return os.path.join(os.environ.get("PRESSURETEST_DATA_DIR", "data"), "archive")
+
+def main(argv=None):
+    import argparse
+    ap = argparse.ArgumentParser(prog="python -m pressuretest.archive",
+                                 description="Zoek en exporteer gearchiveerde druktestrapporten.")
+    ap.add_argument("--root", default=None, help="archiefmap (default: $PRESSURETEST_DATA_DIR/archive)")
+    sub = ap.add_subparsers(dest="command", required=True)
+    for name in ("search", "export"):
+        p = sub.add_parser(name)
+        for key in SEARCH_KEYS:
+            p.add_argument("--" + key.replace("_", "-"), dest=key, help="prefix, hoofdletterongevoelig")
+        p.add_argument("--from", dest="date_from", type=date.fromisoformat, help="testdatum vanaf (JJJJ-MM-DD)")
+        p.add_argument("--to", dest="date_to", type=date.fromisoformat, help="testdatum t/m (JJJJ-MM-DD)")
+    sub.choices["search"].add_argument("--limit", type=int, default=ARCHIVE_SEARCH_LIMIT)
+    sub.choices["export"].add_argument("-o", "--output", required=True, help="zipbestand, of - voor stdout")
+    args = ap.parse_args(argv)
+
+    archive = ReportArchive(args.root or default_root())
+    filters = {k: getattr(args, k) for k in SEARCH_KEYS + ["date_from", "date_to"]}
+    if args.command == "search":
+        rows = archive.search(limit=args.limit, **filters)
+        for r in rows:
+            print(f"{r['id']:6d}  {r['test_date'] or '-':10s}  {r['result'] or '-':4s}  {r['work_order']:12s} "
+                  f"{r['drawing']} rev {r['revision']}  {r['project_name']}  ({r['filename']})")
+        print(f"{len(rows)} van {archive.count(**filters)} rapporten")
+        return 0
+
+    t0 = time.perf_counter()
+    if args.output == "-":
+        n = archive.export_zip(archive.iter_search(**filters), sys.stdout.buffer)
+    else:
+        with open(args.output, "wb") as f:
+            n = archive.export_zip(archive.iter_search(**filters), f)
+    print(f"{n} rapporten geëxporteerd in {time.perf_counter() - t0:.1f}s", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
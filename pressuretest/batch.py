@@ -0,0 +1,339 @@
+"""
+Headless batch-generatie van rapporten uit een manifest (JSON of CSV) plus fotomappen.
+
+    python -m pressuretest manifest.json -o out/ -j 4 --summary out/summary.json
+
+JSON-manifest: een lijst rapporten (of {"reports": [...]}) met dezelfde opbouw als in de app:
+
+    {"id": "WO-1234", "output": "WO-1234.pdf",
+     "meta": {"project_name": ..., "manufacturer": ..., "work_order": ..., "drawing": ...,
+              "revision": ..., "part_line": ...},
+     "requirements": {"pt_value": 10, "pt_unit": "bar", "test_instrument": ...,
+                      "calibration_date": "2024-01-31", "notes": ...},
+     "compartments": [{"date": "2024-05-01", "start_time": "09:00", "end_time": "10:00",
+                       "start_bar": 10.0, "end_bar": 9.95, "result": "PASS", "remarks": "",
+                       "photos": {"start": "WO-1234/c1_start.jpg", "end": "WO-1234/c1_end.jpg"},
+                       "logger": "WO-1234/c1_log.csv"}],
+     "signature": {"name": ..., "company": ..., "date": "2024-05-01", "image": "sig.png"}}
+
+CSV-manifest: één regel per compartiment, gegroepeerd op `report_id`; kolommen zie CSV_COLUMNS.
+Foto-, logger- en handtekeningpaden zijn relatief t.o.v. --photo-dir (standaard de map van het manifest).
+Met een loggerbestand (zie pressuretest.logger) worden ontbrekende start/end_bar en result uit
+de analyse ingevuld; handmatige waarden in het manifest gaan voor.
+Met --archive DIR komt elk gelukt rapport ook in het rapportarchief (zie pressuretest.archive);
+lukt archiveren niet, dan telt dat rapport als mislukt. Een manifest waarin twee rapporten naar
+dezelfde uitvoernaam schrijven wordt vooraf geweigerd.
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, datetime
+
+from .archive import safe_filename
+from .logger import analyze_hold, load_logger_csv, suggest_result
+from .photos import photo_from_bytes
+from .units import bar_to_psi, psi_to_bar
+
+META_KEYS = ["project_name", "manufacturer", "work_order", "drawing", "revision", "part_line"]
+CSV_COLUMNS = [
+    "report_id", "output", *META_KEYS,
+    "pt_value", "pt_unit", "test_instrument", "calibration_date", "notes",
+    "date", "start_time", "end_time", "start_bar", "end_bar", "result", "remarks",
+    "start_photo", "end_photo", "logger_file",
+    "sign_name", "sign_company", "sign_date", "signature_image",
+]
+
+# ======================
+# MANIFEST
+# ======================
+def _records_from_csv(path):
+    reports = {}
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        for row in csv.DictReader(f):
+            rid = row["report_id"]
+            if rid not in reports:
+                reports[rid] = {
+                    "id": rid,
+                    "output": row.get("output") or None,
+                    "meta": {k: row.get(k, "") for k in META_KEYS},
+                    "requirements": {
+                        "pt_value": row.get("pt_value"), "pt_unit": row.get("pt_unit") or "bar",
+                        "test_instrument": row.get("test_instrument", ""),
+                        "calibration_date": row.get("calibration_date", ""), "notes": row.get("notes", ""),
+                    },
+                    "compartments": [],
+                    "signature": {
+                        "name": row.get("sign_name", ""), "company": row.get("sign_company", ""),
+                        "date": row.get("sign_date", ""), "image": row.get("signature_image") or None,
+                    },
+                }
+            reports[rid]["compartments"].append({
+                "date": row.get("date", ""), "start_time": row.get("start_time", ""),
+                "end_time": row.get("end_time", ""), "start_bar": row.get("start_bar"),
+                "end_bar": row.get("end_bar"), "result": row.get("result", ""), "remarks": row.get("remarks", ""),
+                "photos": {"start": row.get("start_photo") or None, "end": row.get("end_photo") or None},
+                "logger": row.get("logger_file") or None,
+            })
+    return list(reports.values())
+
+def load_manifest(path):
+    """Lees een JSON- of CSV-manifest; geeft een lijst rapport-records."""
+    if path.lower().endswith(".csv"):
+        return _records_from_csv(path)
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    return data["reports"] if isinstance(data, dict) else data
+
+# ======================
+# RECORD -> PDF DATA
+# ======================
+def _parse_date(s):
+    return s if isinstance(s, date) else (date.fromisoformat(s) if s else None)
+
+def _parse_time(s):
+    return datetime.strptime(s, "%H:%M").time() if s else None
+
+def _float_or_none(v):
+    return None if v in (None, "") else float(v)
+
+def _load_photo(path, base_dir):
+    if not path:
+        return None
+    full = os.path.join(base_dir, path)
+    with open(full, "rb") as f:
+        b = f.read()
+    # Zonder EXIF-tijd: bestandsdatum als benadering van het opnamemoment
+    mtime = datetime.fromtimestamp(os.path.getmtime(full)).replace(second=0, microsecond=0)
+    return photo_from_bytes(b, fallback_ts=mtime)
+
+def _load_logger(path, base_dir):
+    if not path:
+        return None
+    with open(os.path.join(base_dir, path), "rb") as f:
+        return analyze_hold(load_logger_csv(f.read()))
+
+def report_to_pdf_data(record, base_dir):
+    """Zet een manifest-record om naar de `data`-structuur van build_pdf_bytes."""
+    from PIL import Image as PILImage
+
+    req_in = record["requirements"]
+    cal = _parse_date(req_in.get("calibration_date"))
+    req = {
+        "pt_value": float(req_in["pt_value"]),
+        "pt_unit": req_in.get("pt_unit") or "bar",
+        "notes": req_in.get("notes", ""),
+        "test_instrument": req_in.get("test_instrument", ""),
+        "calibration_date": cal,
+        "calibration_date_str": cal.strftime("%Y-%m-%d") if cal else "",
+    }
+
+    pt_bar = req["pt_value"] if req["pt_unit"] == "bar" else psi_to_bar(req["pt_value"])
+    comps = []
+    for c in record["compartments"]:
+        cd, cst, cet = _parse_date(c.get("date")), _parse_time(c.get("start_time")), _parse_time(c.get("end_time"))
+        sb, eb = _float_or_none(c.get("start_bar")), _float_or_none(c.get("end_bar"))
+        photos = c.get("photos") or {}
+        log = _load_logger(c.get("logger"), base_dir)
+        result = c.get("result", "")
+        if log:
+            sb = sb if sb is not None else round(log["start_bar"], 2)
+            eb = eb if eb is not None else round(log["end_bar"], 2)
+            result = result or suggest_result(log, pt_bar)[0]
+        comps.append({
+            "date": cd, "date_str": cd.strftime("%Y-%m-%d") if cd else "",
+            "start_time": cst, "start_time_str": cst.strftime("%H:%M") if cst else "",
+            "end_time": cet, "end_time_str": cet.strftime("%H:%M") if cet else "",
+            "start_bar": sb, "start_psi": bar_to_psi(sb),
+            "end_bar": eb, "end_psi": bar_to_psi(eb),
+            "result": result, "remarks": c.get("remarks", ""),
+            "photos": {slot: _load_photo(photos.get(slot), base_dir) for slot in ["start", "end"]},
+            "logger": log,
+        })
+
+    sig_in = record.get("signature") or {}
+    sd = _parse_date(sig_in.get("date"))
+    sig_img = None
+    if sig_in.get("image"):
+        with PILImage.open(os.path.join(base_dir, sig_in["image"])) as im:
+            sig_img = im.convert("RGB")
+    signature = {
+        "name": sig_in.get("name", ""), "company": sig_in.get("company", ""),
+        "date": sd, "date_str": sd.strftime("%Y-%m-%d") if sd else "",
+        "image_pil": sig_img,
+    }
+    meta = {k: record["meta"].get(k, "") for k in META_KEYS}
+    return {"meta": meta, "requirements": req, "compartments": comps, "signature": signature}
+
+def output_name(record, index):
+    """
+    Bestandsnaam in --out-dir, via safe_filename zoals in de app: een "/" of ".." uit het
+    manifest of de projectnaam kan zo niet buiten de uitvoermap schrijven.
+    """
+    rid = safe_filename(str(record.get("id") or index + 1))
+    default = f"{rid}_{safe_filename(record['meta'].get('project_name'))}_Report.pdf"
+    return safe_filename(record["output"], default) if record.get("output") else default
+
+def check_output_names(records):
+    """
+    ValueError als twee records naar hetzelfde bestand zouden schrijven; anders overschrijft de
+    laatste worker het eerdere rapport en wijzen beide resultaten (en archiefrecords) naar één PDF.
+    Hoofdletterongevoelig, zoals het bestandssysteem op Windows en macOS.
+    """
+    seen, dups = {}, []
+    for i, rec in enumerate(records):
+        name = output_name(rec, i)
+        key = os.path.normpath(name).casefold()
+        if key in seen:
+            dups.append(f"{name} (records {seen[key] + 1} and {i + 1})")
+        else:
+            seen[key] = i
+    if dups:
+        raise ValueError("duplicate output names: " + ", ".join(dups))
+
+# ======================
+# WORKER
+# ======================
+def render_report(index, record, base_dir, out_dir, pdf_options=None, keep_record=False):
+    """
+    Render één rapport naar `out_dir`. Draait in een worker-proces; fouten worden
+    als resultaat teruggegeven zodat één kapot record de batch niet stopt. Met `keep_record`
+    bevat het resultaat ook de archiefdata (archive.report_record, zonder foto's).
+    """
+    from .archive import report_record
+    from .pdf import build_pdf
+
+    result = {"index": index, "id": record.get("id"), "output": None, "ok": False,
+              "load_seconds": None, "render_seconds": None, "bytes": 0, "error": None}
+    try:
+        t0 = time.perf_counter()
+        data = report_to_pdf_data(record, base_dir)
+        t1 = time.perf_counter()
+        out_path = os.path.join(out_dir, output_name(record, index))
+        os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+        # Direct naar schijf (geen kopie in het geheugen); pas bij succes onder de echte naam
+        part = out_path + ".part"
+        try:
+            with open(part, "wb") as f:
+                # Parallelisme zit op procesniveau; binnen een worker geen extra threads
+                build_pdf(data, f, workers=1, **(pdf_options or {}))
+                size = f.tell()
+            os.replace(part, out_path)
+        finally:
+            if os.path.exists(part):
+                os.remove(part)
+        t2 = time.perf_counter()
+        result.update(ok=True, output=out_path, bytes=size,
+                      load_seconds=round(t1 - t0, 4), render_seconds=round(t2 - t1, 4))
+        if keep_record:
+            result["record"] = report_record(data)
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+        result["traceback"] = traceback.format_exc()
+    return result
+
+def run_batch(records, base_dir, out_dir, jobs=None, pdf_options=None, progress=None, keep_record=False):
+    """
+    Render alle records op een procespool; resultaten in manifest-volgorde. ValueError (vóór
+    het renderen) als twee records dezelfde uitvoernaam hebben.
+    """
+    check_output_names(records)
+    results = [None] * len(records)
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = {
+            pool.submit(render_report, i, rec, base_dir, out_dir, pdf_options, keep_record): i
+            for i, rec in enumerate(records)
+        }
+        for fut in as_completed(futures):
+            i = futures[fut]
+            try:
+                res = fut.result()
+            except Exception as e:
+                # Worker zelf onderuit (bijv. geheugen); record als mislukt markeren
+                res = {"index": i, "id": records[i].get("id"), "output": None, "ok": False,
+                       "load_seconds": None, "render_seconds": None, "bytes": 0,
+                       "error": f"{type(e).__name__}: {e}"}
+            results[i] = res
+            if progress:
+                progress(res)
+    return results
+
+def summarize(results, wall_seconds):
+    ok = [r for r in results if r["ok"]]
+    render = [r["render_seconds"] for r in ok]
+    return {
+        "total": len(results), "ok": len(ok), "failed": len(results) - len(ok),
+        "wall_seconds": round(wall_seconds, 3),
+        "render_seconds_total": round(sum(render), 3),
+        "render_seconds_max": max(render) if render else None,
+        "bytes_total": sum(r["bytes"] for r in ok),
+        "reports": results,
+    }
+
+# ======================
+# CLI
+# ======================
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog="python -m pressuretest",
+                                 description="Genereer druktestrapporten (PDF) uit een manifest.")
+    ap.add_argument("manifest", help="JSON- of CSV-manifest met rapporten")
+    ap.add_argument("-o", "--out-dir", default="reports", help="map voor de PDF's (default: reports)")
+    ap.add_argument("-j", "--jobs", type=int, default=None, help="aantal worker-processen (default: #CPU)")
+    ap.add_argument("--photo-dir", default=None, help="basismap voor foto's (default: map van het manifest)")
+    ap.add_argument("--summary", default=None, help="schrijf een JSON-samenvatting met timings")
+    ap.add_argument("--image-mode", choices=["jpeg", "png"], default=None)
+    ap.add_argument("--image-dpi", type=int, default=None)
+    ap.add_argument("--logo", default=None, help="logo rechtsboven op elke pagina (PNG/JPEG)")
+    ap.add_argument("--archive", default=None, help="archiveer de rapporten ook in deze archiefmap")
+    args = ap.parse_args(argv)
+
+    records = load_manifest(args.manifest)
+    try:
+        check_output_names(records)
+    except ValueError as e:
+        ap.error(f"{args.manifest}: {e}")
+    base_dir = args.photo_dir or os.path.dirname(os.path.abspath(args.manifest))
+    pdf_options = {}
+    if args.image_mode:
+        pdf_options["image_mode"] = args.image_mode
+    if args.image_dpi:
+        pdf_options["image_dpi"] = args.image_dpi
+    if args.logo:
+        pdf_options["logo_path"] = os.path.abspath(args.logo)
+
+    archive = None
+    if args.archive:
+        from .archive import ReportArchive
+        archive = ReportArchive(args.archive)
+
+    def progress(res):
+        record = res.pop("record", None)
+        if archive is not None and res["ok"]:
+            # Archiveren in het hoofdproces: één schrijver voor de database. Een fout hier telt
+            # als mislukt rapport (de PDF staat er wel), net als een renderfout in de worker
+            try:
+                with open(res["output"], "rb") as f:
+                    res["archive_id"] = archive.add_record(record, f, os.path.basename(res["output"]))
+            except Exception as e:
+                res.update(ok=False, error=f"archive: {type(e).__name__}: {e}", traceback=traceback.format_exc())
+        status = "ok  " if res["ok"] else "FAIL"
+        detail = f"{res['render_seconds']:.2f}s {res['output']}" if res["ok"] else res["error"]
+        print(f"[{status}] {res['id'] or res['index'] + 1}: {detail}", flush=True)
+
+    t0 = time.perf_counter()
+    results = run_batch(records, base_dir, args.out_dir, jobs=args.jobs, pdf_options=pdf_options,
+                        progress=progress, keep_record=archive is not None)
+    summary = summarize(results, time.perf_counter() - t0)
+    print(f"{summary['ok']}/{summary['total']} rapporten in {summary['wall_seconds']:.1f}s"
+          + (f", {summary['failed']} mislukt" if summary["failed"] else ""))
+    if args.summary:
+        with open(args.summary, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2, default=str)
+    return 1 if summary["failed"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,92 @@
+"""Content-addressed opslag van bestanden (foto's, previews) op schijf, met deduplicatie."""
+import hashlib
+import os
+import tempfile
+from functools import partial
+
+from .cache import content_key
+
+BLOB_CHUNK_BYTES = 1024 * 1024
+
+class BlobStore:
+    """
+    Elke blob staat één keer op schijf onder zijn hash (content_key): root/ab/abcdef....
+    Dezelfde foto in meerdere concepten of rapporten kost dus maar één keer ruimte.
+    """
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, key):
+        return os.path.join(self.root, key[:2], key)
+
+    def exists(self, key):
+        return os.path.exists(self.path(key))
+
+    def put(self, b, key=None):
+        """Sla bytes op (no-op als de blob al bestaat); geeft de sleutel terug."""
+        key = key or content_key(b)
+        path = self.path(key)
+        if os.path.exists(path):
+            return key
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Atomisch: eerst een tijdelijk bestand in dezelfde map, dan hernoemen
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(b)
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        return key
+
+    def put_file(self, f, chunk_size=BLOB_CHUNK_BYTES):
+        """Als put, maar in blokken uit een bestandsobject (vanaf de huidige positie)."""
+        h = hashlib.blake2b(digest_size=16)  # zelfde sleutel als content_key
+        fd, tmp = tempfile.mkstemp(dir=self.root, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as out:
+                for b in iter(partial(f.read, chunk_size), b""):
+                    h.update(b)
+                    out.write(b)
+            key = h.hexdigest()
+            path = self.path(key)
+            if os.path.exists(path):
+                os.remove(tmp)
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        return key
+
+    def get(self, key):
+        try:
+            with open(self.path(key), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def keys(self):
+        for sub in os.listdir(self.root):
+            d = os.path.join(self.root, sub)
+            if len(sub) == 2 and os.path.isdir(d):
+                for name in os.listdir(d):
+                    if not name.startswith(".tmp-"):
+                        yield name
+
+    def remove_unreferenced(self, referenced):
+        """Verwijder blobs die niet in `referenced` (set sleutels) staan; geeft het aantal terug."""
+        removed = 0
+        for key in list(self.keys()):
+            if key not in referenced:
+                try:
+                    os.remove(self.path(key))
+                    removed += 1
+                except FileNotFoundError:
+                    pass
+        return removed
@@ -0,0 +1,58 @@
+"""Kleine thread-safe LRU-cache, gedeeld door foto-ingest en PDF-secties, en de inhoudssleutel."""
+import hashlib
+import threading
+from collections import OrderedDict
+
+def content_key(b):
+    """Sleutel op inhoud (blake2b, 128 bit): voor caches, blobs en deduplicatie."""
+    return hashlib.blake2b(b, digest_size=16).hexdigest()
+
+class LRUCache:
+    """Begrensde, thread-safe LRU-cache met hit/miss/eviction-tellers."""
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_build(self, key, build):
+        value = self.get(key)
+        if value is None:
+            # Bouwen buiten de lock, zodat andere threads/sessies niet hoeven te wachten
+            value = build()
+            self.put(key, value)
+        return value
+
+    def discard(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "max_entries": self.max_entries,
+                    "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
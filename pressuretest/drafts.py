@@ -0,0 +1,280 @@
+"""
+Concepten: het formulier wordt automatisch en incrementeel in SQLite opgeslagen, foto's één
+keer als content-addressed blob (zie blobs.py). Herstellen decodeert geen foto's: de kleine
+preview-JPEG wordt pas gedecodeerd als de foto getoond wordt (photos.photo_preview).
+
+    store = DraftStore(".../drafts")
+    store.save_fields(draft_id, {"project_name": "X", "c0_date": date(...)}, owner=token)  # alleen wijzigingen
+    store.save_photos(draft_id, comp_data, owner=token)                                   # alleen nieuwe/gewijzigde
+    store.list_drafts(token)
+    fields, comp_photos = store.load(draft_id, owner=token)
+
+Elk concept hoort bij een eigenaar (een token per browser, zie de app): list_drafts, load en
+delete zien alleen de concepten van die eigenaar. Concepten van vóór de eigenaar-kolom hebben
+eigenaar "" en verlopen vanzelf (prune).
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import date, datetime, time as dtime, timedelta
+from io import BytesIO
+
+from .blobs import BlobStore
+from .cache import LRUCache
+
+DRAFT_MAX_AGE_DAYS = 30
+DRAFT_LIST_LIMIT = 10
+DRAFT_STATE_MAX_ENTRIES = 256   # concepten waarvan de store onthoudt wat al op schijf staat
+PREVIEW_JPEG_QUALITY = 80
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS drafts (
+    id TEXT PRIMARY KEY,
+    title TEXT NOT NULL DEFAULT '',
+    owner TEXT NOT NULL DEFAULT '',
+    created REAL NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS drafts_updated ON drafts(updated);
+CREATE TABLE IF NOT EXISTS draft_fields (
+    draft_id TEXT NOT NULL REFERENCES drafts(id) ON DELETE CASCADE,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (draft_id, key)
+);
+CREATE TABLE IF NOT EXISTS draft_photos (
+    draft_id TEXT NOT NULL REFERENCES drafts(id) ON DELETE CASCADE,
+    comp INTEGER NOT NULL,
+    slot TEXT NOT NULL,
+    blob TEXT NOT NULL,
+    preview_blob TEXT,
+    ts TEXT NOT NULL,
+    no_exif INTEGER NOT NULL DEFAULT 0,
+    orientation INTEGER NOT NULL DEFAULT 1,
+    utc_offset_s REAL,
+    PRIMARY KEY (draft_id, comp, slot)
+);
+"""
+
+# ======================
+# WAARDEN <-> JSON
+# ======================
+def encode_value(v):
+    """Widgetwaarde -> JSON; datums en tijden krijgen een type-tag."""
+    if isinstance(v, datetime):
+        v = {"__datetime__": v.isoformat()}
+    elif isinstance(v, date):
+        v = {"__date__": v.isoformat()}
+    elif isinstance(v, dtime):
+        v = {"__time__": v.isoformat()}
+    return json.dumps(v, sort_keys=True)
+
+def decode_value(s):
+    v = json.loads(s)
+    if isinstance(v, dict) and len(v) == 1:
+        (tag, iso), = v.items()
+        if tag == "__datetime__":
+            return datetime.fromisoformat(iso)
+        if tag == "__date__":
+            return date.fromisoformat(iso)
+        if tag == "__time__":
+            return dtime.fromisoformat(iso)
+    return v
+
+def _photo_sig(p):
+    return (p["key"], p["ts"].isoformat(), bool(p.get("no_exif")))
+
+# ======================
+# STORE
+# ======================
+class DraftStore:
+    """
+    Thread-safe (één verbinding, WAL, een lock per transactie): gedeeld door alle sessies
+    van het proces. Per concept onthoudt de store wat al is weggeschreven, zodat autosave
+    bij elke rerun alleen echte wijzigingen naar schijf stuurt.
+    """
+    def __init__(self, root, max_age_days=DRAFT_MAX_AGE_DAYS):
+        os.makedirs(root, exist_ok=True)
+        self.blobs = BlobStore(os.path.join(root, "blobs"))
+        self._db = sqlite3.connect(os.path.join(root, "drafts.sqlite3"), check_same_thread=False,
+                                   isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("PRAGMA foreign_keys=ON")
+        self._db.executescript(_SCHEMA)
+        if "owner" not in [r[1] for r in self._db.execute("PRAGMA table_info(drafts)")]:
+            self._db.execute("ALTER TABLE drafts ADD COLUMN owner TEXT NOT NULL DEFAULT ''")
+        self._db.execute("CREATE INDEX IF NOT EXISTS drafts_owner ON drafts(owner, updated)")
+        self._lock = threading.Lock()
+        # draft_id -> {"fields": {key: json}, "photos": {(comp, slot): _photo_sig}, "title": str};
+        # begrensd, en na verdringing opnieuw uit de database gelezen (_saved)
+        self._state = LRUCache(DRAFT_STATE_MAX_ENTRIES)
+        if max_age_days:
+            self.prune(max_age_days)
+
+    @contextmanager
+    def _tx(self):
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._db
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+
+    def _touch(self, db, draft_id, title=None, owner=""):
+        now = time.time()
+        db.execute("INSERT OR IGNORE INTO drafts (id, title, owner, created, updated) VALUES (?, '', ?, ?, ?)",
+                   (draft_id, owner, now, now))
+        if title is None:
+            db.execute("UPDATE drafts SET updated = ? WHERE id = ?", (now, draft_id))
+        else:
+            db.execute("UPDATE drafts SET updated = ?, title = ? WHERE id = ?", (now, title, draft_id))
+
+    @staticmethod
+    def new_id():
+        # Het concept bestaat pas in de database bij de eerste echte wijziging
+        return uuid.uuid4().hex
+
+    def _saved(self, draft_id):
+        """Wat van dit concept al in de database staat (voor de diff bij autosave)."""
+        state = self._state.get(draft_id)
+        if state is None:
+            with self._lock:
+                fields = self._db.execute("SELECT key, value FROM draft_fields WHERE draft_id = ?",
+                                          (draft_id,)).fetchall()
+                photos = self._db.execute("SELECT comp, slot, blob, ts, no_exif FROM draft_photos WHERE draft_id = ?",
+                                          (draft_id,)).fetchall()
+                title = self._db.execute("SELECT title FROM drafts WHERE id = ?", (draft_id,)).fetchone()
+            state = {"fields": dict(fields),
+                     "photos": {(c, s): (blob, ts, bool(no_exif)) for c, s, blob, ts, no_exif in photos},
+                     "title": title[0] if title else None}
+            self._state.put(draft_id, state)
+        return state
+
+    def save_fields(self, draft_id, fields, title=None, owner=""):
+        """Sla gewijzigde velden op; geeft het aantal weggeschreven velden terug."""
+        enc = {k: encode_value(v) for k, v in fields.items()}
+        state = self._saved(draft_id)
+        saved = state["fields"]
+        changed = [(draft_id, k, v) for k, v in enc.items() if saved.get(k) != v]
+        new_title = title if title is not None and title != state["title"] else None
+        if not changed and new_title is None:
+            return 0
+        with self._tx() as db:
+            self._touch(db, draft_id, new_title, owner)
+            db.executemany("INSERT OR REPLACE INTO draft_fields (draft_id, key, value) VALUES (?, ?, ?)", changed)
+        saved.update({k: v for _d, k, v in changed})
+        if new_title is not None:
+            state["title"] = new_title
+        return len(changed)
+
+    def _put_preview(self, p):
+        if p.get("preview") is None:
+            return p.get("preview_blob")  # hersteld en nog niet getoond: blob bestaat al
+        bio = BytesIO()
+        p["preview"].save(bio, format="JPEG", quality=PREVIEW_JPEG_QUALITY)
+        return self.blobs.put(bio.getvalue())
+
+    def save_photos(self, draft_id, comp_data, owner=""):
+        """Synchroniseer de foto's van alle compartimenten; alleen nieuwe blobs worden geschreven."""
+        want = {(i, slot): p for i, c in enumerate(comp_data) for slot, p in c["photos"].items() if p}
+        saved = self._saved(draft_id)["photos"]
+        changed = {k: p for k, p in want.items() if saved.get(k) != _photo_sig(p)}
+        removed = [k for k in saved if k not in want]
+        if not changed and not removed:
+            return 0
+        rows = []
+        for (i, slot), p in changed.items():
+            # Blobs buiten de database-lock: schrijven kan even duren, dedup maakt het idempotent
+            blob = self.blobs.put(p["data"], key=p["key"])
+            preview = self._put_preview(p)
+            p["preview_blob"] = preview
+            off = p.get("utc_offset")
+            rows.append((draft_id, i, slot, blob, preview, p["ts"].isoformat(), int(bool(p.get("no_exif"))),
+                         p.get("orientation", 1), off.total_seconds() if off is not None else None))
+        with self._tx() as db:
+            self._touch(db, draft_id, owner=owner)
+            db.executemany("""INSERT OR REPLACE INTO draft_photos
+                (draft_id, comp, slot, blob, preview_blob, ts, no_exif, orientation, utc_offset_s)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""", rows)
+            db.executemany("DELETE FROM draft_photos WHERE draft_id = ? AND comp = ? AND slot = ?",
+                           [(draft_id, i, slot) for i, slot in removed])
+        for k in removed:
+            del saved[k]
+        saved.update({k: _photo_sig(p) for k, p in changed.items()})
+        return len(changed) + len(removed)
+
+    def list_drafts(self, owner, limit=DRAFT_LIST_LIMIT):
+        with self._lock:
+            rows = self._db.execute("""
+                SELECT d.id, d.title, d.updated, COUNT(p.blob)
+                FROM drafts d LEFT JOIN draft_photos p ON p.draft_id = d.id
+                WHERE d.owner = ?
+                GROUP BY d.id ORDER BY d.updated DESC LIMIT ?""", (owner, limit)).fetchall()
+        return [{"id": r[0], "title": r[1], "updated": datetime.fromtimestamp(r[2]), "photos": r[3]}
+                for r in rows]
+
+    def load(self, draft_id, owner=None):
+        """
+        (velden, foto's) van een concept. Foto's: {(comp, slot): record} met de bytes en de
+        preview nog gecodeerd ("preview_src"); gedecodeerd wordt pas bij het tonen.
+        PermissionError als `owner` gegeven is en het concept van iemand anders is.
+        """
+        with self._lock:
+            row = self._db.execute("SELECT owner FROM drafts WHERE id = ?", (draft_id,)).fetchone()
+            if owner is not None and row is not None and row[0] != owner:
+                raise PermissionError(draft_id)
+            fields = self._db.execute("SELECT key, value FROM draft_fields WHERE draft_id = ?",
+                                      (draft_id,)).fetchall()
+            photos = self._db.execute("""SELECT comp, slot, blob, preview_blob, ts, no_exif, orientation,
+                utc_offset_s FROM draft_photos WHERE draft_id = ?""", (draft_id,)).fetchall()
+            title = self._db.execute("SELECT title FROM drafts WHERE id = ?", (draft_id,)).fetchone()
+        out = {}
+        for comp, slot, blob, preview_blob, ts, no_exif, orientation, off in photos:
+            data = self.blobs.get(blob)
+            if data is None:
+                continue  # blob kwijt (handmatig opgeruimd): foto overslaan
+            out[(comp, slot)] = {
+                "key": blob, "data": data, "preview": None,
+                "preview_src": self.blobs.get(preview_blob) if preview_blob else None,
+                "preview_blob": preview_blob,
+                "orientation": orientation, "utc_offset": timedelta(seconds=off) if off is not None else None,
+                "ts": datetime.fromisoformat(ts), "no_exif": bool(no_exif),
+            }
+        self._state.put(draft_id, {"fields": dict(fields), "photos": {k: _photo_sig(p) for k, p in out.items()},
+                                   "title": title[0] if title else ""})
+        return {k: decode_value(v) for k, v in fields}, out
+
+    def delete(self, draft_id, owner=None):
+        with self._tx() as db:
+            if owner is None:
+                db.execute("DELETE FROM drafts WHERE id = ?", (draft_id,))
+            elif not db.execute("DELETE FROM drafts WHERE id = ? AND owner = ?", (draft_id, owner)).rowcount:
+                return
+        self._state.discard(draft_id)
+
+    def prune(self, max_age_days=DRAFT_MAX_AGE_DAYS):
+        """Verwijder concepten die langer dan max_age_days niet gewijzigd zijn, en wees-blobs."""
+        cutoff = time.time() - max_age_days * 86400
+        with self._tx() as db:
+            expired = [r[0] for r in db.execute("SELECT id FROM drafts WHERE updated < ?", (cutoff,))]
+            db.execute("DELETE FROM drafts WHERE updated < ?", (cutoff,))
+        for draft_id in expired:
+            self._state.discard(draft_id)
+        return self.gc()
+
+    def gc(self):
+        with self._lock:
+            rows = self._db.execute("SELECT blob, preview_blob FROM draft_photos").fetchall()
+        referenced = {k for row in rows for k in row if k}
+        return self.blobs.remove_unreferenced(referenced)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
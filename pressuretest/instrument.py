@@ -0,0 +1,149 @@
+"""
+Opt-in meetlaag: tijd en geheugen per fase, per (fragment-)rerun.
+
+Aanzetten met de omgevingsvariabele PRESSURETEST_INSTRUMENT=1 of `?debug=1` in de URL.
+Met PRESSURETEST_INSTRUMENT_LOG=pad.jsonl wordt elke run als één JSON-regel toegevoegd,
+zodat over sessies heen geaggregeerd kan worden.
+
+    rec = start("rerun")              # begin van het script
+    with span("photo.ingest"): ...    # of @timed("validate.meta")
+    record = stop(rec)                # einde: samenvatting (en logregel)
+
+Zonder actieve meting zijn span/timed vrijwel kosteloos (één ContextVar-lookup).
+"""
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from functools import wraps
+
+ENV_ENABLE = "PRESSURETEST_INSTRUMENT"
+ENV_LOG = "PRESSURETEST_INSTRUMENT_LOG"
+INSTRUMENT_MAX_RUNS = 20   # runs die het debugpaneel per sessie bewaart
+
+_current = ContextVar("pressuretest_recorder", default=None)
+_log_lock = threading.Lock()
+
+def enabled(debug_param=None):
+    """Aan via de omgeving of de query-parameter debug=1."""
+    return os.environ.get(ENV_ENABLE, "") not in ("", "0") or debug_param in ("1", "true")
+
+def log_path():
+    return os.environ.get(ENV_LOG) or None
+
+def rss_kb():
+    """Huidige RSS in KiB (Linux /proc), anders None."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+    except (OSError, ValueError, IndexError):
+        return None
+
+# ======================
+# RECORDER
+# ======================
+class Recorder:
+    """Verzamelt spans (naam, ms, RSS-delta) van één run."""
+    def __init__(self, label):
+        self.label = label
+        self.spans = []
+        self.started = datetime.now()
+        self._t0 = time.perf_counter()
+        self._rss0 = rss_kb()
+        self.total_ms = None
+        self.rss_delta_kb = None
+        self._token = None
+
+    def add(self, name, ms, rss_delta_kb):
+        self.spans.append({"name": name, "ms": round(ms, 3), "rss_kb": rss_delta_kb})
+
+    def finish(self):
+        self.total_ms = round((time.perf_counter() - self._t0) * 1000.0, 3)
+        rss1 = rss_kb()
+        self.rss_delta_kb = rss1 - self._rss0 if rss1 is not None and self._rss0 is not None else None
+
+    def to_record(self, **meta):
+        return {"ts": self.started.isoformat(timespec="milliseconds"), "label": self.label,
+                "total_ms": self.total_ms, "rss_delta_kb": self.rss_delta_kb,
+                "spans": self.spans, **meta}
+
+def summarize(spans):
+    """Per span-naam: aantal, totaal en max ms, som van de RSS-delta's; duurste eerst."""
+    agg = {}
+    for s in spans:
+        a = agg.setdefault(s["name"], {"name": s["name"], "count": 0, "total_ms": 0.0, "max_ms": 0.0,
+                                       "rss_kb": 0})
+        a["count"] += 1
+        a["total_ms"] = round(a["total_ms"] + s["ms"], 3)
+        a["max_ms"] = max(a["max_ms"], s["ms"])
+        a["rss_kb"] += s["rss_kb"] or 0
+    return sorted(agg.values(), key=lambda a: -a["total_ms"])
+
+def start(label):
+    rec = Recorder(label)
+    rec._token = _current.set(rec)
+    return rec
+
+def stop(rec, path=None, **meta):
+    """Rond de run af; met `path` wordt het record aan dat JSONL-bestand toegevoegd."""
+    try:
+        _current.reset(rec._token)
+    except ValueError:
+        # Andere context (bijv. een afgebroken rerun): alleen loskoppelen
+        _current.set(None)
+    rec.finish()
+    record = rec.to_record(**meta)
+    if path:
+        append_jsonl(path, record)
+    return record
+
+def append_jsonl(path, record):
+    line = json.dumps(record, default=str, ensure_ascii=False)
+    with _log_lock, open(path, "a", encoding="utf-8") as f:
+        f.write(line + "\n")
+
+@contextmanager
+def recording(label, path=None, sink=None, **meta):
+    """Meet een blok als eigen run, tenzij er al een meting loopt (dan is het een span)."""
+    if _current.get() is not None:
+        with span(label):
+            yield
+        return
+    rec = start(label)
+    try:
+        yield
+    finally:
+        record = stop(rec, path, **meta)
+        if sink is not None:
+            sink(record)
+
+# ======================
+# SPANS
+# ======================
+@contextmanager
+def span(name):
+    rec = _current.get()
+    if rec is None:
+        yield
+        return
+    t0, r0 = time.perf_counter(), rss_kb()
+    try:
+        yield
+    finally:
+        r1 = rss_kb()
+        rec.add(name, (time.perf_counter() - t0) * 1000.0, r1 - r0 if r0 is not None and r1 is not None else None)
+
+def timed(name):
+    """Decorator-variant van span."""
+    def deco(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if _current.get() is None:
+                return fn(*args, **kwargs)
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return deco
@@ -0,0 +1,169 @@
+"""
+Achtergrondjobs voor zware taken (PDF-generatie): één begrensde threadpool per proces, met
+job-id's, voortgang en toelatingscontrole. De UI-thread blijft vrij en pollt de status.
+
+    queue = JobQueue(workers=2, max_pending=8)
+    job = queue.submit(owner, build, data=...)   # build(job, data=...); JobRejected als het niet past
+    job.progress                                 # {"sections": (3, 14), "images": (5, 24)}
+    queue.take(job.id)                           # afgerond: job (met .result) uit de queue halen
+    queue.discard(job.id)                        # annuleren en opruimen, ook een al gebouwd resultaat
+
+Threads in plaats van processen: de zware delen (Pillow) geven de GIL vrij en een job moet de
+sessiecache (LRUCache met secties en beelden) kunnen gebruiken.
+"""
+import os
+import threading
+import time
+import uuid
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+
+JOB_WORKERS = int(os.environ.get("PRESSURETEST_PDF_WORKERS") or 0) or max(1, min(2, (os.cpu_count() or 1) // 2))
+JOB_MAX_PENDING = 8     # wachtende jobs bovenop de lopende; daarboven wordt geweigerd
+JOB_TTL_S = 15 * 60     # afgeronde jobs die niemand ophaalt (sessie weg) worden daarna opgeruimd,
+                        # bij de volgende submit/get/stats of zodra een andere job klaar is
+
+class JobRejected(Exception):
+    """Toelatingscontrole: de wachtrij is vol, of de eigenaar heeft al een lopende job."""
+    def __init__(self, reason):
+        super().__init__(reason)
+        self.reason = reason
+
+class JobCancelled(Exception):
+    pass
+
+class Job:
+    def __init__(self, owner):
+        self.id = uuid.uuid4().hex[:12]
+        self.owner = owner
+        self.state = QUEUED
+        self.progress = {}
+        self.info = {}
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self._cancel = threading.Event()
+        self._future = None
+
+    @property
+    def active(self):
+        return self.state in (QUEUED, RUNNING)
+
+    def report(self, kind, done, total):
+        """Voortgang vanuit de job, bijv. ("images", 5, 24); breekt de job af na cancel()."""
+        if self._cancel.is_set():
+            raise JobCancelled()
+        self.progress[kind] = (done, total)
+
+    def fraction(self):
+        done = sum(d for d, _t in self.progress.values())
+        total = sum(t for _d, t in self.progress.values())
+        return done / total if total else 0.0
+
+    def cancel(self):
+        self._cancel.set()
+        if self._future is not None and self._future.cancel():
+            self.state, self.finished = CANCELLED, time.time()
+
+    def timings(self):
+        """(wachttijd, looptijd) in seconden, voor zover bekend."""
+        wait = (self.started or time.time()) - self.created
+        run = ((self.finished or time.time()) - self.started) if self.started else None
+        return wait, run
+
+class JobQueue:
+    def __init__(self, workers=JOB_WORKERS, max_pending=JOB_MAX_PENDING, ttl_s=JOB_TTL_S):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.ttl_s = ttl_s
+        # Pas hier geïmporteerd: concurrent.futures trekt logging mee en telt anders bij de opstarttijd
+        from concurrent.futures import ThreadPoolExecutor
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job")
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, owner, fn, **kwargs):
+        """Plan fn(job, **kwargs) in; de returnwaarde wordt job.result."""
+        with self._lock:
+            self._prune()
+            active = [j for j in self._jobs.values() if j.active]
+            if any(j.owner == owner for j in active):
+                raise JobRejected("owner")
+            if len(active) >= self.workers + self.max_pending:
+                raise JobRejected("full")
+            job = Job(owner)
+            self._jobs[job.id] = job
+            job._future = self._pool.submit(self._run, job, fn, kwargs)
+        return job
+
+    def _run(self, job, fn, kwargs):
+        if job._cancel.is_set():
+            job.state, job.finished = CANCELLED, time.time()
+            return
+        job.state, job.started = RUNNING, time.time()
+        try:
+            job.result = fn(job, **kwargs)
+            if job._cancel.is_set():
+                # Na de laatste report() geannuleerd (reset): niemand haalt het resultaat nog op
+                _close_result(job)
+                job.state = CANCELLED
+            else:
+                job.state = DONE
+        except JobCancelled:
+            job.state = CANCELLED
+        except Exception as e:
+            job.error = f"{type(e).__name__}: {e}"
+            job.state = FAILED
+        finally:
+            job.finished = time.time()
+        with self._lock:
+            self._prune()
+
+    def get(self, job_id):
+        with self._lock:
+            self._prune()
+            return self._jobs.get(job_id)
+
+    def take(self, job_id):
+        """Haal een job uit de queue; de aanroeper wordt eigenaar van job.result."""
+        with self._lock:
+            return self._jobs.pop(job_id, None)
+
+    def discard(self, job_id):
+        """Annuleer een job en ruim hem op, met een eventueel al gebouwd resultaat (reset)."""
+        job = self.get(job_id)
+        if job is None:
+            return
+        job.cancel()
+        self.take(job_id)
+        if not job.active:
+            _close_result(job)
+        # Nog bezig: _run sluit het resultaat zelf, omdat de job geannuleerd is
+
+    def position(self, job):
+        """Plaats in de wachtrij (1 = volgende), 0 als de job niet (meer) wacht."""
+        with self._lock:
+            queued = sorted((j for j in self._jobs.values() if j.state == QUEUED), key=lambda j: j.created)
+        return next((n for n, j in enumerate(queued, 1) if j is job), 0)
+
+    def stats(self):
+        with self._lock:
+            self._prune()
+            states = [j.state for j in self._jobs.values()]
+        return {"workers": self.workers, "running": states.count(RUNNING), "queued": states.count(QUEUED),
+                "max_pending": self.max_pending}
+
+    def _prune(self):
+        cutoff = time.time() - self.ttl_s
+        for job_id, job in list(self._jobs.items()):
+            if not job.active and job.finished < cutoff:
+                del self._jobs[job_id]
+                _close_result(job)
+
+def _close_result(job):
+    close = getattr(job.result, "close", None)
+    if close is not None:
+        close()
+    job.result = None
@@ -0,0 +1,237 @@
+"""
+Import en analyse van drukloggers (CSV, één meting per regel).
+
+Verwacht formaat: een kopregel gevolgd door metingen, scheidingsteken `,`, `;` of tab
+(bij `;` mag de decimaal een komma zijn). Herkende kolommen (hoofdletterongevoelig):
+
+    tijd        time / timestamp / datetime / tijd / elapsed / sec   ISO-tijdstip of seconden
+    druk        pressure / druk / bar / psi                          "psi" in de naam = PSI, anders bar(g)
+    temperatuur temp                                                 °C, optioneel
+
+Regels vóór de kopregel (logger-preamble) en regels die met `#` beginnen worden overgeslagen.
+Alles wordt in één keer door numpy geparsed en geanalyseerd, zonder Python-lus per regel.
+"""
+from datetime import datetime, timedelta
+from io import StringIO
+
+from .cache import content_key
+from .units import psi_to_bar
+
+ATM_BAR = 1.01325                 # gauge -> absoluut, voor de temperatuurcorrectie
+KELVIN = 273.15
+HOLD_START_FRACTION = 0.98        # hold begint bij de eerste meting >= 98% van de piekdruk
+LOGGER_SETTLE_FRACTION = 0.002    # ... waarna de druk binnen 60 s minder dan 0,2% van de piek stijgt
+LOGGER_RELEASE_S = 60             # hold eindigt waar de druk binnen 60 s meer dan
+LOGGER_RELEASE_FRACTION = 0.02    # 2% van de piek daalt (aflaten)
+LOGGER_MIN_HOLD_S = 600           # kortere hold: altijd FAIL-voorstel
+LOGGER_WINDOW_S = 600             # vensterlengte voor stabiliteit
+LOGGER_STABLE_BAR = 0.01          # max. variatie (gecorrigeerd) binnen een stabiel venster, minimaal...
+LOGGER_STABLE_FRACTION = 0.001    # ... of 0,1% van de startdruk als dat groter is
+LOGGER_MAX_DROP_PCT = 1.0         # toegestane drukval (gecorrigeerd) in % van Pt voor PASS
+LOGGER_CHART_BUCKETS = 500        # min/max-paren in de grafiek (PDF en UI)
+
+_TIME_NAMES = ("timestamp", "datetime", "time", "tijd", "elapsed", "sec", "date", "datum")
+_PRESSURE_NAMES = ("pressure", "druk", "bar", "psi")
+_TEMP_NAMES = ("temp",)
+
+# ======================
+# PARSEN
+# ======================
+def _find_col(names, candidates):
+    for cand in candidates:
+        for n, name in enumerate(names):
+            if cand in name:
+                return n
+    return None
+
+def _split_header(text):
+    """(kopregel-index, scheidingsteken, kolomnamen) of ValueError."""
+    lines = text.splitlines()
+    for n, line in enumerate(lines[:50]):
+        if not line.strip() or line.lstrip().startswith("#"):
+            continue
+        delim = max([",", ";", "\t"], key=line.count)
+        names = [c.strip().strip('"').lower() for c in line.split(delim)]
+        if _find_col(names, _PRESSURE_NAMES) is not None and _find_col(names, _TIME_NAMES) is not None:
+            return n, delim, names
+    raise ValueError("no header with a time and a pressure column found")
+
+def _loadtxt(body, delim, usecols, dtype):
+    import numpy as np
+    return np.loadtxt(StringIO(body), delimiter=delim, usecols=usecols, dtype=dtype,
+                      comments="#", quotechar='"', ndmin=1 if isinstance(usecols, int) else 2)
+
+def _time_seconds(body, delim, col):
+    """Tijdkolom -> (seconden t.o.v. de eerste meting, starttijdstip of None)."""
+    import numpy as np
+    try:
+        t = _loadtxt(body, delim, col, np.float64)
+        return t - t[0], None
+    except ValueError:
+        # ISO-tijdstippen: als bytes inlezen en in één keer naar datetime64 (veel sneller dan str)
+        ts = np.char.strip(_loadtxt(body, delim, col, "S40")).astype("datetime64[ms]")
+        secs = (ts - ts[0]) / np.timedelta64(1, "s")
+        return secs, ts[0].astype(datetime)
+
+def load_logger_csv(b):
+    """
+    Parse een loggerbestand (bytes). Geeft {"t": seconden, "p": bar(g), "temp": °C of None,
+    "start_dt": datetime of None, "key": hash van het bestand}; t is oplopend gesorteerd.
+    """
+    import numpy as np
+
+    text = b.decode("utf-8-sig", errors="replace")
+    head, delim, names = _split_header(text)
+    parts = text.split("\n", head + 1)
+    body = parts[head + 1] if len(parts) > head + 1 else ""
+    if delim == ";":
+        body = body.replace(",", ".")
+    ti, pi, ci = _find_col(names, _TIME_NAMES), _find_col(names, _PRESSURE_NAMES), _find_col(names, _TEMP_NAMES)
+    # Numerieke kolommen direct als float (C-parser), de tijdkolom apart
+    vals = _loadtxt(body, delim, [pi] + ([ci] if ci is not None else []), np.float64)
+    if len(vals) < 2:
+        raise ValueError("logger file contains fewer than two readings")
+    t, start_dt = _time_seconds(body, delim, ti)
+    p = vals[:, 0]
+    if "psi" in names[pi]:
+        p = psi_to_bar(p)
+    temp = vals[:, 1] if ci is not None else None
+    if np.any(np.diff(t) < 0):
+        order = np.argsort(t, kind="stable")
+        t, p = t[order], p[order]
+        temp = temp[order] if temp is not None else None
+    return {"t": t, "p": p, "temp": temp, "start_dt": start_dt, "key": content_key(b)}
+
+# ======================
+# ANALYSE
+# ======================
+def hold_bounds(t, p):
+    """
+    Index-bereik [start, end) van de drukhold: na het oppompen, vóór het aflaten. De hold
+    begint als de druk bij de piek is en niet meer stijgt (oppompen klaar) en eindigt bij de
+    eerste meting waarna de druk binnen LOGGER_RELEASE_S meer dan LOGGER_RELEASE_FRACTION
+    van de piek daalt; zonder aflaten loopt de hold tot het einde.
+    """
+    import numpy as np
+    peak = p.max()
+    later = np.minimum(np.searchsorted(t, t + LOGGER_RELEASE_S), len(p) - 1)
+    change = p[later] - p
+    settled = np.flatnonzero((p >= HOLD_START_FRACTION * peak) & (change < LOGGER_SETTLE_FRACTION * peak))
+    start = int(settled[0]) if len(settled) else int(np.argmax(p))
+    fast = np.flatnonzero(-change[start:] > LOGGER_RELEASE_FRACTION * peak)
+    end = start + int(fast[0]) if len(fast) else len(p)
+    return start, max(end, start + 1)
+
+def temperature_compensated(p, temp, ref_temp):
+    """Druk herleid naar ref_temp (Gay-Lussac, op absolute druk); zonder temperatuur ongewijzigd."""
+    if temp is None:
+        return p
+    return (p + ATM_BAR) * (ref_temp + KELVIN) / (temp + KELVIN) - ATM_BAR
+
+def stability_windows(t, p, start_p, window_s=LOGGER_WINDOW_S):
+    """
+    Deel de hold op in vensters van window_s en markeer vensters waarin de (gecorrigeerde) druk
+    minder dan de tolerantie varieert. Aaneengesloten stabiele vensters worden samengevoegd tot
+    [(van_s, tot_s), ...].
+    """
+    import numpy as np
+    tol = max(LOGGER_STABLE_BAR, LOGGER_STABLE_FRACTION * abs(start_p))
+    win = ((t - t[0]) // window_s).astype(np.int64)
+    edges = np.concatenate(([0], np.flatnonzero(np.diff(win)) + 1))
+    spread = np.maximum.reduceat(p, edges) - np.minimum.reduceat(p, edges)
+    stable = spread <= tol
+    # Begin/eind van reeksen stabiele vensters via de flanken van het masker
+    flanks = np.diff(np.concatenate(([0], stable.astype(np.int8), [0])))
+    run_from, run_to = np.flatnonzero(flanks == 1), np.flatnonzero(flanks == -1)
+    ends = np.concatenate((edges[1:], [len(t)])) - 1
+    return [(float(t[edges[a]]), float(t[ends[b - 1]])) for a, b in zip(run_from, run_to)]
+
+def decimate_minmax(t, p, buckets=LOGGER_CHART_BUCKETS):
+    """
+    Verklein een reeks tot max. 2*buckets punten met behoud van pieken: per bucket het
+    minimum en maximum, in tijdsvolgorde.
+    """
+    import numpy as np
+    n = len(p)
+    if n <= 2 * buckets:
+        return t, p
+    size = -(-n // buckets)
+    padded = np.pad(p, (0, size * buckets - n), mode="edge").reshape(buckets, size)
+    base = np.arange(buckets) * size
+    imin, imax = base + padded.argmin(axis=1), base + padded.argmax(axis=1)
+    idx = np.minimum(np.stack([np.minimum(imin, imax), np.maximum(imin, imax)], axis=1).ravel(), n - 1)
+    return t[idx], p[idx]
+
+def analyze_hold(log):
+    """
+    Kengetallen van de hold: start/eind/min druk, max. drukval (t.o.v. het voorgaande maximum),
+    vervalsnelheid (lineaire fit, bar/h), temperatuurgecorrigeerde drukval en stabiele vensters.
+    Bevat ook een min/max-gedecimeerde grafiekreeks ("chart_t" in uren, "chart_p" in bar).
+    """
+    import numpy as np
+    t, p, temp = log["t"], log["p"], log["temp"]
+    a, z = hold_bounds(t, p)
+    th, ph = t[a:z], p[a:z]
+    tmph = temp[a:z] if temp is not None else None
+    pc = temperature_compensated(ph, tmph, tmph[0] if tmph is not None else None)
+
+    hours = (th - th[0]) / 3600.0
+    slope = 0.0
+    if len(th) > 1 and hours[-1] > 0:
+        # Kleinste-kwadraten helling, gesloten vorm (goedkoper dan polyfit op 10^6 punten)
+        hc = hours - hours.mean()
+        slope = float((hc * (pc - pc.mean())).sum() / (hc * hc).sum())
+
+    chart_t, chart_p = decimate_minmax(t, p)
+    start_dt = log.get("start_dt")
+    return {
+        "key": log["key"],
+        "samples": int(len(t)),
+        "hold_samples": int(z - a),
+        "hold_start_s": float(th[0]), "hold_end_s": float(th[-1]),
+        "hold_s": float(th[-1] - th[0]),
+        "start_dt": start_dt,
+        "start_bar": float(ph[0]), "end_bar": float(ph[-1]), "min_bar": float(ph.min()),
+        "peak_bar": float(ph.max()),
+        "max_drop_bar": float((np.maximum.accumulate(ph) - ph).max()),
+        "drop_bar": float(pc[0] - pc[-1]),
+        "decay_bar_h": -slope,
+        "temp_range": (float(tmph.min()), float(tmph.max())) if tmph is not None else None,
+        "stable_windows": stability_windows(th, pc, ph[0]),
+        "chart_t": chart_t / 3600.0, "chart_p": chart_p,
+    }
+
+def logger_times(analysis):
+    """(hold-start, hold-eind) als datetime, of None als de logger geen absolute tijd heeft."""
+    dt0 = analysis.get("start_dt")
+    if dt0 is None:
+        return None
+    return dt0 + timedelta(seconds=analysis["hold_start_s"]), dt0 + timedelta(seconds=analysis["hold_end_s"])
+
+def suggest_result(analysis, pt_bar, max_drop_pct=LOGGER_MAX_DROP_PCT):
+    """
+    PASS/FAIL-voorstel: de hold moet minstens LOGGER_MIN_HOLD_S duren, (minstens) testdruk
+    Pt halen en de temperatuurgecorrigeerde drukval mag max. max_drop_pct % van Pt zijn.
+    Geeft ("PASS"|"FAIL", reden).
+    """
+    ref = pt_bar if pt_bar else analysis["start_bar"]
+    allowed = ref * max_drop_pct / 100.0
+    if analysis["hold_s"] < LOGGER_MIN_HOLD_S:
+        return "FAIL", f"hold {analysis['hold_s']/60:.0f} min < {LOGGER_MIN_HOLD_S/60:.0f} min"
+    if pt_bar and analysis["peak_bar"] < pt_bar - allowed:
+        return "FAIL", f"peak {analysis['peak_bar']:.2f} bar < Pt {pt_bar:.2f} bar"
+    if analysis["drop_bar"] > allowed:
+        return "FAIL", f"drop {analysis['drop_bar']:.3f} bar > {allowed:.3f} bar"
+    return "PASS", f"drop {analysis['drop_bar']:.3f} bar <= {allowed:.3f} bar"
+
+def fmt_summary(analysis):
+    """Korte samenvatting op één regel (UI en PDF)."""
+    hold_h = analysis["hold_s"] / 3600.0
+    longest = max((b - a for a, b in analysis["stable_windows"]), default=0.0) / 60.0
+    txt = (f"{analysis['samples']} samples, hold {hold_h:.2f} h: "
+           f"{analysis['start_bar']:.2f} → {analysis['end_bar']:.2f} bar, "
+           f"max drop {analysis['max_drop_bar']:.3f} bar, decay {analysis['decay_bar_h']:.4f} bar/h, "
+           f"longest stable {longest:.0f} min")
+    if analysis["temp_range"]:
+        txt += f", {analysis['temp_range'][0]:.1f}–{analysis['temp_range'][1]:.1f} °C"
+    return txt
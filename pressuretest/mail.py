@@ -0,0 +1,312 @@
+"""
+Uitgaande e-mail met de PDF als bijlage: één dispatcher per proces met een kleine pool
+SMTP-verbindingen. Een verbinding blijft open en verstuurt alles wat klaarstaat achter elkaar,
+in plaats van per rapport opnieuw te verbinden, TLS te doen en in te loggen.
+
+    mailer = MailDispatcher.from_env()      # None zonder PRESSURETEST_SMTP_HOST
+    mail = mailer.submit(["documentation@tanis.com"], "Onderwerp", "Tekst",
+                         attachments=[("rapport.pdf", partial(archive.pdf, report_id))])
+    mailer.get(mail.id).state               # queued / sending / sent / failed
+
+submit() zet alleen in de wachtrij; versturen gebeurt in de worker-threads. Een bijlage mag
+een callable zijn die de bytes geeft: die wordt pas bij het versturen gelezen, zodat een
+wachtende mail geen PDF in het geheugen houdt. Tijdelijke fouten (verbinding weg, 4xx) worden
+met exponentiële backoff opnieuw geprobeerd, permanente (5xx, ontbrekende bijlage) niet.
+De wachtrij staat in het geheugen: na een herstart is een niet-verzonden mail weg (het rapport
+zelf staat in het archief).
+
+Configuratie via de omgeving:
+
+    PRESSURETEST_SMTP_HOST      server; zonder deze variabele is er geen dispatcher
+    PRESSURETEST_SMTP_PORT      standaard 25 (465 bij SMTP_SSL=1)
+    PRESSURETEST_SMTP_USER / PRESSURETEST_SMTP_PASSWORD
+    PRESSURETEST_SMTP_STARTTLS  1 = STARTTLS na verbinden
+    PRESSURETEST_SMTP_SSL       1 = direct TLS (SMTPS)
+    PRESSURETEST_MAIL_FROM      afzender (standaard de SMTP-gebruiker)
+    PRESSURETEST_MAIL_WORKERS   aantal verbindingen in de pool (standaard 2)
+
+smtplib en email worden pas bij de eerste mail geïmporteerd (opstarttijd, zie
+tools/check_import_time.py). Lokaal testen kan tegen tools/smtp_sink.py.
+"""
+import os
+import threading
+import time
+import uuid
+
+QUEUED, SENDING, SENT, FAILED = "queued", "sending", "sent", "failed"
+
+MAIL_WORKERS = int(os.environ.get("PRESSURETEST_MAIL_WORKERS") or 0) or 2
+MAIL_BATCH_MAX = 20         # mails per verbinding per ronde; daarna krijgen andere workers ook werk
+MAIL_MAX_ATTEMPTS = 5
+MAIL_BACKOFF_S = 2.0        # 2, 4, 8, 16 s tussen pogingen
+MAIL_BACKOFF_MAX_S = 300.0
+MAIL_IDLE_S = 30.0          # open verbinding zonder werk daarna sluiten (servers kappen vaak na ~60 s)
+MAIL_NOOP_AFTER_S = 5.0     # langer stil: eerst NOOP, zodat een weggevallen verbinding geen poging kost
+MAIL_TIMEOUT_S = 30.0
+MAIL_TTL_S = 60 * 60        # afgeronde mails blijven zo lang opvraagbaar
+
+def _env_flag(environ, name):
+    return environ.get(name, "").strip().lower() in ("1", "true", "yes", "on")
+
+def _valid_address(addr):
+    local, _, domain = addr.rpartition("@")
+    return bool(local) and "." in domain and not any(c.isspace() for c in addr)
+
+class Mail:
+    def __init__(self, to, subject, body, attachments):
+        self.id = uuid.uuid4().hex[:12]
+        self.to = list(to)
+        self.subject = subject
+        self.body = body
+        self.attachments = list(attachments)
+        self.message_id = None   # één Message-ID voor alle pogingen: ontvangers kunnen dedupliceren
+        self.state = QUEUED
+        self.attempts = 0
+        self.error = None
+        self.refused = {}
+        self.due = time.monotonic()
+        self.created = time.time()
+        self.finished = None
+
+    @property
+    def active(self):
+        return self.state in (QUEUED, SENDING)
+
+def _permanent(e):
+    """Permanente fout, opnieuw proberen heeft geen zin: 5xx-antwoord of ontbrekende bijlage."""
+    import smtplib
+    if isinstance(e, LookupError):
+        return True
+    if isinstance(e, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _msg in e.recipients.values())
+    return isinstance(e, smtplib.SMTPResponseException) and e.smtp_code >= 500
+
+def _broken(e):
+    """Is de verbinding na deze fout onbruikbaar?"""
+    import smtplib
+    if isinstance(e, smtplib.SMTPServerDisconnected):
+        return True
+    if isinstance(e, smtplib.SMTPResponseException):
+        return e.smtp_code == 421
+    return isinstance(e, OSError) and not isinstance(e, smtplib.SMTPException)
+
+def _quit(conn):
+    try:
+        conn.quit()
+    except Exception:
+        conn.close()
+
+class MailDispatcher:
+    def __init__(self, host, port=None, user=None, password=None, sender=None, starttls=False,
+                 use_ssl=False, workers=MAIL_WORKERS, batch_max=MAIL_BATCH_MAX,
+                 max_attempts=MAIL_MAX_ATTEMPTS, backoff_s=MAIL_BACKOFF_S, idle_s=MAIL_IDLE_S,
+                 timeout_s=MAIL_TIMEOUT_S, ttl_s=MAIL_TTL_S):
+        self.host = host
+        self.port = port or (465 if use_ssl else 25)
+        self.user = user
+        self.password = password
+        self.sender = sender or user
+        if not self.sender:
+            raise ValueError("no sender: set PRESSURETEST_MAIL_FROM")
+        self.starttls = starttls
+        self.use_ssl = use_ssl
+        self.batch_max = batch_max
+        self.max_attempts = max_attempts
+        self.backoff_s = backoff_s
+        self.idle_s = idle_s
+        self.timeout_s = timeout_s
+        self.ttl_s = ttl_s
+        self._mails = {}
+        self._queue = []
+        self._cond = threading.Condition()
+        self._closed = False
+        self._counts = {"connections": 0, "batches": 0}
+        self._threads = [threading.Thread(target=self._worker, name=f"mail-{n}", daemon=True)
+                         for n in range(workers)]
+        for t in self._threads:
+            t.start()
+
+    @classmethod
+    def from_env(cls, environ=os.environ):
+        host = environ.get("PRESSURETEST_SMTP_HOST")
+        if not host:
+            return None
+        return cls(host, port=int(environ.get("PRESSURETEST_SMTP_PORT") or 0) or None,
+                   user=environ.get("PRESSURETEST_SMTP_USER") or None,
+                   password=environ.get("PRESSURETEST_SMTP_PASSWORD") or None,
+                   sender=environ.get("PRESSURETEST_MAIL_FROM") or None,
+                   starttls=_env_flag(environ, "PRESSURETEST_SMTP_STARTTLS"),
+                   use_ssl=_env_flag(environ, "PRESSURETEST_SMTP_SSL"))
+
+    # ======================
+    # WACHTRIJ
+    # ======================
+    def submit(self, to, subject, body, attachments=()):
+        """
+        Zet een mail in de wachtrij en geef de Mail terug; blokkeert niet. attachments:
+        [(bestandsnaam, bytes of callable die bytes geeft)]. ValueError bij een ongeldig adres.
+        """
+        to = [a.strip() for a in to if a.strip()]
+        if not to:
+            raise ValueError("no recipients")
+        bad = [a for a in to if not _valid_address(a)]
+        if bad:
+            raise ValueError(", ".join(bad))
+        mail = Mail(to, subject, body, attachments)
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("dispatcher is closed")
+            self._prune()
+            self._mails[mail.id] = mail
+            self._queue.append(mail)
+            self._cond.notify()
+        return mail
+
+    def get(self, mail_id):
+        with self._cond:
+            return self._mails.get(mail_id)
+
+    def stats(self):
+        with self._cond:
+            states = [m.state for m in self._mails.values()]
+            return {"workers": len(self._threads), **{s: states.count(s) for s in (QUEUED, SENDING, SENT, FAILED)},
+                    **self._counts}
+
+    def close(self, timeout=None):
+        """Stop de workers; wat nu al aan de beurt is wordt nog verstuurd, uitgestelde retries niet."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        for t in self._threads:
+            t.join(timeout)
+
+    def _prune(self):
+        cutoff = time.time() - self.ttl_s
+        for mail_id, mail in list(self._mails.items()):
+            if not mail.active and mail.finished < cutoff:
+                del self._mails[mail_id]
+
+    def _take_due(self):
+        now = time.monotonic()
+        batch = [m for m in self._queue if m.due <= now][:self.batch_max]
+        for m in batch:
+            self._queue.remove(m)
+            m.state = SENDING
+        return batch
+
+    def _retry_or_fail(self, mail, e):
+        mail.error = f"{type(e).__name__}: {e}"
+        with self._cond:
+            mail.attempts += 1
+            if _permanent(e) or mail.attempts >= self.max_attempts:
+                mail.state, mail.finished = FAILED, time.time()
+            else:
+                mail.state = QUEUED
+                mail.due = time.monotonic() + min(MAIL_BACKOFF_MAX_S, self.backoff_s * 2 ** (mail.attempts - 1))
+                self._queue.append(mail)
+                self._cond.notify()
+
+    # ======================
+    # VERSTUREN
+    # ======================
+    def _worker(self):
+        conn, last_used = None, 0.0
+        while True:
+            with self._cond:
+                while True:
+                    batch = self._take_due()
+                    if batch or self._closed:
+                        break
+                    now = time.monotonic()
+                    waits = [m.due - now for m in self._queue]
+                    if conn is not None:
+                        waits.append(last_used + self.idle_s - now)
+                    wait = min(waits) if waits else None
+                    if wait is not None and wait <= 0:
+                        break  # niets te doen, maar de open verbinding is verlopen
+                    self._cond.wait(wait)
+            if batch:
+                conn = self._send_batch(conn, batch, time.monotonic() - last_used)
+                last_used = time.monotonic()
+            elif conn is not None:
+                _quit(conn)
+                conn = None
+            if not batch and self._closed:
+                return
+
+    def _connect(self):
+        import smtplib
+        import ssl
+        if self.use_ssl:
+            conn = smtplib.SMTP_SSL(self.host, self.port, timeout=self.timeout_s,
+                                    context=ssl.create_default_context())
+        else:
+            conn = smtplib.SMTP(self.host, self.port, timeout=self.timeout_s)
+        try:
+            if self.starttls:
+                conn.starttls(context=ssl.create_default_context())
+            if self.user:
+                conn.login(self.user, self.password or "")
+        except BaseException:
+            conn.close()
+            raise
+        with self._cond:
+            self._counts["connections"] += 1
+        return conn
+
+    def _send_batch(self, conn, batch, idle):
+        """Verstuur `batch` over één verbinding (zo nodig (her)opend); geeft de verbinding terug."""
+        if conn is not None and idle > MAIL_NOOP_AFTER_S:
+            try:
+                conn.noop()
+            except Exception:
+                conn.close()
+                conn = None
+        with self._cond:
+            self._counts["batches"] += 1
+        for n, mail in enumerate(batch):
+            if conn is None:
+                try:
+                    conn = self._connect()
+                except Exception as e:
+                    # Server onbereikbaar: de hele rest van de batch wacht op de volgende poging
+                    for m in batch[n:]:
+                        self._retry_or_fail(m, e)
+                    return None
+            try:
+                refused = conn.send_message(self._message(mail), self.sender, mail.to)
+            except Exception as e:
+                if _broken(e):
+                    conn.close()
+                    conn = None
+                self._retry_or_fail(mail, e)
+                continue
+            with self._cond:
+                mail.refused = {a: code for a, (code, _msg) in refused.items()}
+                mail.error = None
+                mail.attempts += 1
+                mail.state, mail.finished = SENT, time.time()
+        return conn
+
+    def _message(self, mail):
+        import mimetypes
+        from email.message import EmailMessage
+        from email.utils import formatdate, make_msgid
+        msg = EmailMessage()
+        msg["From"] = self.sender
+        msg["To"] = ", ".join(mail.to)
+        msg["Subject"] = mail.subject
+        msg["Date"] = formatdate(localtime=True)
+        if mail.message_id is None:
+            mail.message_id = make_msgid(domain=self.sender.rpartition("@")[2] or None)
+        msg["Message-ID"] = mail.message_id
+        msg.set_content(mail.body)
+        for name, data in mail.attachments:
+            if callable(data):
+                data = data()
+            if data is None:
+                raise LookupError(f"attachment not available: {name}")
+            ctype = mimetypes.guess_type(name)[0] or "application/octet-stream"
+            maintype, subtype = ctype.split("/", 1)
+            msg.add_attachment(data, maintype=maintype, subtype=subtype, filename=name)
+        return msg
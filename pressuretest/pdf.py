@@ -0,0 +1,683 @@
+"""PDF-rapport (altijd Engels): beeldcodering, secties en build_pdf_bytes."""
+import os
+import copy
+import hashlib
+import tempfile
+import threading
+import zlib
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
+from functools import lru_cache, partial
+from io import BytesIO
+
+from PIL import Image as PILImage
+from reportlab.graphics.charts.lineplots import LinePlot
+from reportlab.graphics.shapes import Drawing, String
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.pdfbase import pdfdoc
+from reportlab.pdfbase.pdfdoc import PDFError, PDFImageXObject
+from reportlab.pdfbase.pdfutils import readJPEGInfo
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Table, TableStyle, Spacer, Flowable, Image as RLImage
+
+from .instrument import span
+from .logger import fmt_summary, suggest_result
+from .photos import photo_key, photo_pil
+from .translations import T
+from .units import bar_to_psi, psi_to_bar, fmt_duration
+
+# ======================
+# PDF IMAGE EMBEDDING
+# ======================
+PDF_IMAGE_MODE = "jpeg"   # "jpeg" of "png" (oud gedrag: lossless PNG op 72 DPI)
+PDF_IMAGE_DPI = 150       # doelresolutie van foto's in de PDF
+PDF_JPEG_QUALITY = 80
+PDF_POINTS_PER_INCH = 72.0
+
+def _box_size(max_w_px, aspect_ratio):
+    return max_w_px, int(max_w_px * aspect_ratio[1] / aspect_ratio[0])
+
+def _box_pixels(max_w_px, aspect_ratio, dpi):
+    """Aantal pixels dat nodig is om het vak (in punten) op `dpi` te vullen."""
+    box_w, box_h = _box_size(max_w_px, aspect_ratio)
+    scale = dpi / PDF_POINTS_PER_INCH
+    return max(1, int(round(box_w * scale))), max(1, int(round(box_h * scale)))
+
+# Gecodeerde afbeelding, los van een RLImage zodat hij gecachet en hergebruikt kan worden
+EncodedImage = namedtuple("EncodedImage", "data width height")
+
+def _rlimage(enc):
+    return RLImage(BytesIO(enc.data), width=enc.width, height=enc.height)
+
+def _encode_pil(pil_img, max_w_px=400, aspect_ratio=(16, 9), fmt="PNG", dpi=PDF_POINTS_PER_INCH,
+                quality=PDF_JPEG_QUALITY, contain=False):
+    """
+    Schaal afbeelding zodat deze netjes in de breedte past en in een vaste ratio wordt weergegeven.
+    Default: 16:9 en max 400 breed -> past mooi op A4 met ruimte voor tekst.
+    `max_w_px` is de breedte op de pagina (punten); `dpi` bepaalt hoeveel pixels daarin komen.
+    Met `contain` wordt nooit gecropt: het hele beeld past in het vak, gecentreerd op wit.
+    """
+    box_w, box_h = _box_size(max_w_px, aspect_ratio)
+    target_w, target_h = _box_pixels(max_w_px, aspect_ratio, dpi)
+
+    w, h = pil_img.size
+    if contain:
+        scale = min(target_w / float(w), target_h / float(h))
+        new_w, new_h = max(1, int(w * scale)), max(1, int(h * scale))
+        pad = PILImage.new("RGB", (target_w, target_h), "white")
+        pad.paste(pil_img.resize((new_w, new_h), PILImage.LANCZOS),
+                  ((target_w - new_w) // 2, (target_h - new_h) // 2))
+        return _encode_box(pad, box_w, box_h, fmt, quality)
+
+    scale = target_w / float(w)
+    new_w = target_w
+    new_h = int(h * scale)
+
+    pil_img_resized = pil_img.resize((new_w, new_h), PILImage.LANCZOS)
+
+    if new_h > target_h:
+        # Te hoog: centraal croppen naar target_h
+        offset = (new_h - target_h) // 2
+        pil_img_cropped = pil_img_resized.crop((0, offset, new_w, offset + target_h))
+    else:
+        # Te laag: witte balken boven/onder (letterbox)
+        pad = PILImage.new("RGB", (new_w, target_h), "white")
+        top = (target_h - new_h) // 2
+        pad.paste(pil_img_resized, (0, top))
+        pil_img_cropped = pad
+    return _encode_box(pil_img_cropped, box_w, box_h, fmt, quality)
+
+def _encode_box(pil_img, box_w, box_h, fmt, quality):
+    bio = BytesIO()
+    if fmt == "JPEG":
+        pil_img.save(bio, format="JPEG", quality=quality, optimize=True)
+    else:
+        pil_img.save(bio, format="PNG")
+    return EncodedImage(bio.getvalue(), box_w, box_h)
+
+def _pil_to_rlimage(pil_img, max_w_px=400, aspect_ratio=(16, 9), fmt="PNG", dpi=PDF_POINTS_PER_INCH,
+                    quality=PDF_JPEG_QUALITY):
+    return _rlimage(_encode_pil(pil_img, max_w_px, aspect_ratio, fmt=fmt, dpi=dpi, quality=quality))
+
+def _jpeg_passthrough_ok(data, max_w_px, aspect_ratio, dpi):
+    """
+    True als de originele JPEG ongewijzigd in de PDF kan: juiste verhouding en niet groter
+    dan nodig, zodat croppen en schalen overbodig is. Leest alleen de header.
+    """
+    try:
+        im = PILImage.open(BytesIO(data))
+    except Exception:
+        return False
+    if im.format != "JPEG" or im.mode not in ("RGB", "L"):
+        return False
+    w, h = im.size
+    target_w, _target_h = _box_pixels(max_w_px, aspect_ratio, dpi)
+    same_ratio = abs(w * aspect_ratio[1] - h * aspect_ratio[0]) < aspect_ratio[0]
+    return same_ratio and w <= target_w
+
+def _encode_photo(photo, max_w_px=400, aspect_ratio=(16, 9), mode=PDF_IMAGE_MODE, dpi=PDF_IMAGE_DPI,
+                  quality=PDF_JPEG_QUALITY):
+    if mode != "jpeg":
+        # Oude pad: 72 DPI, lossless PNG
+        target_w, _target_h = _box_pixels(max_w_px, aspect_ratio, PDF_POINTS_PER_INCH)
+        return _encode_pil(photo_pil(photo, min_w=target_w), max_w_px=max_w_px, aspect_ratio=aspect_ratio)
+    if photo.get("orientation", 1) == 1 and _jpeg_passthrough_ok(photo["data"], max_w_px, aspect_ratio, dpi):
+        # DCT-data van het origineel direct doorgeven, zonder her-encoderen
+        box_w, box_h = _box_size(max_w_px, aspect_ratio)
+        return EncodedImage(photo["data"], box_w, box_h)
+    target_w, _target_h = _box_pixels(max_w_px, aspect_ratio, dpi)
+    return _encode_pil(photo_pil(photo, min_w=target_w), max_w_px=max_w_px, aspect_ratio=aspect_ratio,
+                       fmt="JPEG", dpi=dpi, quality=quality)
+
+def _photo_to_rlimage(photo, max_w_px=400, aspect_ratio=(16, 9), mode=PDF_IMAGE_MODE, dpi=PDF_IMAGE_DPI,
+                      quality=PDF_JPEG_QUALITY):
+    return _rlimage(_encode_photo(photo, max_w_px, aspect_ratio, mode=mode, dpi=dpi, quality=quality))
+
+PDF_IMAGE_WORKERS = min(8, os.cpu_count() or 1)
+PDF_CACHE_MAX_ENTRIES = 64
+
+def pdf_cache_entries(n_compartments):
+    """
+    Cachegrootte waarin een heel rapport past: per compartiment een sectie en twee foto's,
+    plus vier vaste secties en de handtekening, met wat ruimte voor de vorige versie.
+    """
+    return max(PDF_CACHE_MAX_ENTRIES, 3 * n_compartments + 8)
+
+def _digest(*parts):
+    """Stabiele hash van de invoer van een sectie (dicts, datums, strings, getallen)."""
+    return hashlib.blake2b(repr(parts).encode("utf-8"), digest_size=16).hexdigest()
+
+def _signature_key(sig):
+    img = sig.get("image_pil")
+    return None if img is None else photo_key(img.tobytes()) + f"-{img.size[0]}x{img.size[1]}"
+
+PHOTO_BOX = (400, (16, 9))       # breedte (punten) en verhouding van foto's in de PDF
+SIGNATURE_BOX = (320, (4, 1))
+PDF_IMAGE_WINDOW = 8              # max. aantal beelden dat vooruit gecodeerd wordt
+
+# Plaatshouder voor een beeld in een sectie; wordt bij het samenstellen een _StreamImage
+ImageSlot = namedtuple("ImageSlot", "key width height")
+
+def _image_jobs(comps, sig, image_mode, image_dpi, jpeg_quality):
+    """
+    Alle beeld-jobs in story-volgorde: {slot-key: (cache-key, job)}, met als slot-key
+    (compartiment, "start"/"end") of "signature".
+    """
+    img_opts = (image_mode, image_dpi, jpeg_quality)
+    jobs = {}
+    for i, c in enumerate(comps):
+        for tp in ["start","end"]:
+            photo = c["photos"].get(tp)
+            if photo:
+                jobs[(i, tp)] = (("img", photo["key"], photo.get("orientation", 1), img_opts),
+                                 partial(_encode_photo, photo, max_w_px=PHOTO_BOX[0], aspect_ratio=PHOTO_BOX[1],
+                                         mode=image_mode, dpi=image_dpi, quality=jpeg_quality))
+    if sig.get("image_pil"):
+        # Handtekening blijft PNG (scherpe lijnen), wel op dezelfde DPI als de foto's
+        sig_dpi = image_dpi if image_mode == "jpeg" else PDF_POINTS_PER_INCH
+        jobs["signature"] = (("img", _signature_key(sig), sig_dpi),
+                             partial(_encode_pil, sig["image_pil"], max_w_px=SIGNATURE_BOX[0],
+                                     aspect_ratio=SIGNATURE_BOX[1], dpi=sig_dpi, contain=True))
+    return jobs
+
+class _ImageStream:
+    """
+    Codeert de beelden (decode, resize, crop/letterbox, encode) in story-volgorde op een
+    threadpool, met een begrensd vooruitkijkvenster. Pillow geeft de GIL vrij tijdens dat
+    werk, dus dit schaalt over threads; tegelijk blijft het geheugen vlak, hoe veel
+    compartimenten er ook zijn: een beeld wordt losgelaten zodra het op de pagina staat.
+    Met `cache` worden eerder gecodeerde beelden hergebruikt; `progress("images", n, totaal)`
+    wordt na elk gecodeerd beeld aangeroepen (vanuit de worker-thread).
+    """
+    def __init__(self, jobs, workers=PDF_IMAGE_WORKERS, window=PDF_IMAGE_WINDOW, cache=None, progress=None):
+        self._jobs = jobs
+        self._progress = progress
+        self._encoded = 0
+        self._lock = threading.Lock()
+        self._order = list(jobs)
+        self._pos = {k: n for n, k in enumerate(self._order)}
+        self._window = max(1, window)
+        self._cache = cache
+        self._pending = {}
+        self._submitted = 0
+        self._pool = (ThreadPoolExecutor(max_workers=min(workers, len(jobs)), thread_name_prefix="pdf-img")
+                      if workers > 1 and len(jobs) > 1 else None)
+
+    def _encode(self, key):
+        cache_key, job = self._jobs[key]
+        enc = self._cache.get_or_build(cache_key, job) if self._cache is not None else job()
+        if self._progress is not None:
+            with self._lock:
+                self._encoded += 1
+                n = self._encoded
+            self._progress("images", n, len(self._jobs))
+        return enc
+
+    def _fill(self, upto):
+        while self._submitted < min(upto, len(self._order)):
+            key = self._order[self._submitted]
+            self._pending[key] = self._pool.submit(self._encode, key)
+            self._submitted += 1
+
+    def get(self, key):
+        if self._pool is None:
+            return self._encode(key)
+        self._fill(self._pos[key] + self._window)
+        fut = self._pending.pop(key, None)
+        return fut.result() if fut is not None else self._encode(key)
+
+    def start(self):
+        if self._pool is not None:
+            self._fill(self._window)
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pending.clear()
+
+@lru_cache(maxsize=16)
+def _flate_image(data):
+    """
+    Niet-JPEG (PNG): (breedte, hoogte, componenten, zlib-gecomprimeerde pixels). Gecachet per
+    proces: het logo staat op elke pagina van elk rapport, de handtekening bij elk opnieuw genereren.
+    """
+    with PILImage.open(BytesIO(data)) as im:
+        if im.mode not in ("L", "RGB"):
+            im = im.convert("RGB")
+        return im.width, im.height, len(im.mode), zlib.compress(im.tobytes())
+
+def _image_xobject(name, data):
+    """
+    PDF-beeldobject voor gecodeerde beeldbytes. JPEG gaat ongewijzigd (DCT) de PDF in, PNG
+    (logo, handtekening, image_mode="png") als Flate-gecomprimeerde pixels; beide zonder de
+    ASCII85-laag van reportlab, die in pure Python draait.
+    """
+    info = None
+    if data[:3] == b"\xff\xd8\xff":
+        try:
+            info = readJPEGInfo(BytesIO(data))
+        except PDFError:
+            pass  # JPEG-variant die reportlab niet kan doorgeven
+    if info is not None:
+        (w, h, components), stream, filters = info[:3], data, ("DCTDecode",)
+    else:
+        w, h, components, stream = _flate_image(data)
+        filters = ("FlateDecode",)
+    obj = PDFImageXObject(name)
+    obj.width, obj.height, obj.bitsPerComponent = w, h, 8
+    obj.colorSpace = {1: "DeviceGray", 3: "DeviceRGB"}.get(components, "DeviceCMYK")
+    obj._dotrans = obj.colorSpace == "DeviceCMYK"
+    obj.streamContent = stream
+    obj._filters = filters
+    obj.mask = None
+    return obj
+
+def _draw_encoded(canv, enc, width, height):
+    """
+    Teken gecodeerde beeldbytes op (0, 0). Anders dan canvas.drawImage, dat elk beeld naar
+    ruwe RGB decodeert om er een naam voor te hashen, is de naam hier de hash van de bytes:
+    geen decode, en hetzelfde beeld staat maar één keer in de PDF.
+    """
+    name = "img" + photo_key(enc.data)
+    doc = canv._doc
+    reg = doc.getXObjectName(name)
+    if reg not in doc.idToObject:
+        obj = _image_xobject(name, enc.data)
+        doc.Reference(obj, reg)
+        doc.addForm(name, obj)
+    canv.saveState()
+    canv.scale(width, height)
+    canv.doForm(name)
+    canv.restoreState()
+
+class _StreamImage(Flowable):
+    """Beeld met vaste afmetingen dat pas bij het tekenen uit de _ImageStream wordt gehaald."""
+    def __init__(self, stream, slot):
+        super().__init__()
+        self._stream = stream
+        self._key = slot.key
+        self.width, self.height = slot.width, slot.height
+        self.hAlign = "CENTER"
+
+    def wrap(self, availWidth, availHeight):
+        return self.width, self.height
+
+    def draw(self):
+        with span("pdf.image"):
+            enc = self._stream.get(self._key)
+            _draw_encoded(self.canv, enc, self.width, self.height)
+
+# ======================
+# GEDEELDE RESOURCES (per proces)
+# ======================
+# Stylesheet, tabelstijlen en logo worden één keer per proces gemaakt en door alle rapporten,
+# sessies en threads gedeeld: ze worden tijdens het bouwen alleen gelezen.
+_GRID = [
+    ("BOX",(0,0),(-1,-1),0.6,colors.black),
+    ("INNERGRID",(0,0),(-1,-1),0.3,colors.black),
+]
+KEY_VALUE_TABLE_STYLE = TableStyle(_GRID + [
+    ("VALIGN",(0,0),(-1,-1),"MIDDLE"),
+    ("BACKGROUND",(0,0),(-1,0),colors.whitesmoke),
+])
+REGISTRATION_COLUMNS_STYLE = TableStyle(_GRID + [
+    ("BACKGROUND",(0,0),(-1,0),colors.lightgrey),
+    ("VALIGN",(0,0),(-1,-1),"MIDDLE"),
+])
+REGISTRATION_ROWS_STYLE = TableStyle(_GRID + [
+    ("BACKGROUND",(0,0),(-1,0),colors.lightgrey),
+    ("FONTSIZE",(0,1),(-1,-1),8),
+    ("VALIGN",(0,0),(-1,-1),"MIDDLE"),
+])
+SIGNATURE_TABLE_STYLE = TableStyle(_GRID)
+
+@lru_cache(maxsize=None)
+def _stylesheet():
+    styles = getSampleStyleSheet()
+    styles.add(styles["BodyText"].clone("RegSmall", fontSize=8, leading=9.5))
+    return styles
+
+PDF_MARGIN = 30
+LOGO_BOX = (90, 32)    # max. breedte en hoogte (punten) van het logo rechtsboven op elke pagina
+LOGO_DPI = 300         # logo's hebben scherpe randen: hogere resolutie dan foto's, als PNG
+LOGO_GAP = 8
+
+@lru_cache(maxsize=4)
+def _logo(path, mtime_ns):
+    # Gesleuteld op de bestandsversie: een vervangen logo wordt opnieuw ingelezen
+    with PILImage.open(path) as im:
+        im = im.convert("RGBA")
+    box_w, box_h = LOGO_BOX
+    scale = min(box_w / im.width, box_h / im.height)
+    w, h = im.width * scale, im.height * scale
+    px = (max(1, round(w * LOGO_DPI / PDF_POINTS_PER_INCH)), max(1, round(h * LOGO_DPI / PDF_POINTS_PER_INCH)))
+    im = im.resize(px, PILImage.LANCZOS)
+    # Plat op wit (de pagina is wit): geen aparte alfamasker-stream in de PDF
+    flat = PILImage.new("RGB", px, "white")
+    flat.paste(im, mask=im.getchannel("A"))
+    return _encode_box(flat, w, h, "PNG", None)
+
+def load_logo(path):
+    """Het logo geschaald en als PNG gecodeerd (EncodedImage), gecachet per proces; None als het ontbreekt."""
+    try:
+        mtime_ns = os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+    return _logo(os.path.abspath(path), mtime_ns)
+
+def _logo_drawer(logo):
+    """Paginacallback: het logo rechtsboven; één XObject dat elke pagina hergebruikt."""
+    def draw(canv, doc):
+        canv.saveState()
+        canv.translate(doc.pagesize[0] - doc.rightMargin - logo.width, doc.pagesize[1] - PDF_MARGIN - logo.height)
+        _draw_encoded(canv, logo, logo.width, logo.height)
+        canv.restoreState()
+    return draw
+
+# ======================
+# PDF SECTIONS
+# ======================
+# Elke sectie geeft een lijst flowables terug; beelden zijn ImageSlot-plaatshouders en worden
+# pas bij het samenstellen van de story een _StreamImage. Platypus muteert flowables tijdens
+# de layout, dus de story krijgt altijd kopieën en de cache blijft ongerept.
+def _meta_section(meta, styles, L="en"):
+    meta_rows = [
+        [T[L]["project_name"], meta["project_name"]],
+        [T[L]["manufacturer"], meta["manufacturer"]],
+        [T[L]["work_order"], meta["work_order"]],
+        [T[L]["drawing"], meta["drawing"]],
+        [T[L]["revision"], meta["revision"]],
+        [T[L]["part_line"], meta["part_line"]],
+    ]
+    meta_tbl = Table(meta_rows, colWidths=[160, 360])
+    meta_tbl.setStyle(KEY_VALUE_TABLE_STYLE)
+    return [meta_tbl, Spacer(1, 10)]
+
+def _requirements_section(req, styles, L="en"):
+    pt_bar = _pt_bar(req)
+    pt_psi = req["pt_value"] if req["pt_unit"]=="psi" else bar_to_psi(req["pt_value"])
+
+    test_instrument = req.get("test_instrument", "")
+    calibration_date_str = req.get("calibration_date_str", "")
+
+    req_rows = [
+        [T[L]["pt"], f"{pt_bar:.2f} {T[L]['unit_bar_g']} / {pt_psi:.2f} {T[L]['unit_psi_g']}"],
+        [T[L]["test_instrument"], test_instrument],
+        [T[L]["calibration_date"], calibration_date_str],
+        [T[L]["notes"], req["notes"]],
+    ]
+    req_tbl = Table(req_rows, colWidths=[200, 320])
+    req_tbl.setStyle(KEY_VALUE_TABLE_STYLE)
+    return [Paragraph("<b>Test requirements</b>", styles["Heading3"]), req_tbl, Spacer(1, 10)]
+
+REGISTRATION_MAX_COLUMNS = 6   # meer compartimenten: kolomgroepen of een rij per compartiment
+REGISTRATION_LABELS = ["Date","Start time","Start pressure (bar/PSI)","End time","End pressure (bar/PSI)",
+                       "Result","Remarks"]
+
+def _fp(x):
+    return "" if x is None else f"{x:.2f}"
+
+def _registration_columns(comps, first=0):
+    """Oude opmaak: één kolom per compartiment (nummering vanaf first + 1)."""
+    n = len(comps)
+    header = [""] + [str(first+i+1) for i in range(n)]
+    table = [header]
+    labels = REGISTRATION_LABELS
+    def v(key): return [c.get(key,"") for c in comps]
+    table += [
+        [labels[0]] + v("date_str"),
+        [labels[1]] + v("start_time_str"),
+        [labels[2]] + [f"{_fp(c.get('start_bar'))}/{_fp(c.get('start_psi'))}" for c in comps],
+        [labels[3]] + v("end_time_str"),
+        [labels[4]] + [f"{_fp(c.get('end_bar'))}/{_fp(c.get('end_psi'))}" for c in comps],
+        [labels[5]] + v("result"),
+        [labels[6]] + v("remarks"),
+    ]
+    colW = [200] + [(320/n) for _ in range(n)]
+    tbl = Table(table, colWidths=colW, repeatRows=1)
+    tbl.setStyle(REGISTRATION_COLUMNS_STYLE)
+    return tbl
+
+def _registration_rows(comps, styles):
+    """Eén rij per compartiment; de kop herhaalt zich op elke pagina (repeatRows)."""
+    small = styles["RegSmall"]
+    header = ["#"] + [Paragraph(f"<b>{lbl}</b>", small) for lbl in REGISTRATION_LABELS]
+    table = [header]
+    for i, c in enumerate(comps):
+        table.append([
+            str(i+1), c.get("date_str",""), c.get("start_time_str",""),
+            f"{_fp(c.get('start_bar'))}/{_fp(c.get('start_psi'))}", c.get("end_time_str",""),
+            f"{_fp(c.get('end_bar'))}/{_fp(c.get('end_psi'))}", c.get("result",""),
+            Paragraph(c.get("remarks","") or "", small),
+        ])
+    tbl = Table(table, colWidths=[26, 60, 44, 80, 44, 80, 40, 146], repeatRows=1)
+    tbl.setStyle(REGISTRATION_ROWS_STYLE)
+    return tbl
+
+def _registration_section(comps, styles, layout="auto"):
+    """
+    layout: "columns" (één kolom per compartiment, in groepen van REGISTRATION_MAX_COLUMNS),
+    "rows" (één rij per compartiment, loopt over pagina's door) of "auto" (kolommen tot
+    REGISTRATION_MAX_COLUMNS compartimenten, daarboven rijen).
+    """
+    if layout == "auto":
+        layout = "columns" if len(comps) <= REGISTRATION_MAX_COLUMNS else "rows"
+    out = [Paragraph("<b>Test registration</b>", styles["Heading3"])]
+    if layout == "rows":
+        out.append(_registration_rows(comps, styles))
+    else:
+        for first in range(0, len(comps), REGISTRATION_MAX_COLUMNS):
+            group = comps[first:first + REGISTRATION_MAX_COLUMNS]
+            out += [_registration_columns(group, first), Spacer(1, 6)]
+    return out + [Spacer(1, 10)]
+
+def _pt_bar(req):
+    return req["pt_value"] if req["pt_unit"]=="bar" else psi_to_bar(req["pt_value"])
+
+LOGGER_CHART_SIZE = (480, 150)
+
+def _logger_chart(analysis, pt_bar=None):
+    """Drukverloop (min/max-gedecimeerd, uren vs bar) als vectorgrafiek; Pt als stippellijn."""
+    w, h = LOGGER_CHART_SIZE
+    d = Drawing(w, h)
+    lp = LinePlot()
+    lp.x, lp.y, lp.width, lp.height = 40, 25, w - 55, h - 35
+    series = [list(zip(analysis["chart_t"].tolist(), analysis["chart_p"].tolist()))]
+    t_end = series[0][-1][0]
+    if pt_bar:
+        series.append([(0.0, pt_bar), (t_end, pt_bar)])
+    lp.data = series
+    lp.lines[0].strokeColor = colors.HexColor("#F18500")
+    lp.lines[0].strokeWidth = 0.8
+    if pt_bar:
+        lp.lines[1].strokeColor = colors.grey
+        lp.lines[1].strokeDashArray = [3, 2]
+        lp.lines[1].strokeWidth = 0.6
+    lp.xValueAxis.valueMin = 0
+    lp.xValueAxis.valueMax = t_end
+    lp.yValueAxis.valueMin = 0
+    for axis in (lp.xValueAxis, lp.yValueAxis):
+        axis.labels.fontName, axis.labels.fontSize = "Helvetica", 7
+    d.add(lp)
+    d.add(String(w - 15, 5, "time (h)", fontName="Helvetica", fontSize=7, textAnchor="end"))
+    d.add(String(2, h - 8, "bar(g)", fontName="Helvetica", fontSize=7))
+    return d
+
+def _logger_paragraphs(analysis, pt_bar, styles):
+    verdict, reason = suggest_result(analysis, pt_bar)
+    return [
+        Paragraph(f"Pressure log: {fmt_summary(analysis)}", styles["Normal"]),
+        Paragraph(f"<b>Suggested result: {verdict}</b> ({reason})", styles["Normal"]),
+        Spacer(1, 4), _logger_chart(analysis, pt_bar), Spacer(1, 8),
+    ]
+
+def _compartment_section(i, c, styles, L="en", pt_bar=None):
+    out = [Paragraph(f"<b>Compartment {i+1}</b>", styles["Heading4"])]
+    if c.get("logger"):
+        out += _logger_paragraphs(c["logger"], pt_bar, styles)
+    for tp in ["start","end"]:
+        photo = c["photos"].get(tp)
+        if not photo:
+            continue
+        out += [
+            ImageSlot((i, tp), *_box_size(*PHOTO_BOX)),
+            Paragraph(
+                f"{tp.capitalize()} time: {photo['ts'].strftime('%Y-%m-%d %H:%M')}"
+                + (f" – {T[L]['exif_missing']}" if photo.get("no_exif") else ""),
+                styles["Normal"]
+            ),
+            Spacer(1, 6)
+        ]
+        if tp == "end":
+            start_ph = c["photos"].get("start")
+            if start_ph:
+                dur = photo["ts"] - start_ph["ts"]
+                if photo.get("utc_offset") is not None and start_ph.get("utc_offset") is not None:
+                    # Tijdzone/zomertijd-wissel tussen begin- en eindfoto
+                    dur -= photo["utc_offset"] - start_ph["utc_offset"]
+                dur_txt = fmt_duration(dur, "en")
+                out += [Paragraph(f"<b>{T[L]['comp_duration']}: {dur_txt}</b>", styles["Normal"]), Spacer(1, 10)]
+    return out
+
+def _signature_section(sig, styles):
+    out = [Paragraph("<b>Signature</b>", styles["Heading3"])]
+    if sig.get("image_pil"):
+        # Handtekening iets breder, platter (4:1)
+        out += [ImageSlot("signature", *_box_size(*SIGNATURE_BOX)), Spacer(1, 6)]
+    sig_rows = [["Name", sig["name"]], ["Company", sig["company"]], ["Date", sig["date_str"]]]
+    sig_tbl = Table(sig_rows, colWidths=[160, 360])
+    sig_tbl.setStyle(SIGNATURE_TABLE_STYLE)
+    return out + [sig_tbl]
+
+def _photo_fingerprint(c):
+    return [(tp, p["key"], p.get("orientation", 1), p["ts"], p.get("no_exif"), p.get("utc_offset"))
+            for tp, p in sorted(c["photos"].items()) if p]
+
+# ======================
+# UITVOER
+# ======================
+PDF_SPOOL_MAX_BYTES = 1024 * 1024       # grotere PDF's gaan naar een tijdelijk bestand
+
+_pdf_out = ContextVar("pressuretest_pdf_out", default=None)
+
+class _StreamingPDFFile(pdfdoc.PDFFile):
+    """
+    reportlab verzamelt bij het opslaan elk geformatteerd object in een lijst, voegt die samen
+    en schrijft het resultaat in één keer: naast de objecten zelf nog twee volledige kopieën van
+    de PDF. Binnen build_pdf gaat elk object hier direct naar het uitvoerbestand; format() geeft
+    dan b"" en SaveToFile schrijft niets meer bij. Buiten build_pdf gedraagt hij zich als PDFFile.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        out = _pdf_out.get()
+        if out is not None:
+            for s in self.strings:   # de kop, al geschreven door PDFFile.__init__
+                out.write(s)
+            self.strings = []
+            self.write = out.write
+
+# PDFDocument.format() maakt zijn PDFFile via de modulenaam
+pdfdoc.PDFFile = _StreamingPDFFile
+
+class PdfSpool(tempfile.SpooledTemporaryFile):
+    """
+    SpooledTemporaryFile die al vóór een schrijfactie boven de drempel naar schijf gaat, zodat
+    een groot object (een foto) niet eerst nog in het geheugenbuffer belandt. Het tijdelijke
+    bestand is anoniem en verdwijnt bij close() (of als het object opgeruimd wordt).
+    """
+    def write(self, s):
+        if not self._rolled and self._file.tell() + len(s) > self._max_size:
+            self.rollover()
+        return super().write(s)
+
+def build_pdf_bytes(data, **kwargs):
+    """De PDF als bytes (batch, benchmarks); zie build_pdf voor de opties."""
+    buf = BytesIO()
+    build_pdf(data, buf, **kwargs)
+    return buf.getvalue()
+
+def build_pdf_file(data, max_size=PDF_SPOOL_MAX_BYTES, dir=None, **kwargs):
+    """
+    De PDF in een PdfSpool (tot `max_size` in het geheugen, daarboven op schijf), klaar om
+    te lezen vanaf het begin. De aanroeper sluit het bestand.
+    """
+    out = PdfSpool(max_size=max_size, dir=dir)
+    try:
+        build_pdf(data, out, **kwargs)
+    except BaseException:
+        out.close()
+        raise
+    out.seek(0)
+    return out
+
+# ======================
+# PDF BUILDER (altijd Engels)
+# ======================
+def build_pdf(data, out, logo_path=None, image_mode=PDF_IMAGE_MODE, image_dpi=PDF_IMAGE_DPI,
+              jpeg_quality=PDF_JPEG_QUALITY, workers=PDF_IMAGE_WORKERS, cache=None,
+              registration_layout="auto", progress=None):
+    """
+    Bouw de PDF en schrijf hem naar het bestandsobject `out`. Met `cache` (een LRUCache,
+    per sessie) worden secties en gecodeerde beelden gesleuteld op een hash van hun invoer
+    hergebruikt: bij opnieuw genereren wordt alleen herbouwd wat echt veranderd is. Foto's
+    worden tijdens de layout gestreamd (zie _ImageStream). `progress(soort, klaar, totaal)`
+    meldt de voortgang per sectie ("sections") en per gecodeerd beeld ("images"). Met
+    `logo_path` staat het logo rechtsboven op elke pagina (ontbrekend bestand: geen logo).
+    """
+    L = "en"
+    logo = load_logo(logo_path) if logo_path else None
+    doc = SimpleDocTemplate(
+        out, pagesize=A4,
+        leftMargin=PDF_MARGIN, rightMargin=PDF_MARGIN, bottomMargin=PDF_MARGIN,
+        topMargin=PDF_MARGIN + (logo.height + LOGO_GAP if logo else 0)
+    )
+    styles = _stylesheet()
+    comps = data["compartments"]
+    sig = data["signature"]
+    registration_rows = [{k: v for k, v in c.items() if k not in ("photos", "logger")} for c in comps]
+    pt_bar = _pt_bar(data["requirements"])
+
+    builders = {
+        "meta": (_digest("meta", data["meta"]),
+                 lambda: _meta_section(data["meta"], styles)),
+        "requirements": (_digest("requirements", data["requirements"]),
+                         lambda: _requirements_section(data["requirements"], styles)),
+        "registration": (_digest("registration", registration_rows, registration_layout),
+                         lambda: _registration_section(comps, styles, registration_layout)),
+        "signature": (_digest("signature", sig["name"], sig["company"], sig["date_str"], _signature_key(sig)),
+                      lambda: _signature_section(sig, styles)),
+    }
+    for i, c in enumerate(comps):
+        logger_key = c["logger"]["key"] if c.get("logger") else None
+        builders[i] = (_digest("compartment", i, _photo_fingerprint(c), logger_key, logger_key and pt_bar),
+                       partial(_compartment_section, i, c, styles, pt_bar=pt_bar))
+    sections = {}
+    for n, (name, (key, build)) in enumerate(builders.items(), 1):
+        with span(f"pdf.section.{name if isinstance(name, str) else 'compartment'}"):
+            sections[name] = cache.get_or_build(("section", key), build) if cache is not None else build()
+        if progress is not None:
+            progress("sections", n, len(builders))
+
+    story = [Paragraph(f"<b>{T[L]['title']}</b>", styles["Title"]), Spacer(1, 10)]
+    story += sections["meta"] + sections["requirements"] + sections["registration"]
+    story += [Paragraph("<b>Photos per compartment</b>", styles["Heading3"]), Spacer(1, 6)]
+    for i in range(len(comps)):
+        story += sections[i]
+    story += sections["signature"]
+
+    stream = _ImageStream(_image_jobs(comps, sig, image_mode, image_dpi, jpeg_quality),
+                          workers=workers, cache=cache, progress=progress)
+    story = [_StreamImage(stream, f) if isinstance(f, ImageSlot) else copy.copy(f) for f in story]
+    token = _pdf_out.set(out)   # objecten direct naar `out`, zie _StreamingPDFFile
+    try:
+        stream.start()
+        with span("pdf.layout"):
+            if logo:
+                doc.build(story, onFirstPage=_logo_drawer(logo), onLaterPages=_logo_drawer(logo))
+            else:
+                doc.build(story)
+    finally:
+        _pdf_out.reset(token)
+        stream.close()
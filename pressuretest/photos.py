@@ -0,0 +1,366 @@
+"""Foto-ingest: header-only metadata, geschaalde decode, compacte opslag en ingest-cache."""
+import math
+import os
+import struct
+from datetime import datetime, timedelta
+from functools import partial
+from io import BytesIO
+
+# Pillow wordt pas bij het eerste gebruik geladen (snelle koude start); zie de functies hieronder.
+
+from .cache import LRUCache, content_key
+
+# ======================
+# PHOTO METADATA (alleen headers, geen pixel-decode)
+# ======================
+_TAG_ORIENTATION = 0x0112
+_TAG_DATETIME = 0x0132
+_TAG_EXIF_IFD = 0x8769
+_TAG_DATETIME_ORIGINAL = 0x9003
+_TAG_OFFSET_TIME = 0x9010
+_TAG_OFFSET_TIME_ORIGINAL = 0x9011
+_ASCII = 2
+_SHORT = 3
+_LONG = 4
+
+def _tiff_ifd(tiff, offset, endian):
+    """Lees één IFD uit TIFF/EXIF-data; geeft {tag: waarde} voor ASCII/SHORT/LONG-tags."""
+    out = {}
+    if offset + 2 > len(tiff):
+        return out
+    (count,) = struct.unpack_from(endian + "H", tiff, offset)
+    for n in range(count):
+        pos = offset + 2 + 12 * n
+        if pos + 12 > len(tiff):
+            break
+        tag, typ, cnt = struct.unpack_from(endian + "HHI", tiff, pos)
+        if typ == _ASCII:
+            if cnt <= 4:
+                raw = tiff[pos + 8:pos + 8 + cnt]
+            else:
+                (ptr,) = struct.unpack_from(endian + "I", tiff, pos + 8)
+                raw = tiff[ptr:ptr + cnt]
+            out[tag] = raw.split(b"\0", 1)[0].decode("ascii", "replace").strip()
+        elif typ == _SHORT:
+            (out[tag],) = struct.unpack_from(endian + "H", tiff, pos + 8)
+        elif typ == _LONG:
+            (out[tag],) = struct.unpack_from(endian + "I", tiff, pos + 8)
+    return out
+
+def _parse_tiff_meta(tiff):
+    if tiff[:2] == b"II":
+        endian = "<"
+    elif tiff[:2] == b"MM":
+        endian = ">"
+    else:
+        return {}
+    (ifd0_offset,) = struct.unpack_from(endian + "I", tiff, 4)
+    tags = _tiff_ifd(tiff, ifd0_offset, endian)
+    if _TAG_EXIF_IFD in tags:
+        tags.update(_tiff_ifd(tiff, tags[_TAG_EXIF_IFD], endian))
+    return tags
+
+def _jpeg_exif_tiff(b):
+    """Loop de JPEG-markers af tot APP1/Exif; stopt bij de scan-data (SOS)."""
+    pos = 2
+    while pos + 4 <= len(b):
+        if b[pos] != 0xFF:
+            return None
+        marker = b[pos + 1]
+        if marker == 0xFF:  # opvulbytes
+            pos += 1
+            continue
+        if marker == 0xDA or marker == 0xD9:  # SOS / EOI: geen metadata meer
+            return None
+        (seg_len,) = struct.unpack_from(">H", b, pos + 2)
+        if marker == 0xE1 and b[pos + 4:pos + 10] == b"Exif\0\0":
+            return b[pos + 10:pos + 2 + seg_len]
+        pos += 2 + seg_len
+    return None
+
+def _png_exif_tiff(b):
+    """Loop de PNG-chunks af tot eXIf; stopt bij de eerste IDAT."""
+    pos = 8
+    while pos + 8 <= len(b):
+        length, ctype = struct.unpack_from(">I4s", b, pos)
+        if ctype == b"eXIf":
+            return b[pos + 8:pos + 8 + length]
+        if ctype in (b"IDAT", b"IEND"):
+            return None
+        pos += 12 + length
+    return None
+
+def _parse_exif_dt(s):
+    try:
+        return datetime.strptime(s.replace(":", "-", 2), "%Y-%m-%d %H:%M:%S")
+    except (ValueError, AttributeError):
+        return None
+
+def _parse_utc_offset(s):
+    """EXIF OffsetTime zoals '+02:00' -> timedelta."""
+    try:
+        sign = -1 if s[0] == "-" else 1
+        hh, mm = s[1:].split(":")
+        return sign * timedelta(hours=int(hh), minutes=int(mm))
+    except (ValueError, IndexError, TypeError):
+        return None
+
+def read_photo_meta(b):
+    """
+    Lees DateTimeOriginal (of DateTime), tijdzone-offset en Orientation rechtstreeks uit de
+    JPEG/PNG-headers van de ruwe upload, zonder pixels te decoderen.
+    """
+    meta = {"datetime": None, "utc_offset": None, "orientation": 1}
+    if not b:
+        return meta
+    try:
+        if b[:2] == b"\xff\xd8":
+            tiff = _jpeg_exif_tiff(b)
+        elif b[:8] == b"\x89PNG\r\n\x1a\n":
+            tiff = _png_exif_tiff(b)
+        else:
+            tiff = None
+        tags = _parse_tiff_meta(tiff) if tiff else {}
+    except struct.error:
+        return meta
+    meta["datetime"] = _parse_exif_dt(tags.get(_TAG_DATETIME_ORIGINAL) or tags.get(_TAG_DATETIME))
+    meta["utc_offset"] = _parse_utc_offset(tags.get(_TAG_OFFSET_TIME_ORIGINAL) or tags.get(_TAG_OFFSET_TIME))
+    if tags.get(_TAG_ORIENTATION) in range(1, 9):
+        meta["orientation"] = tags[_TAG_ORIENTATION]
+    return meta
+
+def exif_datetime(b):
+    return read_photo_meta(b)["datetime"]
+
+# EXIF Orientation -> transpose-operatie (naam in PIL.Image.Transpose) om het beeld rechtop te zetten
+_ORIENTATION_OPS = {
+    2: "FLIP_LEFT_RIGHT",
+    3: "ROTATE_180",
+    4: "FLIP_TOP_BOTTOM",
+    5: "TRANSPOSE",
+    6: "ROTATE_270",
+    7: "TRANSVERSE",
+    8: "ROTATE_90",
+}
+
+def bytes_to_pil(b, min_w=None, fit=None, orientation=1):
+    """
+    Decodeer naar RGB. Met `min_w` (minimale breedte) of `fit` (vak w, h) wordt niet groter
+    gedecodeerd dan nodig: JPEG schaalt al in de decoder (1/2, 1/4, 1/8 via draft),
+    andere formaten worden met reduce() verkleind. Zonder argumenten: volle decode.
+    `orientation` (EXIF) wordt na het verkleinen toegepast; maten gelden voor het rechtop gezette beeld.
+    """
+    if not b:
+        return None
+    from PIL import Image as PILImage
+
+    im = _decode_scaled(b, min_w, fit, orientation in (5, 6, 7, 8))
+    op = _ORIENTATION_OPS.get(orientation)
+    return im.transpose(getattr(PILImage.Transpose, op)) if op is not None else im
+
+def _decode_scaled(b, min_w, fit, swapped):
+    from PIL import Image as PILImage
+
+    im = PILImage.open(BytesIO(b))
+    w, h = im.size
+    # Bij 90° gedraaide foto's is de breedte rechtop de hoogte van het bestand
+    up_w, up_h = (h, w) if swapped else (w, h)
+    if min_w:
+        scale = min_w / float(up_w)
+    elif fit:
+        scale = min(fit[0] / float(up_w), fit[1] / float(up_h))
+    else:
+        scale = 1.0
+    if scale >= 1.0:
+        return im.convert("RGB")
+
+    need = (max(1, math.ceil(w * scale)), max(1, math.ceil(h * scale)))
+    if im.format == "JPEG":
+        # Resultaat is altijd >= need, dus er gaat geen detail verloren voor de uitvoer
+        im.draft("RGB", need)
+        return im.convert("RGB")
+    im = im.convert("RGB")
+    factor = min(w // need[0], h // need[1])
+    return im.reduce(factor) if factor >= 2 else im
+
+SIGNATURE_INK_THRESHOLD = 200  # kanaalwaarde (na witte achtergrond) waaronder een pixel als inkt telt
+SIGNATURE_PAD_PX = 6
+
+def ink_bbox(rgb, threshold=SIGNATURE_INK_THRESHOLD):
+    """Bounding box (left, top, right, bottom) van de inkt in een HxWx3 uint8-array, of None."""
+    import numpy as np
+
+    ink = rgb.min(axis=2) < threshold
+    rows = np.flatnonzero(ink.any(axis=1))
+    if rows.size == 0:
+        return None
+    cols = np.flatnonzero(ink.any(axis=0))
+    return int(cols[0]), int(rows[0]), int(cols[-1]) + 1, int(rows[-1]) + 1
+
+def canvas_to_pil(canvas_image_data, crop=True, pad=SIGNATURE_PAD_PX):
+    """
+    Canvas (RGBA/RGB-array) -> RGB PIL-beeld op witte achtergrond. Met `crop` wordt direct op de
+    inkt bijgesneden (gevectoriseerd met numpy); zonder inkt geeft dit None (leeg canvas).
+    """
+    if canvas_image_data is None:
+        return None
+    import numpy as np
+    from PIL import Image as PILImage
+
+    arr = np.asarray(canvas_image_data)
+    if arr.ndim == 3 and arr.shape[2] == 4:
+        # Transparante pixels naar wit: rgb * a + 255 * (1 - a)
+        alpha = arr[..., 3:4].astype(np.uint16)
+        rgb = ((arr[..., :3].astype(np.uint16) * alpha + 255 * (255 - alpha)) // 255).astype(np.uint8)
+    else:
+        rgb = arr[..., :3].astype(np.uint8)
+    if crop:
+        box = ink_bbox(rgb)
+        if box is None:
+            return None
+        l, t, r, b = box
+        h, w = rgb.shape[:2]
+        rgb = rgb[max(0, t - pad):min(h, b + pad), max(0, l - pad):min(w, r + pad)]
+    return PILImage.fromarray(np.ascontiguousarray(rgb), "RGB")
+
+# ======================
+# PHOTO INGEST CACHE
+# ======================
+PHOTO_CACHE_MAX_ENTRIES = 32
+PREVIEW_MAX_PX = 800
+SESSION_PHOTO_BUDGET_BYTES = 64 * 1024 * 1024  # max. opslag aan foto's per sessie
+
+photo_key = content_key  # zelfde sleutel als blobs.py en de logger-import
+
+def _decode_photo(b, key):
+    from PIL import Image as PILImage
+
+    # EXIF komt uit de header; pixels alleen op preview-formaat en meteen rechtop gezet
+    meta = read_photo_meta(b)
+    img = bytes_to_pil(b, fit=(PREVIEW_MAX_PX, PREVIEW_MAX_PX), orientation=meta["orientation"])
+    img.thumbnail((PREVIEW_MAX_PX, PREVIEW_MAX_PX), PILImage.LANCZOS)
+    return {"key": key, "data": b, "preview": img, "exif_dt": meta["datetime"],
+            "utc_offset": meta["utc_offset"], "orientation": meta["orientation"]}
+
+def session_photo(entry, ts, no_exif):
+    """Compacte foto-record voor session_state: bytes + preview, geen volledig beeld."""
+    return {
+        "key": entry["key"], "data": entry["data"], "preview": entry["preview"],
+        "orientation": entry["orientation"], "utc_offset": entry["utc_offset"],
+        "ts": ts, "no_exif": no_exif
+    }
+
+def photo_from_bytes(b, fallback_ts=None):
+    """
+    Foto-record voor de PDF zonder UI (batch): metadata uit de header, geen decode en
+    geen preview. Zonder EXIF-tijd wordt `fallback_ts` gebruikt (bijv. mtime van het bestand).
+    """
+    meta = read_photo_meta(b)
+    ts = meta["datetime"] or fallback_ts or datetime.now().replace(second=0, microsecond=0)
+    return {
+        "key": photo_key(b), "data": b,
+        "orientation": meta["orientation"], "utc_offset": meta["utc_offset"],
+        "ts": ts, "no_exif": meta["datetime"] is None
+    }
+
+def photo_nbytes(photo):
+    """Geschat geheugengebruik van een opgeslagen foto: gecomprimeerde bytes + preview."""
+    if not photo:
+        return 0
+    if photo.get("preview") is None:
+        # Nog niet gedecodeerd (hersteld concept): reken met de maximale preview
+        return len(photo["data"]) + PREVIEW_MAX_PX * PREVIEW_MAX_PX * 3
+    w, h = photo["preview"].size
+    return len(photo["data"]) + w * h * len(photo["preview"].getbands())
+
+def photo_preview(photo):
+    """
+    Preview van een foto, pas gedecodeerd bij het eerste gebruik: uit de opgeslagen
+    preview-JPEG ("preview_src", hersteld concept) of anders verkleind uit de foto zelf.
+    """
+    if photo.get("preview") is None:
+        src = photo.pop("preview_src", None)
+        if src:
+            photo["preview"] = bytes_to_pil(src)
+        else:
+            photo["preview"] = _decode_photo(photo["data"], photo["key"])["preview"]
+    return photo["preview"]
+
+def session_photo_nbytes(comp_data, skip=None):
+    """Totaal over alle compartimenten; `skip` = (idx, slot) die vervangen gaat worden."""
+    total = 0
+    for i, c in enumerate(comp_data):
+        for slot, photo in c["photos"].items():
+            if (i, slot) != skip:
+                total += photo_nbytes(photo)
+    return total
+
+def photo_fits_budget(comp_data, entry, idx, slot, budget=SESSION_PHOTO_BUDGET_BYTES):
+    return session_photo_nbytes(comp_data, skip=(idx, slot)) + photo_nbytes(entry) <= budget
+
+def bulk_fits_budget(comp_data, assignments, budget=SESSION_PHOTO_BUDGET_BYTES):
+    """Als photo_fits_budget voor meerdere foto's tegelijk; assignments = {(idx, slot): entry}."""
+    kept = sum(photo_nbytes(p) for i, c in enumerate(comp_data) for slot, p in c["photos"].items()
+               if (i, slot) not in assignments)
+    return kept + sum(photo_nbytes(e) for e in assignments.values()) <= budget
+
+# ======================
+# BULK-UPLOAD
+# ======================
+PHOTO_INGEST_WORKERS = min(4, os.cpu_count() or 1)
+
+def ingest_many(cache, blobs, workers=PHOTO_INGEST_WORKERS):
+    """
+    Meerdere uploads tegelijk ingesten: EXIF lezen en de preview decoderen op een threadpool
+    (Pillow geeft de GIL vrij). Resultaten in dezelfde volgorde als `blobs`; None voor een
+    leeg of onleesbaar bestand, zodat één kapotte upload de rest niet meeneemt.
+    """
+    ingest = partial(ingest_or_none, cache)
+    if workers <= 1 or len(blobs) <= 1:
+        return [ingest(b) for b in blobs]
+    from concurrent.futures import ThreadPoolExecutor  # niet bij het opstarten (trekt logging mee)
+    with ThreadPoolExecutor(max_workers=min(workers, len(blobs)), thread_name_prefix="photo-ingest") as ex:
+        return list(ex.map(ingest, blobs))
+
+def ingest_or_none(cache, b):
+    """cache.ingest(b), of None voor een leeg of onleesbaar bestand (enkele upload en bulk)."""
+    try:
+        return cache.ingest(b)
+    except Exception:
+        # Geen afbeelding, afgekapt of te groot (UnidentifiedImageError, DecompressionBombError, ...)
+        return None
+
+def chronological_slots(entries, first=0):
+    """
+    Verdeel foto's op EXIF-tijd over de compartimenten: per compartiment een begin- en een
+    eindfoto, vanaf compartiment `first`. Foto's zonder EXIF-tijd komen achteraan, in
+    uploadvolgorde; dezelfde foto twee keer geüpload telt één keer. Geeft [(comp, slot, index)].
+    """
+    seen, order = set(), []
+    for n, e in enumerate(entries):
+        if e is not None and e["key"] not in seen:
+            seen.add(e["key"])
+            order.append(n)
+    order.sort(key=lambda n: (entries[n]["exif_dt"] is None, entries[n]["exif_dt"] or datetime.min))
+    return [(first + k // 2, ("start", "end")[k % 2], n) for k, n in enumerate(order)]
+
+def photo_pil(photo, min_w=None):
+    """Pas decoderen wanneer de PDF het nodig heeft, en dan niet breder dan `min_w`."""
+    return bytes_to_pil(photo["data"], min_w=min_w, orientation=photo.get("orientation", 1))
+
+class PhotoIngestCache(LRUCache):
+    """
+    Cache voor geüploade foto's, gesleuteld op een hash van de bytes.
+    Decoderen, EXIF lezen en preview maken gebeurt zo één keer per unieke upload;
+    elke volgende rerun krijgt hetzelfde resultaat uit de cache. Er worden alleen de
+    gecomprimeerde bytes en een kleine preview bewaard, geen volledig RGB-beeld.
+    """
+    def __init__(self, max_entries=PHOTO_CACHE_MAX_ENTRIES):
+        super().__init__(max_entries)
+
+    def ingest(self, b):
+        if not b:
+            return None
+        key = photo_key(b)
+        return self.get_or_build(key, partial(_decode_photo, b, key))
+
@@ -0,0 +1,130 @@
+"""UI- en PDF-teksten (nl/en). De PDF gebruikt altijd "en"."""
+
+# ======================
+# TRANSLATIONS
+# ======================
+T = {
+    "nl": {
+        "title":"Druktest rapport","language":"Taal","project_info":"Projectgegevens",
+        "project_name":"Projectnaam","manufacturer":"Fabrikant",
+        "work_order":"WO of PO + volgnummer / serienummer",
+        "drawing":"Tekening","revision":"Revisie","part_line":"Onderdeelnaam / Lijnsectie",
+        "requirements":"Test requirements","pt":"Testdruk (Pt)","pt_unit":"Eenheid","notes":"Opmerkingen",
+
+        # Nieuwe velden onder Test requirements
+        "test_instrument":"Testinstrument",
+        "calibration_date":"Kalibratiedatum",
+
+        # Per compartiment timing
+        "comp_duration":"Testduur compartiment",
+
+        "equip":"Registratie testapparatuur","compartments":"Compartiment / sectie","num_comp":"Aantal compartimenten",
+        "date":"Datum","start_time":"Start tijd","start_pressure":"Start druk","end_time":"Eindtijd","end_pressure":"Eind druk",
+        "result":"Resultaat","remarks":"Opmerking","pass":"PASS","fail":"FAIL",
+
+        "photos":"Foto's per compartiment","start_photo":"Foto begin","end_photo":"Foto eind","timestamp":"Tijd",
+        "exif_missing":"EXIF ontbreekt – timestamp = uploadmoment",
+        "photo_budget":"Geheugenlimiet voor foto's in deze sessie bereikt. Gebruik kleinere foto's.",
+        "logger_csv":"Drukloggerbestand (CSV, optioneel)","logger_invalid":"Loggerbestand niet leesbaar",
+        "logger_suggest":"Voorstel",
+        "drafts":"Concepten","drafts_none":"Geen opgeslagen concepten.",
+        "draft_untitled":"(zonder projectnaam)","draft_restore":"Herstel",
+        "draft_delete":"Concept verwijderen","draft_delete_confirm":"Definitief verwijderen","draft_keep":"Behouden","draft_restored":"Concept hersteld. Handtekening opnieuw zetten.",
+        "use_camera":"Gebruik camera voor","slot_start":"Start","slot_end":"Eind",
+        "selected_target":"Camera doel","selected_none":"(geen)",
+
+        "signature":"Handtekening","draw_signature":"Teken handtekening","sign_name":"Naam","sign_company":"Bedrijf","sign_date":"Datum ondertekening",
+        "sig_confirm":"Klik na het tekenen op de verzendknop onder het canvas om de handtekening te bevestigen.",
+
+        "actions":"Acties","gen_pdf":"Genereer PDF","dl_pdf":"Download PDF","reset":"Formulier leegmaken",
+        "success_pdf":"PDF is gegenereerd.","need_all":"Vul alle verplichte velden in.",
+
+        "unit_bar_g":"bar(g)","unit_psi_g":"PSI(g)",
+
+        # Email UI
+        "email_section":"E-mail voorbereiden",
+        "archive":"Archief","archive_from":"Testdatum vanaf","archive_to":"Testdatum t/m",
+        "archive_found":"{n} rapporten gevonden ({shown} getoond)","archive_pick":"Rapport",
+        "archive_export":"Download alle {n} als zip",
+        "archive_saved":"Opgeslagen in het archief (#{id}).",
+        "bulk_photos":"Alle foto's tegelijk uploaden","bulk_upload":"Foto's (meerdere tegelijk)",
+        "bulk_help":"Foto's worden op EXIF-opnametijd gesorteerd en om en om als begin- en eindfoto aan de compartimenten toegewezen. Controleer de verdeling en bevestig.",
+        "bulk_first":"Vanaf compartiment","bulk_no_exif":"geen EXIF-tijd (achteraan)",
+        "bulk_duplicates":"{n} dubbele foto('s) overgeslagen.","bulk_replaces":"{n} bestaande foto('s) worden vervangen.",
+        "bulk_too_many":"Te veel foto's: maximaal {max} compartimenten.","bulk_confirm":"{n} foto's toewijzen",
+        "bulk_assigned":"{n} foto's toegewezen.","bulk_unreadable":"{n} bestand(en) overgeslagen, geen leesbare foto: {names}",
+        "pdf_queued":"In de wachtrij (plaats {pos})…","pdf_progress":"PDF maken: {sec}/{sec_n} secties, {img}/{img_n} foto's",
+        "pdf_cancel":"Annuleren","pdf_busy":"De server is druk; probeer het zo opnieuw.","pdf_failed":"PDF maken mislukt: {err}",
+        "email_to_doc_label":"Stuur naar documentation@tanis.com",
+        "email_extra_to":"Extra ontvanger (optioneel)",
+        "email_subject":"Onderwerp",
+        "email_body":"Bericht",
+        "email_open_btn":"📧 Open e-mail in Outlook / mail-app",
+        "email_no_recipient":"Geen ontvanger geselecteerd. Vink documentation@tanis.com aan of vul een extra ontvanger in.",
+        "email_send_btn":"📤 Verstuur met de PDF als bijlage","email_queued":"E-mail staat in de wachtrij…",
+        "email_retry":"Versturen mislukt, nieuwe poging volgt ({n}/{max}): {err}",
+        "email_sent":"E-mail met de PDF verzonden naar {to}.","email_failed":"Versturen mislukt: {err}",
+        "email_invalid":"Ongeldig e-mailadres: {addr}"
+    },
+    "en": {
+        "title":"Pressure test report","language":"Language","project_info":"Project information",
+        "project_name":"Project name","manufacturer":"Manufacturer",
+        "work_order":"WO or PO + serial / serial number",
+        "drawing":"Drawing","revision":"Revision","part_line":"Part name / Line section",
+        "requirements":"Test requirements","pt":"Test pressure (Pt)","pt_unit":"Unit","notes":"Remarks",
+
+        # New fields under Test requirements
+        "test_instrument":"Test instrument",
+        "calibration_date":"Calibration date",
+
+        "comp_duration":"Compartment test duration",
+
+        "equip":"Registration test equipment","compartments":"Compartment / section","num_comp":"Number of compartments",
+        "date":"Date","start_time":"Start time","start_pressure":"Start pressure","end_time":"End time","end_pressure":"End pressure",
+        "result":"Result","remarks":"Remarks","pass":"PASS","fail":"FAIL",
+
+        "photos":"Photos per compartment","start_photo":"Start photo","end_photo":"End photo","timestamp":"Time",
+        "exif_missing":"EXIF missing – timestamp = upload moment",
+        "photo_budget":"Photo memory limit for this session reached. Please use smaller photos.",
+        "logger_csv":"Pressure logger file (CSV, optional)","logger_invalid":"Logger file could not be read",
+        "logger_suggest":"Suggestion",
+        "drafts":"Drafts","drafts_none":"No saved drafts.",
+        "draft_untitled":"(no project name)","draft_restore":"Restore",
+        "draft_delete":"Delete draft","draft_delete_confirm":"Delete permanently","draft_keep":"Keep","draft_restored":"Draft restored. Please sign again.",
+        "use_camera":"Use camera for","slot_start":"Start","slot_end":"End",
+        "selected_target":"Camera target","selected_none":"(none)",
+
+        "signature":"Signature","draw_signature":"Draw signature","sign_name":"Name","sign_company":"Company","sign_date":"Signature date",
+        "sig_confirm":"After drawing, click the send button below the canvas to confirm the signature.",
+
+        "actions":"Actions","gen_pdf":"Generate PDF","dl_pdf":"Download PDF","reset":"Clear form",
+        "success_pdf":"PDF generated.","need_all":"Please complete all required fields.",
+
+        "unit_bar_g":"bar(g)","unit_psi_g":"PSI(g)",
+
+        # Email UI
+        "email_section":"Prepare e-mail",
+        "archive":"Archive","archive_from":"Test date from","archive_to":"Test date to",
+        "archive_found":"{n} reports found ({shown} shown)","archive_pick":"Report",
+        "archive_export":"Download all {n} as zip",
+        "archive_saved":"Saved to the archive (#{id}).",
+        "bulk_photos":"Upload all photos at once","bulk_upload":"Photos (multiple at once)",
+        "bulk_help":"Photos are sorted by EXIF capture time and assigned alternately as start and end photo to the compartments. Review the assignment and confirm.",
+        "bulk_first":"Starting at compartment","bulk_no_exif":"no EXIF time (placed last)",
+        "bulk_duplicates":"{n} duplicate photo(s) skipped.","bulk_replaces":"{n} existing photo(s) will be replaced.",
+        "bulk_too_many":"Too many photos: at most {max} compartments.","bulk_confirm":"Assign {n} photos",
+        "bulk_assigned":"{n} photos assigned.","bulk_unreadable":"{n} file(s) skipped, not a readable photo: {names}",
+        "pdf_queued":"Queued (position {pos})…","pdf_progress":"Building PDF: {sec}/{sec_n} sections, {img}/{img_n} photos",
+        "pdf_cancel":"Cancel","pdf_busy":"The server is busy; please try again shortly.","pdf_failed":"PDF generation failed: {err}",
+        "email_to_doc_label":"Send to documentation@tanis.com",
+        "email_extra_to":"Additional recipient (optional)",
+        "email_subject":"Subject",
+        "email_body":"Message",
+        "email_open_btn":"📧 Open e-mail in Outlook / mail app",
+        "email_no_recipient":"No recipient selected. Check documentation@tanis.com or fill an additional recipient.",
+        "email_send_btn":"📤 Send with the PDF attached","email_queued":"E-mail is queued…",
+        "email_retry":"Sending failed, retrying ({n}/{max}): {err}",
+        "email_sent":"E-mail with the PDF sent to {to}.","email_failed":"Sending failed: {err}",
+        "email_invalid":"Invalid e-mail address: {addr}"
+    }
+}
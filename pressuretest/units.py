@@ -0,0 +1,14 @@
+"""Eenheden en opmaak-hulpjes."""
+
+# ======================
+# HELPERS
+# ======================
+PSI_PER_BAR = 14.5037738
+def bar_to_psi(v): return None if v is None else v * PSI_PER_BAR
+def psi_to_bar(v): return None if v is None else v / PSI_PER_BAR
+
+def fmt_duration(td, lang):
+    total_min = int(round(td.total_seconds() / 60.0))
+    h, m = divmod(total_min, 60)
+    return f"{h} uur {m} min" if lang=="nl" else f"{h} h {m} min"
+
@@ -0,0 +1,119 @@
+"""
+Deterministische synthetische invoer voor de benchmarks in tools/.
+
+Alles is afgeleid van een `seed` (numpy Generator), zodat twee runs op dezelfde machine
+byte-identieke fixtures gebruiken en meetverschillen van de code komen, niet van de invoer.
+"""
+import os
+import sys
+from datetime import date, datetime, timedelta
+from io import BytesIO
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_DIR not in sys.path:
+    sys.path.insert(0, REPO_DIR)
+
+from pressuretest.photos import photo_from_bytes  # noqa: E402
+from pressuretest.units import bar_to_psi  # noqa: E402
+
+PHOTO_12MP = (4000, 3000)
+
+def _rng(seed):
+    import numpy as np
+    return np.random.default_rng(seed)
+
+def jpeg(w=PHOTO_12MP[0], h=PHOTO_12MP[1], exif_dt=None, seed=0, quality=90):
+    """Foto-achtige JPEG: horizontale gradiënt plus blokruis (8x8), optioneel met EXIF-tijd."""
+    import numpy as np
+    from PIL import Image
+    rng = _rng(seed)
+    base = np.linspace(0, 215, w, dtype=np.uint8)[None, :, None].repeat(h, 0).repeat(3, 2)
+    noise = rng.integers(0, 40, (-(-h // 8), -(-w // 8), 3), dtype=np.uint8).repeat(8, 0).repeat(8, 1)
+    img = Image.fromarray(base + noise[:h, :w])
+    kw = {}
+    if exif_dt:
+        exif = Image.Exif()
+        exif[0x8769] = {0x9003: exif_dt.strftime("%Y:%m:%d %H:%M:%S")}  # DateTimeOriginal
+        kw["exif"] = exif
+    bio = BytesIO()
+    img.save(bio, format="JPEG", quality=quality, **kw)
+    return bio.getvalue()
+
+def png_screenshot(w=1920, h=1080, seed=0):
+    """Schermafdruk-achtige PNG: effen vlakken met 'tekstregels' (comprimeert zoals een echte)."""
+    import numpy as np
+    from PIL import Image
+    rng = _rng(seed)
+    arr = np.full((h, w, 3), 245, dtype=np.uint8)
+    for _ in range(12):
+        x0, y0 = rng.integers(0, w - 200), rng.integers(0, h - 120)
+        arr[y0:y0 + 120, x0:x0 + 200] = rng.integers(0, 255, 3, dtype=np.uint8)
+    rows = np.arange(h) % 24 < 10
+    cols = rng.random(w) < 0.55
+    arr[np.ix_(rows, cols)] = 40
+    bio = BytesIO()
+    Image.fromarray(arr).save(bio, format="PNG")
+    return bio.getvalue()
+
+def signature_array(w=600, h=170, seed=0, strokes=3):
+    """RGBA-array zoals st_canvas die teruggeeft: transparant met donkere pennenstreken."""
+    import numpy as np
+    from PIL import Image, ImageDraw
+    rng = _rng(seed)
+    img = Image.new("RGBA", (w, h), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(img)
+    for _ in range(strokes):
+        steps = rng.normal(0, 6, (80, 2)).cumsum(axis=0)
+        start = rng.uniform((w * 0.2, h * 0.3), (w * 0.6, h * 0.7))
+        pts = [tuple(p) for p in (start + steps + np.linspace((0, 0), (w * 0.3, 0), 80))]
+        draw.line(pts, fill=(0, 0, 0, 255), width=3)
+    return np.asarray(img)
+
+def logger_csv(n=100_000, seed=0, leak_bar_h=0.0, pt_bar=10.0):
+    """Loggerbestand: 1 Hz, oppompen, hold met temperatuurgang (en optioneel lek), aflaten."""
+    import numpy as np
+    rng = _rng(seed)
+    t = np.arange(n, dtype=np.float64)
+    ramp, release = min(1800, n // 10), 30
+    temp = 20.0 + 2.0 * np.sin(t / 7200.0)
+    p = (pt_bar - leak_bar_h * np.maximum(t - ramp, 0) / 3600.0 + 1.01325) * (temp + 273.15) / 293.15 - 1.01325
+    p[:ramp] = np.linspace(0, p[ramp], ramp)
+    p[n - release:] = np.linspace(p[n - release - 1], 0, release)
+    p += rng.normal(0, 0.001, n)
+    stamps = (np.datetime64("2024-05-01T08:00:00") + t.astype("timedelta64[s]")).astype(str)
+    rows = np.char.add(np.char.add(np.char.add(np.char.add(stamps, ","), np.char.mod("%.4f", p)), ","),
+                       np.char.mod("%.2f", temp))
+    return ("Timestamp,Pressure (bar),Temp (C)\n" + "\n".join(rows.tolist()) + "\n").encode()
+
+def report(n, photo_px=PHOTO_12MP, seed=0, unique_photos=None):
+    """
+    `data` voor build_pdf_bytes met n compartimenten en twee foto's per compartiment (met EXIF).
+    `unique_photos` beperkt het aantal verschillende foto's (hergebruikt cyclisch) om het
+    genereren van grote rapporten te versnellen; standaard is elke foto uniek.
+    """
+    from PIL import Image
+    w, h = photo_px
+    t0 = datetime(2024, 5, 1, 9, 0)
+    total = 2 * n
+    unique = min(total, unique_photos or total)
+    pool = [jpeg(w, h, exif_dt=t0 + timedelta(minutes=k), seed=seed + k) for k in range(unique)]
+    comps = []
+    for i in range(n):
+        photos = {slot: photo_from_bytes(pool[(2 * i + k) % unique]) for k, slot in enumerate(["start", "end"])}
+        sb, eb = 10.0, 10.0 - (i % 5) * 0.01
+        comps.append({
+            "date_str": "2024-05-01", "start_time_str": "09:00", "end_time_str": "10:00",
+            "start_bar": sb, "start_psi": bar_to_psi(sb), "end_bar": eb, "end_psi": bar_to_psi(eb),
+            "result": "PASS", "remarks": f"Compartiment {i+1}: geen lekkage waargenomen",
+            "photos": photos,
+        })
+    sig = Image.fromarray(signature_array(seed=seed)).convert("RGB")
+    return {
+        "meta": {"project_name": "Benchmark", "manufacturer": "-", "work_order": "WO-0",
+                 "drawing": "-", "revision": "A", "part_line": "-"},
+        "requirements": {"pt_value": 10.0, "pt_unit": "bar", "notes": "", "test_instrument": "-",
+                         "calibration_date": date(2024, 1, 1), "calibration_date_str": "2024-01-01"},
+        "compartments": comps,
+        "signature": {"name": "Bench", "company": "-", "date": date(2024, 5, 1), "date_str": "2024-05-01",
+                      "image_pil": sig},
+    }
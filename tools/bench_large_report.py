@@ -0,0 +1,59 @@
+"""
+Benchmark: PDF van een synthetisch rapport met veel compartimenten.
+
+    python tools/bench_large_report.py [--compartments 100] [--photo-px 2000x1500] [--workers N]
+
+Genereert per compartiment twee unieke JPEG-foto's (tools/bench_fixtures.py, deterministisch),
+bouwt het rapport met build_pdf_bytes en rapporteert bouwtijd, PDF-grootte en de piek-RSS
+van het proces tijdens het bouwen (ten opzichte van de RSS met alle foto's al in het geheugen).
+"""
+import argparse
+import os
+import resource
+import sys
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from bench_fixtures import report  # noqa: E402
+from pressuretest.pdf import PDF_IMAGE_WINDOW, PDF_IMAGE_WORKERS, build_pdf_bytes  # noqa: E402
+
+def max_rss_mb():
+    # ru_maxrss is in KiB op Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--compartments", type=int, default=100)
+    ap.add_argument("--photo-px", default="2000x1500", help="BREEDTExHOOGTE van de testfoto's")
+    ap.add_argument("--workers", type=int, default=PDF_IMAGE_WORKERS)
+    ap.add_argument("--layout", default="auto", choices=["auto", "columns", "rows"])
+    ap.add_argument("-o", "--output", help="schrijf de PDF hierheen")
+    args = ap.parse_args(argv)
+
+    photo_px = tuple(int(x) for x in args.photo_px.lower().split("x"))
+    t = time.perf_counter()
+    data = report(args.compartments, photo_px)
+    gen_s = time.perf_counter() - t
+    photo_mb = sum(len(p["data"]) for c in data["compartments"] for p in c["photos"].values()) / 1e6
+    rss_before = max_rss_mb()
+
+    t = time.perf_counter()
+    pdf = build_pdf_bytes(data, workers=args.workers, registration_layout=args.layout)
+    build_s = time.perf_counter() - t
+    rss_peak = max_rss_mb()
+
+    if args.output:
+        with open(args.output, "wb") as f:
+            f.write(pdf)
+    print(f"compartments   {args.compartments} ({2*args.compartments} photos {photo_px[0]}x{photo_px[1]}, "
+          f"{photo_mb:.1f} MB jpeg, generated in {gen_s:.1f} s)")
+    print(f"workers        {args.workers} (look-ahead window {PDF_IMAGE_WINDOW})")
+    print(f"build          {build_s:.2f} s ({1000*build_s/args.compartments:.1f} ms/compartment)")
+    print(f"pdf            {len(pdf)/1e6:.1f} MB")
+    print(f"peak rss       {rss_peak:.0f} MB (+{rss_peak - rss_before:.0f} MB during build)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,291 @@
+"""
+Benchmark- en geheugensuite voor de rapportpipeline, met vergelijking tegen een baseline.
+
+    python tools/bench_pipeline.py                      # alle stages, vergelijk met de baseline
+    python tools/bench_pipeline.py --stages exif,pdf    # alleen stages waarvan de naam zo begint
+    python tools/bench_pipeline.py --save-baseline      # huidige metingen als nieuwe baseline
+    python tools/bench_pipeline.py --threshold 0.5 --json out.json
+
+Elke stage draait in een eigen (spawn-)proces met deterministische fixtures (bench_fixtures.py):
+eerst de fixtures, dan `--repeat` getimede runs (wall time: min en mediaan) en één run onder
+tracemalloc. Gemeten per stage:
+
+    wall_ms         mediaan van de getimede runs
+    rss_peak_mb     piek-RSS tijdens de getimede runs boven de RSS na fixtures en opwarmrun
+                    (VmHWM, teruggezet via /proc/self/clear_refs; zonder die interface: -)
+    tracemalloc_mb  piek van Python- en numpy-allocaties (Pillow-pixelbuffers vallen erbuiten)
+
+Een metriek is een regressie als hij meer dan `--threshold` (fractie) boven de baseline ligt
+én het absolute verschil boven de ruisvloer (METRIC_FLOOR) uitkomt; dan is de exit-code 1.
+Baselines zijn machine-afhankelijk: sla ze op de machine op waarop ook vergeleken wordt.
+"""
+import argparse
+import ctypes
+import gc
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import statistics
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(TOOLS_DIR)
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, TOOLS_DIR)
+
+DEFAULT_BASELINE = os.path.join(TOOLS_DIR, "bench_baseline.json")
+DEFAULT_THRESHOLD = 0.25
+DEFAULT_REPEAT = 5
+DEFAULT_COMPARTMENTS = [1, 4, 12]
+METRICS = ["wall_ms", "rss_peak_mb", "tracemalloc_mb"]
+METRIC_FLOOR = {"wall_ms": 2.0, "rss_peak_mb": 4.0, "tracemalloc_mb": 1.0}
+
+# ======================
+# GEHEUGEN
+# ======================
+def _proc_status_kb(field):
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+def reset_peak_rss():
+    """Zet de piek-RSS (VmHWM) terug op de huidige RSS; False als het OS dat niet kan."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+def release_free_memory():
+    """Geef vrijgekomen heap terug aan het OS (glibc), zodat de RSS-basis niet de vorige run bevat."""
+    gc.collect()
+    try:
+        ctypes.CDLL("libc.so.6").malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+
+def rss_mb():
+    kb = _proc_status_kb("VmRSS")
+    return kb / 1024.0 if kb is not None else peak_rss_mb()
+
+def peak_rss_mb():
+    kb = _proc_status_kb("VmHWM")
+    if kb is None:
+        # ru_maxrss: KiB op Linux, bytes op macOS
+        kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        kb = kb / 1024.0 if sys.platform == "darwin" else kb
+    return kb / 1024.0
+
+# ======================
+# STAGES
+# ======================
+# Elke stage: naam -> setup() die een functie zonder argumenten teruggeeft. Alleen de
+# teruggegeven functie wordt gemeten; fixtures en imports vallen in de setup.
+def _stage_exif(with_exif):
+    def setup():
+        from datetime import datetime
+        from bench_fixtures import jpeg
+        from pressuretest.photos import exif_datetime
+        b = jpeg(exif_dt=datetime(2024, 5, 1, 9, 0) if with_exif else None)
+        return lambda: exif_datetime(b)
+    return setup
+
+def _stage_bytes_to_pil(kind):
+    def setup():
+        from bench_fixtures import jpeg, png_screenshot
+        from pressuretest.photos import PREVIEW_MAX_PX, bytes_to_pil
+        if kind == "png":
+            b = png_screenshot()
+            return lambda: bytes_to_pil(b)
+        b = jpeg()
+        if kind == "preview":
+            return lambda: bytes_to_pil(b, fit=(PREVIEW_MAX_PX, PREVIEW_MAX_PX))
+        return lambda: bytes_to_pil(b)
+    return setup
+
+def _stage_pil_to_rlimage():
+    from bench_fixtures import jpeg
+    from pressuretest.pdf import _pil_to_rlimage
+    from pressuretest.photos import bytes_to_pil
+    img = bytes_to_pil(jpeg())
+    return lambda: _pil_to_rlimage(img)
+
+def _stage_encode_photo():
+    from bench_fixtures import jpeg
+    from pressuretest.pdf import _encode_photo
+    from pressuretest.photos import photo_from_bytes
+    photo = photo_from_bytes(jpeg())
+    return lambda: _encode_photo(photo)
+
+def _stage_canvas_to_pil():
+    from bench_fixtures import signature_array
+    from pressuretest.photos import canvas_to_pil
+    arr = signature_array()
+    return lambda: canvas_to_pil(arr)
+
+def _stage_logger():
+    from bench_fixtures import logger_csv
+    from pressuretest.logger import analyze_hold, load_logger_csv
+    b = logger_csv()
+    return lambda: analyze_hold(load_logger_csv(b))
+
+def _stage_pdf(n):
+    def setup():
+        from bench_fixtures import report
+        from pressuretest.pdf import build_pdf_bytes
+        data = report(n, unique_photos=8)
+        return lambda: build_pdf_bytes(data)
+    return setup
+
+def _stage_pdf_file(n):
+    def setup():
+        from bench_fixtures import report
+        from pressuretest.pdf import build_pdf_file
+        data = report(n, unique_photos=8)
+        return lambda: build_pdf_file(data).close()
+    return setup
+
+def stages(compartments=DEFAULT_COMPARTMENTS):
+    out = {
+        "exif_datetime[exif]": _stage_exif(True),
+        "exif_datetime[no-exif]": _stage_exif(False),
+        "bytes_to_pil[jpeg-12mp]": _stage_bytes_to_pil("full"),
+        "bytes_to_pil[jpeg-preview]": _stage_bytes_to_pil("preview"),
+        "bytes_to_pil[png-screenshot]": _stage_bytes_to_pil("png"),
+        "pil_to_rlimage[png]": _stage_pil_to_rlimage,
+        "encode_photo[jpeg]": _stage_encode_photo,
+        "canvas_to_pil": _stage_canvas_to_pil,
+        "logger_analysis[1e5]": _stage_logger,
+    }
+    for n in compartments:
+        out[f"build_pdf_bytes[{n}]"] = _stage_pdf(n)
+    if compartments:
+        n = max(compartments)
+        out[f"build_pdf_file[{n}]"] = _stage_pdf_file(n)
+    return out
+
+def run_stage(name, repeat, compartments):
+    """Draait in een schoon proces: fixtures, getimede runs, één tracemalloc-run."""
+    fn = stages(compartments)[name]()
+    fn()  # opwarmen: lazy imports, font-caches
+    release_free_memory()
+    base = rss_mb()
+    exact = reset_peak_rss()
+    times = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - t) * 1000.0)
+    rss_peak = peak_rss_mb() - base if exact else None
+    gc.collect()
+    tracemalloc.start()
+    fn()
+    _cur, tm_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "wall_ms": round(statistics.median(times), 3),
+        "wall_ms_min": round(min(times), 3),
+        "rss_peak_mb": round(rss_peak, 2) if rss_peak is not None else None,
+        "tracemalloc_mb": round(tm_peak / 2**20, 3),
+        "runs": repeat,
+    }
+
+def run_all(names, repeat, compartments):
+    results = {}
+    ctx = multiprocessing.get_context("spawn")
+    for name in names:
+        # Eén proces per stage: geen gedeelde caches of geheugenpieken tussen stages
+        with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as ex:
+            results[name] = ex.submit(run_stage, name, repeat, compartments).result()
+        r = results[name]
+        rss = f"{r['rss_peak_mb']:8.1f}" if r["rss_peak_mb"] is not None else "       -"
+        print(f"{name:32s} {r['wall_ms']:10.2f} ms  (min {r['wall_ms_min']:.2f})  rss +{rss} MB  "
+              f"tracemalloc {r['tracemalloc_mb']:8.2f} MB", flush=True)
+    return results
+
+# ======================
+# BASELINE
+# ======================
+def machine_info():
+    return {"python": platform.python_version(), "platform": platform.platform(),
+            "cpu_count": os.cpu_count()}
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """Lijst (stage, metriek, baseline, huidig, verhouding) van regressies boven de drempel."""
+    regressions = []
+    for name, cur in results.items():
+        base = baseline.get("stages", {}).get(name)
+        if not base:
+            continue
+        for m in METRICS:
+            b, c = base.get(m), cur.get(m)
+            if b is None or c is None:
+                continue
+            if c > b * (1.0 + threshold) and c - b > METRIC_FLOOR[m]:
+                regressions.append((name, m, b, c, c / b if b else float("inf")))
+    return regressions
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--stages", help="komma-gescheiden prefixen van stagenamen (standaard: alle)")
+    ap.add_argument("--compartments", default=",".join(map(str, DEFAULT_COMPARTMENTS)),
+                    help="aantallen compartimenten voor build_pdf_bytes, bijv. 1,4,12")
+    ap.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    ap.add_argument("--baseline", default=DEFAULT_BASELINE)
+    ap.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                    help="toegestane verslechtering als fractie (0.25 = 25%%)")
+    ap.add_argument("--save-baseline", action="store_true", help="schrijf de resultaten naar --baseline")
+    ap.add_argument("--json", help="schrijf de resultaten ook naar dit bestand")
+    args = ap.parse_args(argv)
+
+    compartments = [int(n) for n in args.compartments.split(",") if n]
+    names = list(stages(compartments))
+    if args.stages:
+        prefixes = [p.strip() for p in args.stages.split(",")]
+        names = [n for n in names if any(n.startswith(p) for p in prefixes)]
+
+    results = run_all(names, args.repeat, compartments)
+    doc = {"machine": machine_info(), "repeat": args.repeat, "stages": results}
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(doc, f, indent=2)
+
+    if args.save_baseline:
+        baseline = {"stages": {}}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, encoding="utf-8") as f:
+                baseline = json.load(f)
+        # Alleen de gemeten stages vervangen, zodat een deelrun de rest van de baseline laat staan
+        baseline.update({"machine": doc["machine"], "repeat": args.repeat})
+        baseline.setdefault("stages", {}).update(results)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f"baseline saved: {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"no baseline at {args.baseline}; run with --save-baseline first")
+        return 0
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    if baseline.get("machine", {}).get("platform") != doc["machine"]["platform"]:
+        print("note: baseline was recorded on a different machine:", baseline.get("machine"))
+    regressions = compare(results, baseline, args.threshold)
+    for name, m, b, c, ratio in regressions:
+        print(f"REGRESSION {name} {m}: {b} -> {c} ({ratio:.2f}x)")
+    print(f"{len(regressions)} regressions (threshold {args.threshold:.0%})")
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,63 @@
+"""
+Controleer het importbudget van de kernmodules die de app bij een koude start laadt.
+
+    python tools/check_import_time.py [--budget-ms 50]
+
+Draait `python -X importtime` in een schoon subproces en faalt (exit 1) als de cumulatieve
+importtijd boven het budget komt, of als een zware afhankelijkheid (reportlab, Pillow, numpy)
+al bij het opstarten wordt geladen in plaats van bij eerste gebruik.
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Wat PressuretestV2.0.py bij elke koude start uit de kern importeert
+STARTUP_MODULES = ["pressuretest.archive", "pressuretest.blobs", "pressuretest.cache", "pressuretest.drafts", "pressuretest.instrument", "pressuretest.jobs", "pressuretest.logger", "pressuretest.mail", "pressuretest.photos", "pressuretest.translations", "pressuretest.units"]
+LAZY_MODULES = ["reportlab", "PIL", "numpy"]
+DEFAULT_BUDGET_MS = 50.0
+
+def import_times(modules):
+    """{module: (self_us, cumulative_us)} volgens `python -X importtime`."""
+    code = "import " + ", ".join(modules)
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                          cwd=REPO_DIR, capture_output=True, text=True, check=True)
+    times = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, cum_us, name = line[len("import time:"):].split("|")
+        if self_us.strip().isdigit():
+            times[name.strip()] = (int(self_us), int(cum_us))
+    return times
+
+def check(modules=STARTUP_MODULES, budget_ms=DEFAULT_BUDGET_MS):
+    times = import_times(modules)
+    # Cumulatieve tijd van de top-level imports = totale kosten van deze import-regel
+    total_ms = sum(times[m][1] for m in modules if m in times) / 1000.0
+    loaded_heavy = sorted({n.split(".")[0] for n in times} & set(LAZY_MODULES))
+    return total_ms, loaded_heavy
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS)
+    ap.add_argument("--runs", type=int, default=3, help="beste van N runs (ruis van koude caches)")
+    args = ap.parse_args(argv)
+
+    import_times(STARTUP_MODULES)  # eerste run compileert .pyc's; niet meetellen
+    results = [check(budget_ms=args.budget_ms) for _ in range(max(1, args.runs))]
+    total_ms = min(r[0] for r in results)
+    loaded_heavy = results[0][1]
+
+    print(f"startup imports: {total_ms:.1f} ms (budget {args.budget_ms:.0f} ms)")
+    ok = total_ms <= args.budget_ms
+    if loaded_heavy:
+        print("eagerly imported heavy modules: " + ", ".join(loaded_heavy))
+        ok = False
+    print("OK" if ok else "FAIL")
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,448 @@
+"""
+Belastingstest: N gelijktijdige sessies tegen één instantie van PressuretestV2.0.py.
+
+    python tools/load_test.py                                   # N = 1, 2, 4, 8
+    python tools/load_test.py --sessions 1,4,16 --compartments 8 --json load.json
+    python tools/load_test.py --think-ms 500 --photo-px 1600x1200
+
+Per N start een vers serverproces (`streamlit run`, headless, eigen datamap) en een
+opwarmsessie; daarna vullen N headless clients tegelijk het formulier in, precies zoals de
+browser dat doet: over de websocket (/_stcore/stream) met BackMsg-reruns en widgetwaarden,
+foto's via de upload-endpoint. Elke sessie:
+
+    vult de projectgegevens en de eisen in, zet het aantal compartimenten
+    per compartiment: drukken, resultaat, start- en eindfoto (synthetische JPEG met EXIF)
+    zet een handtekening (canvaswaarde als PNG) met naam en bedrijf
+    genereert de PDF en pollt het voortgangsfragment tot de download er staat
+
+AppTest is hier niet bruikbaar: elke run zet een globale runtime, dus gelijktijdige sessies
+in één proces zitten elkaar in de weg en meten niet wat de server doet.
+
+Gemeten per N:
+
+    rerun_ms        hele-pagina-reruns: van BackMsg tot script_finished (p50/p95/p99)
+    fragment_ms     fragment-reruns (compartimenten, handtekening, PDF-status)
+    upload_ms       HTTP-upload van één foto
+    pdf_ms          van de klik op "Genereer PDF" tot de download zichtbaar is
+    rss_*_mb        RSS van de server (/proc, dus alleen Linux): na de opwarmsessie, piek,
+                    en na N ingevulde sessies; per_session_mb = (eind - opgewarmd) / N
+
+"errors" telt exceptions op de pagina en mislukte sessies, "rejected" de PDF-jobs die de
+wachtrij weigerde (pdf_busy). De client gebruikt dezelfde websockets- en requests-pakketten
+als Streamlit zelf.
+"""
+import argparse
+import asyncio
+import base64
+import json
+import math
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+from io import BytesIO
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(TOOLS_DIR)
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, TOOLS_DIR)
+
+APP = os.path.join(REPO_DIR, "PressuretestV2.0.py")
+DEFAULT_SESSIONS = [1, 2, 4, 8]
+DEFAULT_COMPARTMENTS = 4
+DEFAULT_PHOTO_PX = "4000x3000"
+SERVER_START_TIMEOUT_S = 60
+RUN_TIMEOUT_S = 120
+PDF_TIMEOUT_S = 600
+RSS_SAMPLE_S = 0.1
+PERCENTILES = [50, 95, 99]
+LATENCIES = ["rerun_ms", "fragment_ms", "upload_ms", "pdf_ms"]
+
+# ======================
+# FIXTURES
+# ======================
+def session_fixtures(n_sets, compartments, photo_px):
+    """Per sessie eigen foto's (geen dedup tussen sessies) en één gedeelde handtekening."""
+    from PIL import Image
+    from bench_fixtures import jpeg, signature_array
+    w, h = photo_px
+    t0 = datetime(2024, 5, 6, 9, 0)
+    sets = []
+    for s in range(n_sets):
+        photos = []
+        for i in range(compartments):
+            for n, slot in enumerate(["start", "end"]):
+                dt = t0 + timedelta(hours=i, minutes=30 * n, seconds=s)
+                photos.append((f"s{s}_c{i}_{slot}.jpg", jpeg(w, h, exif_dt=dt, seed=1000 * s + 2 * i + n)))
+        sets.append(photos)
+    bio = BytesIO()
+    Image.fromarray(signature_array()).save(bio, format="PNG")
+    signature = "data:image/png;base64," + base64.b64encode(bio.getvalue()).decode()
+    return sets, signature
+
+# ======================
+# SERVER
+# ======================
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+class Server:
+    def __init__(self, port):
+        self.port = port
+        self.base = f"http://127.0.0.1:{port}"
+        self.data_dir = tempfile.mkdtemp(prefix="pressuretest-load-")
+        self.proc = None
+
+    def start(self):
+        import requests
+        env = dict(os.environ, PRESSURETEST_DATA_DIR=self.data_dir)
+        self.log = open(os.path.join(self.data_dir, "server.log"), "wb")
+        self.proc = subprocess.Popen(
+            [sys.executable, "-m", "streamlit", "run", APP, "--server.headless=true",
+             f"--server.port={self.port}", "--server.address=127.0.0.1",
+             "--server.enableXsrfProtection=false", "--server.fileWatcherType=none",
+             "--browser.gatherUsageStats=false"],
+            cwd=REPO_DIR, env=env, stdout=self.log, stderr=subprocess.STDOUT)
+        deadline = time.time() + SERVER_START_TIMEOUT_S
+        while time.time() < deadline:
+            if self.proc.poll() is not None:
+                raise RuntimeError(f"server stopped (exit {self.proc.returncode}), see {self.log.name}")
+            try:
+                if requests.get(self.base + "/_stcore/health", timeout=1).ok:
+                    return
+            except requests.ConnectionError:
+                pass
+            time.sleep(0.2)
+        raise RuntimeError("server did not become healthy in time")
+
+    def rss_mb(self):
+        try:
+            with open(f"/proc/{self.proc.pid}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        return int(line.split()[1]) / 1024
+        except OSError:
+            pass
+        return None
+
+    def stop(self):
+        if self.proc is not None and self.proc.poll() is None:
+            self.proc.terminate()
+            try:
+                self.proc.wait(10)
+            except subprocess.TimeoutExpired:
+                self.proc.kill()
+                self.proc.wait()
+        self.log.close()
+        shutil.rmtree(self.data_dir, ignore_errors=True)
+
+# ======================
+# CLIENT
+# ======================
+class Session:
+    """
+    Eén browsertab over de websocket. Widgets worden op key teruggevonden (zonder key: op
+    label); ingestelde waarden gaan bij elke rerun opnieuw mee, zoals de frontend dat doet.
+    """
+    def __init__(self, base, stats, think_s=0.0):
+        self.base = base
+        self.stats = stats
+        self.think_s = think_s
+        self.widgets = {}     # key of label -> (soort, proto, fragment_id)
+        self.values = {}      # widget-id -> WidgetState
+        self.auto_rerun = {}  # fragment_id -> interval (s)
+        self.texts = []       # meldingen (alerts) van de laatste hele run
+        self.errors = []
+        self.session_id = ""
+        self.page_hash = ""
+        self.ws = None
+
+    async def connect(self):
+        from websockets.asyncio.client import connect
+        url = self.base.replace("http", "ws", 1) + "/_stcore/stream"
+        self.ws = await connect(url, subprotocols=["streamlit"], max_size=None)
+
+    async def close(self):
+        if self.ws is not None:
+            await self.ws.close()
+
+    async def _recv(self):
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+        return ForwardMsg.FromString(await asyncio.wait_for(self.ws.recv(), RUN_TIMEOUT_S))
+
+    def _element(self, msg):
+        el = msg.delta.new_element
+        kind = el.WhichOneof("type")
+        if kind == "alert":
+            self.texts.append(el.alert.body)
+        elif kind == "exception":
+            self.errors.append(f"{el.exception.type}: {el.exception.message}")
+        proto = getattr(el, kind)
+        wid = getattr(proto, "id", "") if kind != "alert" else ""
+        if wid.startswith("$$ID-"):
+            key = wid.split("-", 2)[2]
+            if key == "None":
+                key = getattr(proto, "label", "")
+            self.widgets[key] = (kind, proto, msg.delta.fragment_id)
+
+    async def rerun(self, fragment_id="", triggers=(), auto=False):
+        """Eén rerun (hele pagina of fragment); terug: de duur in ms."""
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+        msg = BackMsg()
+        cs = msg.rerun_script
+        cs.page_script_hash = self.page_hash
+        cs.widget_states.widgets.extend(list(self.values.values()) + list(triggers))
+        if fragment_id:
+            cs.fragment_id = fragment_id
+            cs.is_auto_rerun = auto
+        t0 = time.perf_counter()
+        await self.ws.send(msg.SerializeToString())
+        full = not fragment_id
+        while True:
+            m = await self._recv()
+            kind = m.WhichOneof("type")
+            if kind == "new_session":
+                self.page_hash = m.new_session.page_script_hash
+                self.session_id = m.new_session.initialize.session_id or self.session_id
+                if not m.new_session.fragment_ids_this_run:
+                    # Hele run (ook na st.rerun() uit een fragment): pagina opnieuw opbouwen
+                    full = True
+                    self.texts, self.auto_rerun = [], {}
+            elif kind == "delta" and m.delta.WhichOneof("type") == "new_element":
+                self._element(m)
+            elif kind == "auto_rerun":
+                self.auto_rerun[m.auto_rerun.fragment_id] = m.auto_rerun.interval
+            elif kind == "script_finished" and m.script_finished != ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                break
+        ms = (time.perf_counter() - t0) * 1000
+        self.stats["rerun_ms" if full else "fragment_ms"].append(ms)
+        return ms
+
+    def _state(self, key):
+        from streamlit.proto.WidgetStates_pb2 import WidgetState
+        kind, proto, fragment_id = self.widgets[key]
+        ws = WidgetState()
+        ws.id = proto.id
+        return ws, proto, fragment_id
+
+    async def _set(self, ws, fragment_id):
+        self.values[ws.id] = ws
+        if self.think_s:
+            await asyncio.sleep(self.think_s)
+        await self.rerun(fragment_id)
+
+    async def text(self, key, value):
+        ws, _proto, frag = self._state(key)
+        ws.string_value = value
+        await self._set(ws, frag)
+
+    async def number(self, key, value):
+        from streamlit.proto.NumberInput_pb2 import NumberInput
+        ws, proto, frag = self._state(key)
+        if proto.data_type == NumberInput.INT:
+            ws.int_value = int(value)
+        else:
+            ws.double_value = float(value)
+        await self._set(ws, frag)
+
+    async def radio(self, key, index):
+        ws, proto, frag = self._state(key)
+        ws.string_value = proto.options[index]
+        await self._set(ws, frag)
+
+    async def component(self, key, value):
+        ws, _proto, frag = self._state(key)
+        ws.json_value = json.dumps(value)
+        await self._set(ws, frag)
+
+    async def click(self, key):
+        ws, _proto, frag = self._state(key)
+        ws.trigger_value = True  # eenmalig: niet in self.values
+        if self.think_s:
+            await asyncio.sleep(self.think_s)
+        await self.rerun(frag, triggers=[ws])
+
+    async def upload(self, key, name, data):
+        """Als de frontend: upload-URL aanvragen, bestand PUT-ten, dan de widgetwaarde zetten."""
+        import requests
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+        ws, _proto, frag = self._state(key)
+        msg = BackMsg()
+        req = msg.file_urls_request
+        req.request_id = uuid.uuid4().hex
+        req.session_id = self.session_id
+        req.file_names.append(name)
+        await self.ws.send(msg.SerializeToString())
+        while True:
+            m = await self._recv()
+            if m.WhichOneof("type") == "file_urls_response" and m.file_urls_response.response_id == req.request_id:
+                break
+        urls = m.file_urls_response.file_urls[0]
+        url = urls.upload_url if urls.upload_url.startswith("http") else self.base + urls.upload_url
+        t0 = time.perf_counter()
+        r = await asyncio.to_thread(requests.put, url, files={"file": (name, data, "image/jpeg")}, timeout=RUN_TIMEOUT_S)
+        r.raise_for_status()
+        self.stats["upload_ms"].append((time.perf_counter() - t0) * 1000)
+        info = ws.file_uploader_state_value.uploaded_file_info.add()
+        info.file_id, info.name, info.size = urls.file_id, name, len(data)
+        info.file_urls.CopyFrom(urls)
+        await self._set(ws, frag)
+
+# ======================
+# SCENARIO
+# ======================
+async def fill_and_generate(sess, photos, signature, compartments):
+    """Het formulier zoals een inspecteur het invult; terug: "ok", "rejected" of een foutmelding."""
+    from pressuretest.translations import T
+    _ = T["nl"]
+    await sess.connect()
+    try:
+        await sess.rerun()
+        for key in ["project_name", "manufacturer", "work_order", "drawing", "revision", "part_line",
+                    "test_instrument"]:
+            await sess.text(key, f"Load {key} {sess.session_id[:6]}")
+        await sess.number("pt_value", 10.0)
+        await sess.number("num_comp", compartments)
+        up = iter(photos)
+        for i in range(compartments):
+            await sess.number(f"c{i}_sp", 10.0)
+            await sess.number(f"c{i}_ep", 9.95)
+            await sess.radio(f"c{i}_res", 1)
+            for slot in ["start", "end"]:
+                key = next(k for k in sess.widgets if k.startswith(f"c{i}_{slot}_up_"))
+                await sess.upload(key, *next(up))
+        await sess.component("sig_canvas", {"data": signature, "raw": {"objects": []}})
+        await sess.text("sign_name", "Load Tester")
+        await sess.text("sign_company", "Load BV")
+
+        t0 = time.perf_counter()
+        await sess.click(_["gen_pdf"])
+        while _["success_pdf"] not in sess.texts:
+            if _["pdf_busy"] in sess.texts:
+                return "rejected"
+            failed = [t for t in sess.texts if t.startswith(_["pdf_failed"].split("{")[0])]
+            if failed or sess.errors:
+                return (failed + sess.errors)[0]
+            if not sess.auto_rerun:
+                return "no pdf job on the page"
+            if time.perf_counter() - t0 > PDF_TIMEOUT_S:
+                return "pdf timeout"
+            fragment_id, interval = next(iter(sess.auto_rerun.items()))
+            await asyncio.sleep(interval)
+            await sess.rerun(fragment_id, auto=True)
+        sess.stats["pdf_ms"].append((time.perf_counter() - t0) * 1000)
+        return sess.errors[0] if sess.errors else "ok"
+    except Exception as e:
+        return f"{type(e).__name__}: {e}"
+
+async def run_level(server, n, fixture_sets, signature, compartments, think_s, ramp_s):
+    stats = {k: [] for k in LATENCIES}
+    sessions = [Session(server.base, stats, think_s) for _i in range(n)]
+    rss = []
+
+    async def sample():
+        while True:
+            rss.append(server.rss_mb())
+            await asyncio.sleep(RSS_SAMPLE_S)
+
+    async def one(k, sess):
+        await asyncio.sleep(ramp_s * k / n)
+        return await fill_and_generate(sess, fixture_sets[k], signature, compartments)
+
+    sampler = asyncio.create_task(sample())
+    t0 = time.perf_counter()
+    outcomes = await asyncio.gather(*(one(k, s) for k, s in enumerate(sessions)))
+    wall = time.perf_counter() - t0
+    await asyncio.sleep(1.0)  # afgeronde jobs en uploads laten neerslaan
+    rss.append(server.rss_mb())
+    sampler.cancel()
+    for s in sessions:  # pas sluiten na de meting: open sessies houden hun state vast
+        await s.close()
+    return stats, outcomes, [r for r in rss if r is not None], wall
+
+# ======================
+# RAPPORT
+# ======================
+def percentile(values, p):
+    """Nearest-rank percentiel; None als er geen waarden zijn."""
+    if not values:
+        return None
+    s = sorted(values)
+    return s[max(0, math.ceil(p / 100 * len(s)) - 1)]
+
+def summarize(stats):
+    return {k: {"n": len(v), **{f"p{p}": percentile(v, p) for p in PERCENTILES}} for k, v in stats.items()}
+
+def _fmt(v, width=7):
+    return f"{v:{width}.0f}" if v is not None else " " * (width - 1) + "-"
+
+def run_all(levels, compartments, photo_px, think_s, ramp_s, port=None):
+    print(f"fixtures: {max(levels) + 1} x {2 * compartments} photos of {photo_px[0]}x{photo_px[1]}", flush=True)
+    sets, signature = session_fixtures(max(levels) + 1, compartments, photo_px)
+    results = []
+    header = f"{'N':>3} " + " ".join(f"{k[:-3] + ' p' + str(p):>14}" for k in LATENCIES for p in PERCENTILES)
+    for n in levels:
+        server = Server(port or free_port())
+        try:
+            server.start()
+            idle = server.rss_mb()
+            # Opwarmsessie: imports, caches en threadpools horen niet bij de kosten per sessie
+            warm_stats = {k: [] for k in LATENCIES}
+            warm = asyncio.run(fill_and_generate(Session(server.base, warm_stats), sets[-1], signature, compartments))
+            if warm != "ok":
+                raise RuntimeError(f"warmup session failed: {warm}")
+            warm_rss = server.rss_mb()
+            stats, outcomes, rss, wall = asyncio.run(
+                run_level(server, n, sets, signature, compartments, think_s, ramp_s))
+        finally:
+            server.stop()
+        r = {
+            "sessions": n, "wall_s": round(wall, 2), **summarize(stats),
+            "rss_idle_mb": idle, "rss_warm_mb": warm_rss,
+            "rss_peak_mb": max(rss) if rss else None, "rss_end_mb": rss[-1] if rss else None,
+            "per_session_mb": (rss[-1] - warm_rss) / n if rss and warm_rss else None,
+            "rejected": outcomes.count("rejected"),
+            "errors": [o for o in outcomes if o not in ("ok", "rejected")],
+        }
+        results.append(r)
+        if len(results) == 1:
+            print(header)
+        print(f"{n:3d} " + " ".join(f"{_fmt(r[k][f'p{p}'], 14)}" for k in LATENCIES for p in PERCENTILES), flush=True)
+        print(f"    rss warm {_fmt(r['rss_warm_mb'], 1)} MB  peak {_fmt(r['rss_peak_mb'], 1)} MB  "
+              f"end {_fmt(r['rss_end_mb'], 1)} MB  per session {r['per_session_mb'] or 0:.1f} MB  "
+              f"wall {wall:.1f} s  rejected {r['rejected']}  errors {len(r['errors'])}", flush=True)
+        for e in r["errors"]:
+            print("    error:", e)
+    return results
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--sessions", default=",".join(map(str, DEFAULT_SESSIONS)),
+                    help="komma-gescheiden aantallen gelijktijdige sessies, bijv. 1,4,16")
+    ap.add_argument("--compartments", type=int, default=DEFAULT_COMPARTMENTS)
+    ap.add_argument("--photo-px", default=DEFAULT_PHOTO_PX, help="fotoformaat BxH (standaard 12 MP)")
+    ap.add_argument("--think-ms", type=float, default=0.0, help="denktijd vóór elke invoer")
+    ap.add_argument("--ramp-s", type=float, default=0.0, help="sessies gespreid starten over zoveel seconden")
+    ap.add_argument("--port", type=int, help="vaste poort voor de server (standaard: een vrije)")
+    ap.add_argument("--json", help="schrijf de resultaten ook naar dit bestand")
+    args = ap.parse_args(argv)
+
+    levels = [int(n) for n in args.sessions.split(",") if n]
+    photo_px = tuple(int(v) for v in args.photo_px.lower().split("x"))
+    results = run_all(levels, args.compartments, photo_px, args.think_ms / 1000, args.ramp_s, args.port)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"compartments": args.compartments, "photo_px": photo_px, "think_ms": args.think_ms,
+                       "cpu_count": os.cpu_count(), "levels": results}, f, indent=2)
+    return 1 if any(r["errors"] for r in results) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
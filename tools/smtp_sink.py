@@ -0,0 +1,134 @@
+"""
+Lokale SMTP-server voor ontwikkeling en tests: neemt alles aan en schrijft elke mail als .eml
+weg, zonder iets door te sturen. Met storingsinjectie om retries en herverbinden te testen.
+
+    python tools/smtp_sink.py --port 8025 --out /tmp/mails
+    PRESSURETEST_SMTP_HOST=127.0.0.1 PRESSURETEST_SMTP_PORT=8025 \\
+        PRESSURETEST_MAIL_FROM=druktest@example.com streamlit run PressuretestV2.0.py
+
+    python tools/smtp_sink.py --temp-fail-every 3     # elke 3e mail: 451 (tijdelijk)
+    python tools/smtp_sink.py --drop-every 5          # na elke 5e mail de verbinding verbreken
+    python tools/smtp_sink.py --latency-ms 150        # vertraging per antwoord (echte server)
+
+Spreekt genoeg SMTP voor smtplib (EHLO/HELO, MAIL, RCPT, DATA, RSET, NOOP, QUIT; geen TLS of
+AUTH). In Python te gebruiken via SmtpSink(...).start(); `.connections` en `.messages` tellen
+mee voor bench_mail.py.
+"""
+import argparse
+import itertools
+import os
+import socketserver
+import sys
+import threading
+import time
+
+class _Handler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        if self.server.sink.latency_s:
+            time.sleep(self.server.sink.latency_s)
+        self.wfile.write(line.encode("ascii") + b"\r\n")
+        self.wfile.flush()
+
+    def handle(self):
+        sink = self.server.sink
+        with sink.lock:
+            sink.connections += 1
+        self.reply("220 smtp-sink ready")
+        sender, rcpts = None, []
+        for raw in self.rfile:
+            line = raw.decode("utf-8", "replace").rstrip("\r\n")
+            cmd = line[:4].upper()
+            if cmd in ("EHLO", "HELO"):
+                self.reply("250-smtp-sink" if cmd == "EHLO" else "250 smtp-sink")
+                if cmd == "EHLO":
+                    self.reply("250-8BITMIME")
+                    self.reply("250 SIZE 52428800")
+            elif cmd == "MAIL":
+                sender, rcpts = line.split(":", 1)[1].strip(), []
+                self.reply("250 OK")
+            elif cmd == "RCPT":
+                rcpts.append(line.split(":", 1)[1].strip())
+                self.reply("250 OK")
+            elif cmd == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                data = []
+                for raw in self.rfile:
+                    if raw in (b".\r\n", b".\n"):
+                        break
+                    data.append(raw[1:] if raw.startswith(b"..") else raw)
+                n = next(sink.counter)
+                if sink.temp_fail_every and n % sink.temp_fail_every == 0:
+                    self.reply("451 4.3.0 Temporary failure, try again later")
+                else:
+                    sink.store(sender, rcpts, b"".join(data))
+                    self.reply("250 OK queued")
+                    if sink.drop_every and n % sink.drop_every == 0:
+                        return  # verbinding weg zonder 221, zoals een server die herstart
+                sender, rcpts = None, []
+            elif cmd == "RSET":
+                sender, rcpts = None, []
+                self.reply("250 OK")
+            elif cmd == "NOOP":
+                self.reply("250 OK")
+            elif cmd == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
+
+class _Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+class SmtpSink:
+    def __init__(self, host="127.0.0.1", port=0, out=None, temp_fail_every=0, drop_every=0, latency_ms=0):
+        self.out = out
+        self.temp_fail_every = temp_fail_every
+        self.drop_every = drop_every
+        self.latency_s = latency_ms / 1000
+        self.connections = 0
+        self.messages = []  # (afzender, ontvangers, bytes) als er geen `out` is
+        self.counter = itertools.count(1)
+        self.lock = threading.Lock()
+        self._server = _Server((host, port), _Handler)
+        self._server.sink = self
+        self.host, self.port = self._server.server_address[:2]
+        if out:
+            os.makedirs(out, exist_ok=True)
+
+    def store(self, sender, rcpts, data):
+        with self.lock:
+            self.messages.append((sender, list(rcpts), data if not self.out else len(data)))
+            n = len(self.messages)
+        if self.out:
+            with open(os.path.join(self.out, f"{n:06d}.eml"), "wb") as f:
+                f.write(data)
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, name="smtp-sink", daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8025)
+    ap.add_argument("--out", help="map voor de .eml-bestanden (standaard: alleen tellen)")
+    ap.add_argument("--temp-fail-every", type=int, default=0)
+    ap.add_argument("--drop-every", type=int, default=0)
+    ap.add_argument("--latency-ms", type=float, default=0)
+    args = ap.parse_args(argv)
+    sink = SmtpSink(args.host, args.port, args.out, args.temp_fail_every, args.drop_every, args.latency_ms)
+    print(f"smtp sink on {sink.host}:{sink.port}" + (f", writing to {args.out}" if args.out else ""), flush=True)
+    try:
+        sink._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    print(f"{sink.connections} connections, {len(sink.messages)} messages")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())